@@ -1,24 +1,51 @@
 """
 LangGraph Agents for Nomi - Agentic architecture with supervisor and specialized agents
 """
+import asyncio
 import logging
-from typing import TypedDict, Annotated, Literal
-from datetime import datetime, date, timedelta
-from langchain_anthropic import ChatAnthropic
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from langgraph.graph import StateGraph, END
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+from typing import TypedDict, Literal, Callable, Optional
+from datetime import datetime
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.runnables.config import var_child_runnable_config
+from langgraph.pregel._messages import StreamMessagesHandler
+from langgraph.graph import StateGraph, START, END
+from classifier import fast_classify
+from llm_profiles import get_llm
+from context_window import history_to_messages, with_summary, schedule_summary_update, CONTEXT_MAX_MESSAGES
+from user_profile import profile_context
+from schemas import SINGLE_CALL_MODE, WorkoutTurn, NoteTurn, WORKOUT_TURN_INSTRUCTIONS, NOTE_TURN_INSTRUCTIONS
+from response_templates import get_ack_mode, render_workout_ack, render_note_ack, schedule_upgrade
+from telemetry import instrument_node, span
+import metrics
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
-# Initialize LLM
-llm = ChatAnthropic(
-    model=os.getenv("CLAUDE_MODEL", "claude-sonnet-4-5-20250929"),
-    api_key=os.getenv("ANTHROPIC_API_KEY"),
-    max_tokens=int(os.getenv("CLAUDE_MAX_TOKENS", "4000"))
-)
+# LLM calls tagged with this produce the user-facing reply and are streamed to the UI
+REPLY_TAG = "nomi_reply"
+REPLY_CONFIG = {"tags": [REPLY_TAG]}
+
+# SPECULATIVE EXECUTION - run the likely specialist while the supervisor classifies
+# Used by the sync workflow's supervisor node (app, chat.handle_message) and by
+# run_speculative on the async path. A specialist's only side effect, the
+# template_then_llm upgrade, is returned in state and scheduled when the turn
+# is saved, so a discarded run leaves nothing behind.
+SPECULATIVE_MODE = os.getenv("SPECULATIVE_MODE", "false").lower() == "true"
+SPECULATIVE_MAX_WORKERS = int(os.getenv("SPECULATIVE_MAX_WORKERS", "4"))
+
+# Only high-volume specialists are started speculatively
+SPECULATIVE_USE_CASES = ["health_fitness", "notes_reminders"]
+
+_speculation_executor = ThreadPoolExecutor(max_workers=SPECULATIVE_MAX_WORKERS, thread_name_prefix="speculation")
+_speculation_lock = threading.Lock()
+_speculation_stats = Counter()
+_routed_use_cases = Counter()
 
 # State definition
 class AgentState(TypedDict):
@@ -30,20 +57,21 @@ class AgentState(TypedDict):
     response: str
     metadata: dict
     next_agent: str
+    # template_then_llm: generates the LLM reply, scheduled once the turn is saved
+    upgrade: Optional[Callable[[], str]]
 
 
-# SUPERVISOR AGENT - Entry point that routes to specialized agents
-def supervisor_agent(state: AgentState) -> AgentState:
-    """Supervisor agent that classifies and routes messages to specialized agents"""
-    logger.info(f"Supervisor: Classifying message for user '{state['username']}'")
+VALID_USE_CASES = ["health_fitness", "notes_reminders", "summary_analytics", "motivation_wellbeing"]
 
-    message = state["message"]
 
-    # Add current datetime context
+def get_date_context():
+    """Current date and time line appended to agent system prompts"""
     now = datetime.now()
     current_datetime = now.strftime("%A, %B %d, %Y at %I:%M %p")
-    date_context = f"\n\nCurrent date and time: {current_datetime}"
+    return f"\n\nCurrent date and time: {current_datetime}"
 
+def build_supervisor_messages(message):
+    """Messages for the supervisor's one-word classification call"""
     system_prompt = f"""You are a supervisor routing messages to specialized agents.
 
 Classify the user's message into ONE category:
@@ -58,65 +86,66 @@ Keywords:
 - summary_analytics: "summary", "what did i do", "recap", "insights", "progress"
 - motivation_wellbeing: "motivate", "inspire", "morning", "feeling", "mood"
 
-Respond with ONLY ONE WORD: health_fitness, notes_reminders, summary_analytics, or motivation_wellbeing.{date_context}"""
+Respond with ONLY ONE WORD: health_fitness, notes_reminders, summary_analytics, or motivation_wellbeing.{get_date_context()}"""
 
-    messages = [
+    return [
         SystemMessage(content=system_prompt),
         HumanMessage(content=message)
     ]
 
-    response = llm.invoke(messages)
-    use_case = response.content.strip().lower()
-
-    valid_cases = ["health_fitness", "notes_reminders", "summary_analytics", "motivation_wellbeing"]
-    if use_case not in valid_cases:
+def parse_use_case(content):
+    """Validate the supervisor's answer, defaulting to notes_reminders"""
+    use_case = content.strip().lower()
+    if use_case not in VALID_USE_CASES:
         logger.warning(f"Supervisor: Invalid use case '{use_case}', defaulting to notes_reminders")
         use_case = "notes_reminders"
+    return use_case
 
-    logger.info(f"Supervisor: Routed to '{use_case}' agent")
-
-    state["use_case"] = use_case
-    state["next_agent"] = use_case
-
-    return state
+def build_turn_messages(username, instructions, conversation_history, message, node="default"):
+    """Messages for a single structured extraction + reply call"""
+    system_prompt = f"""You are Nomi, {username}'s PA.
 
+{instructions}{get_date_context()}"""
 
-# HEALTH/FITNESS AGENT
-def health_fitness_agent(state: AgentState) -> AgentState:
-    """Agent specialized in handling health and fitness messages"""
-    logger.info(f"HealthAgent: Processing workout for '{state['username']}'")
-
-    username = state["username"]
-    message = state["message"]
-    conversation_history = state.get("conversation_history", [])
+    messages = [SystemMessage(content=system_prompt)]
+    messages.extend(history_to_messages(conversation_history, node))
+    messages.append(HumanMessage(content=message))
+    return messages
 
-    # Add current datetime
-    now = datetime.now()
-    current_datetime = now.strftime("%A, %B %d, %Y at %I:%M %p")
-    date_context = f"\n\nCurrent date and time: {current_datetime}"
+def invoke_structured_turn(node, schema, messages):
+    """Extract metadata and generate the reply in one structured LLM call (None on failure)"""
+    try:
+        return get_llm(node).with_structured_output(schema).invoke(messages)
+    except Exception as e:
+        logger.warning(f"Structured {schema.__name__} call failed, falling back to two calls: {e}")
+        return None
 
-    # Parse workout details
+def build_workout_parse_messages(message):
+    """Messages for extracting workout JSON"""
     parse_system = f"""Extract workout info from the message.
-Return JSON: {{"activity": "exercise type", "duration": "time/reps", "details": "context"}}.{date_context}"""
+Return JSON: {{"activity": "exercise type", "duration": "time/reps", "details": "context"}}.{get_date_context()}"""
 
-    parse_messages = [
+    return [
         SystemMessage(content=parse_system),
         HumanMessage(content=message)
     ]
 
+def parse_workout_json(content, message):
+    """Parse workout JSON into (activity, duration, details) with a safe fallback"""
     import json
-    parse_response = llm.invoke(parse_messages)
     try:
-        workout_data = json.loads(parse_response.content)
-        activity = workout_data.get("activity", "workout")
-        duration = workout_data.get("duration", "")
-        details = workout_data.get("details", "")
-    except:
-        activity = "workout"
-        duration = ""
-        details = message
-
-    # Generate response
+        workout_data = json.loads(content)
+        return (
+            workout_data.get("activity", "workout"),
+            workout_data.get("duration", ""),
+            workout_data.get("details", "")
+        )
+    except Exception:
+        metrics.JSON_FALLBACKS.labels("parse_workout_json").inc()
+        return "workout", "", message
+
+def build_workout_reply_messages(username, conversation_history, logged):
+    """Messages for the short workout acknowledgement"""
     response_system = f"""You are Nomi, {username}'s PA.
 
 CRITICAL: Keep responses SHORT - max 8-10 words.
@@ -126,23 +155,217 @@ Rules:
 - ONE short sentence only
 - End with ✓
 - NO explanations, NO tips, NO extra encouragement
-- If they mentioned it earlier, briefly acknowledge: "You did it!" ✓{date_context}"""
+- If they mentioned it earlier, briefly acknowledge: "You did it!" ✓{get_date_context()}"""
 
     response_messages = [SystemMessage(content=response_system)]
+    response_messages.extend(history_to_messages(conversation_history, "health_fitness"))
+    response_messages.append(HumanMessage(content=f"{username} logged: {logged}"))
+    return response_messages
+
+def build_note_parse_messages(message):
+    """Messages for extracting note JSON (5-7 word summary and reminder)"""
+    parse_system = f"""Extract note info from the message. Summarize it in 5-7 words, be specific.
+Return JSON: {{"summary": "5-7 word summary", "has_reminder": true/false, "reminder_time": "when, if mentioned", "tags": ["keywords"]}}.{get_date_context()}"""
+    return [
+        SystemMessage(content=parse_system),
+        HumanMessage(content=message)
+    ]
+
+def parse_note_json(content, message):
+    """Parse note JSON into note metadata with a safe fallback"""
+    import json
+    try:
+        note_data = json.loads(content)
+        return {
+            "summary": note_data.get("summary", ""),
+            "full_content": message,
+            "has_reminder": bool(note_data.get("has_reminder", False)),
+            "reminder_time": note_data.get("reminder_time", ""),
+            "tags": note_data.get("tags", [])
+        }
+    except Exception:
+        metrics.JSON_FALLBACKS.labels("parse_note_json").inc()
+        return {"summary": message[:50], "full_content": message, "has_reminder": False, "reminder_time": "", "tags": []}
 
-    # Add conversation history
-    if conversation_history:
-        for msg in conversation_history[-8:]:
-            if msg["role"] == "user":
-                response_messages.append(HumanMessage(content=msg["content"]))
-            elif msg["role"] == "assistant":
-                response_messages.append(AIMessage(content=msg["content"]))
+def build_note_reply_messages(username, conversation_history, noted):
+    """Messages for the short note acknowledgement"""
+    response_system = f"""You are Nomi, {username}'s PA.
 
-    response_messages.append(HumanMessage(content=f"{username} logged: {activity} ({duration})"))
+CRITICAL: Keep responses VERY SHORT - max 5-6 words.
 
-    response = llm.invoke(response_messages)
+Rules:
+- Just acknowledge: "Got it ✓" or "Saved ✓"
+- NO elaboration, NO explanations
+- End with ✓{get_date_context()}"""
 
-    state["response"] = response.content.strip()
+    response_messages = [SystemMessage(content=response_system)]
+    response_messages.extend(history_to_messages(conversation_history, "notes_reminders"))
+    response_messages.append(HumanMessage(content=f"{username} noted: {noted}"))
+    return response_messages
+
+
+# SPECULATIVE EXECUTION HELPERS
+def predict_use_case(message):
+    """Best local guess at the specialist - classifier first, then observed traffic prior"""
+    from classifier import get_classifier
+
+    use_case, _ = get_classifier().predict(message)
+    if use_case:
+        return use_case
+
+    with _speculation_lock:
+        if _routed_use_cases:
+            return _routed_use_cases.most_common(1)[0][0]
+    return "health_fitness"
+
+def record_speculation(outcome, use_case):
+    """Count a speculation outcome (fast_path, win, waste, waste_running, skipped)"""
+    with _speculation_lock:
+        _speculation_stats[outcome] += 1
+        _routed_use_cases[use_case] += 1
+
+def get_speculation_stats():
+    """Get speculative execution win/waste counters"""
+    with _speculation_lock:
+        stats = {key: _speculation_stats.get(key, 0) for key in ("fast_path", "win", "waste", "waste_running", "skipped")}
+    speculated = stats["win"] + stats["waste"] + stats["waste_running"]
+    stats["win_rate"] = stats["win"] / speculated if speculated else 0.0
+    return stats
+
+def _without_reply_stream(config):
+    """Copy a run config without LangGraph's message stream handler (other callbacks are kept)"""
+    callbacks = (config or {}).get("callbacks")
+    if callbacks is None:
+        return config
+    if isinstance(callbacks, list):
+        callbacks = [handler for handler in callbacks if not isinstance(handler, StreamMessagesHandler)]
+    else:
+        callbacks = callbacks.copy()
+        for handler in list(callbacks.handlers):
+            if isinstance(handler, StreamMessagesHandler):
+                callbacks.remove_handler(handler)
+    return {**config, "callbacks": callbacks}
+
+def _run_detached(agent, state):
+    """Run a specialist without the reply stream, so a discarded run streams no tokens"""
+    var_child_runnable_config.set(_without_reply_stream(var_child_runnable_config.get()))
+    return agent(state)
+
+def start_speculation(state):
+    """Start the predicted specialist on a worker thread, returns (predicted, future) or None"""
+    predicted = predict_use_case(state["message"])
+    if predicted not in SPECULATIVE_USE_CASES:
+        return None
+    context = contextvars.copy_context()
+    return predicted, _speculation_executor.submit(context.run, _run_detached, SPECIALISTS[predicted], dict(state))
+
+def finish_speculation(speculation, use_case):
+    """Commit the speculative result if the supervisor agrees, returns it or None to run normally"""
+    predicted, future = speculation
+    if use_case != predicted:
+        if future.cancel():
+            logger.info(f"Speculation: '{predicted}' discarded before it started, supervisor chose '{use_case}'")
+            record_speculation("waste", use_case)
+        else:
+            # A running thread cannot be stopped - its LLM calls still complete
+            logger.info(f"Speculation: '{predicted}' discarded while running, supervisor chose '{use_case}'")
+            record_speculation("waste_running", use_case)
+        return None
+    if future.cancel():
+        # Never got a worker - running it now is no slower
+        record_speculation("skipped", use_case)
+        return None
+
+    try:
+        result = future.result()
+    except Exception as e:
+        logger.warning(f"Speculation: '{predicted}' failed, running it normally: {e}")
+        record_speculation("waste", use_case)
+        return None
+
+    logger.info(f"Speculation: '{predicted}' committed")
+    record_speculation("win", use_case)
+    return result
+
+
+# SUPERVISOR AGENT - Entry point that routes to specialized agents
+def supervisor_agent(state: AgentState) -> AgentState:
+    """Supervisor agent that classifies and routes messages to specialized agents"""
+    logger.info(f"Supervisor: Classifying message for user '{state['username']}'")
+
+    message = state["message"]
+
+    # Fast path - answer confidently classified messages locally
+    use_case = fast_classify(message)
+    if use_case:
+        logger.info(f"Supervisor: Routed to '{use_case}' agent (fast path)")
+        if SPECULATIVE_MODE:
+            record_speculation("fast_path", use_case)
+        state["use_case"] = use_case
+        state["next_agent"] = use_case
+        return state
+
+    speculation = start_speculation(state) if SPECULATIVE_MODE else None
+
+    response = get_llm("supervisor").invoke(build_supervisor_messages(message))
+    use_case = parse_use_case(response.content)
+
+    logger.info(f"Supervisor: Routed to '{use_case}' agent")
+
+    state["use_case"] = use_case
+    state["next_agent"] = use_case
+
+    if speculation:
+        result = finish_speculation(speculation, use_case)
+        if result is not None:
+            # Committed - the specialist already ran
+            for key in ("response", "metadata", "upgrade"):
+                state[key] = result.get(key)
+            state["next_agent"] = "end"
+
+    return state
+
+
+# HEALTH/FITNESS AGENT
+def health_fitness_agent(state: AgentState) -> AgentState:
+    """Agent specialized in handling health and fitness messages"""
+    logger.info(f"HealthAgent: Processing workout for '{state['username']}'")
+
+    username = state["username"]
+    message = state["message"]
+    conversation_history = state.get("conversation_history", [])
+    llm = get_llm("health_fitness")
+
+    ack_mode = get_ack_mode("health_fitness")
+
+    # Single-call mode: extraction + reply in one structured response
+    if SINGLE_CALL_MODE and ack_mode == "llm":
+        turn_messages = build_turn_messages(username, WORKOUT_TURN_INSTRUCTIONS, conversation_history, message, "health_fitness")
+        turn = invoke_structured_turn("health_fitness", WorkoutTurn, turn_messages)
+        if turn is not None:
+            state["response"] = turn.reply.strip()
+            state["metadata"] = turn.model_dump(exclude={"reply"})
+            state["next_agent"] = "end"
+            logger.info(f"HealthAgent: Generated response (single call)")
+            return state
+
+    # Parse workout details
+    parse_response = llm.invoke(build_workout_parse_messages(message))
+    activity, duration, details = parse_workout_json(parse_response.content, message)
+
+    # Generate response
+    response_messages = build_workout_reply_messages(username, conversation_history, f"{activity} ({duration})")
+
+    upgrade = None
+    if ack_mode == "llm":
+        response = llm.invoke(response_messages, config=REPLY_CONFIG).content.strip()
+    else:
+        response = render_workout_ack(activity, duration)
+        if ack_mode == "template_then_llm":
+            upgrade = lambda: llm.invoke(response_messages).content.strip()
+
+    state["response"] = response
+    state["upgrade"] = upgrade
     state["metadata"] = {
         "activity": activity,
         "duration": duration,
@@ -162,51 +385,39 @@ def notes_reminders_agent(state: AgentState) -> AgentState:
     username = state["username"]
     message = state["message"]
     conversation_history = state.get("conversation_history", [])
+    llm = get_llm("notes_reminders")
 
-    # Add current datetime
-    now = datetime.now()
-    current_datetime = now.strftime("%A, %B %d, %Y at %I:%M %p")
-    date_context = f"\n\nCurrent date and time: {current_datetime}"
+    ack_mode = get_ack_mode("notes_reminders")
 
-    # Summarize note
-    summary_system = f"""Summarize the note in 5-7 words. Be specific.{date_context}"""
-    summary_messages = [
-        SystemMessage(content=summary_system),
-        HumanMessage(content=message)
-    ]
+    # Single-call mode: extraction + reply in one structured response
+    if SINGLE_CALL_MODE and ack_mode == "llm":
+        turn_messages = build_turn_messages(username, NOTE_TURN_INSTRUCTIONS, conversation_history, message, "notes_reminders")
+        turn = invoke_structured_turn("notes_reminders", NoteTurn, turn_messages)
+        if turn is not None:
+            state["response"] = turn.reply.strip()
+            state["metadata"] = {**turn.model_dump(exclude={"reply"}), "full_content": message}
+            state["next_agent"] = "end"
+            logger.info(f"NotesAgent: Generated response (single call)")
+            return state
 
-    summary_response = llm.invoke(summary_messages)
-    summary = summary_response.content.strip()
+    # Summarize note and detect a reminder
+    parse_response = llm.invoke(build_note_parse_messages(message))
+    note = parse_note_json(parse_response.content, message)
 
     # Generate response
-    response_system = f"""You are Nomi, {username}'s PA.
-
-CRITICAL: Keep responses VERY SHORT - max 5-6 words.
-
-Rules:
-- Just acknowledge: "Got it ✓" or "Saved ✓"
-- NO elaboration, NO explanations
-- End with ✓{date_context}"""
+    response_messages = build_note_reply_messages(username, conversation_history, note["summary"])
 
-    response_messages = [SystemMessage(content=response_system)]
-
-    # Add conversation history
-    if conversation_history:
-        for msg in conversation_history[-8:]:
-            if msg["role"] == "user":
-                response_messages.append(HumanMessage(content=msg["content"]))
-            elif msg["role"] == "assistant":
-                response_messages.append(AIMessage(content=msg["content"]))
-
-    response_messages.append(HumanMessage(content=f"{username} noted: {summary}"))
-
-    response = llm.invoke(response_messages)
+    upgrade = None
+    if ack_mode == "llm":
+        response = llm.invoke(response_messages, config=REPLY_CONFIG).content.strip()
+    else:
+        response = render_note_ack(note["has_reminder"])
+        if ack_mode == "template_then_llm":
+            upgrade = lambda: llm.invoke(response_messages).content.strip()
 
-    state["response"] = response.content.strip()
-    state["metadata"] = {
-        "summary": summary,
-        "full_content": message
-    }
+    state["response"] = response
+    state["upgrade"] = upgrade
+    state["metadata"] = note
     state["next_agent"] = "end"
 
     logger.info(f"NotesAgent: Generated response")
@@ -220,34 +431,30 @@ def summary_analytics_agent(state: AgentState) -> AgentState:
 
     username = state["username"]
     message = state["message"]
+    llm = get_llm("summary_analytics")
 
-    from db import get_unified_entries
+    from db import get_day_totals, get_week_totals
 
     # Determine summary type
     message_lower = message.lower()
     if any(word in message_lower for word in ["week", "weekly", "past week", "last week"]):
         summary_type = "weekly"
-        today_date = date.today()
-        week_ago = today_date - timedelta(days=7)
-        entries = get_unified_entries(username, start_date=week_ago, end_date=today_date)
+        totals = get_week_totals(username)
     elif any(word in message_lower for word in ["insight", "pattern", "trend", "progress", "analysis"]):
         summary_type = "insights"
-        today_date = date.today()
-        week_ago = today_date - timedelta(days=7)
-        entries = get_unified_entries(username, start_date=week_ago, end_date=today_date)
+        totals = get_week_totals(username)
     else:
         summary_type = "daily"
-        today_date = date.today()
-        entries = get_unified_entries(username, start_date=today_date)
+        totals = get_day_totals(username)
 
-    if not entries:
+    if not totals["total"]:
         state["response"] = "Nothing logged yet."
         state["metadata"] = {"count": 0, "period": summary_type}
         state["next_agent"] = "end"
         return state
 
-    health_count = len([e for e in entries if e.get("use_case") == "health_fitness"])
-    notes_count = len([e for e in entries if e.get("use_case") == "notes_reminders"])
+    health_count = totals["use_cases"]["health_fitness"]
+    notes_count = totals["use_cases"]["notes_reminders"]
 
     # Add current datetime
     now = datetime.now()
@@ -263,7 +470,7 @@ Rules:
 - Celebrate briefly, no elaboration
 - Mention key activities in ONE sentence
 - End with ✓
-- NO lengthy praise, NO extra encouragement{date_context}"""
+- NO lengthy praise, NO extra encouragement{date_context}{profile_context(username)}"""
 
     prompt = f"""Review {username}'s {summary_type}:
 - {health_count} workouts
@@ -276,11 +483,11 @@ Respond in max 2-3 short sentences."""
         HumanMessage(content=prompt)
     ]
 
-    response = llm.invoke(messages)
+    response = llm.invoke(messages, config=REPLY_CONFIG)
 
     state["response"] = response.content.strip()
     state["metadata"] = {
-        "count": len(entries),
+        "count": totals["total"],
         "health_count": health_count,
         "notes_count": notes_count,
         "period": summary_type
@@ -299,12 +506,16 @@ def motivation_wellbeing_agent(state: AgentState) -> AgentState:
     username = state["username"]
     message = state["message"]
     conversation_history = state.get("conversation_history", [])
+    llm = get_llm("motivation_wellbeing")
 
     # Add current datetime
     now = datetime.now()
     current_datetime = now.strftime("%A, %B %d, %Y at %I:%M %p")
     date_context = f"\n\nCurrent date and time: {current_datetime}"
 
+    # Long-term profile instead of re-reading raw history
+    profile = profile_context(username)
+
     # Determine support type
     message_lower = message.lower()
     if any(word in message_lower for word in ["morning", "good morning", "start day"]):
@@ -322,7 +533,7 @@ CRITICAL: Keep responses SHORT - max 8-10 words.
 Rules:
 - Greet briefly: "Morning! Let's crush today!"
 - End with ✓ or 💪
-- NO lengthy motivation, NO elaboration{date_context}"""
+- NO lengthy motivation, NO elaboration{date_context}{profile}"""
 
         prompt = f"""Morning greeting for {username}.
 
@@ -337,7 +548,7 @@ Rules:
 - Brief reflection: "You've been consistent this week"
 - ONE key observation
 - End with brief encouragement and ✓
-- NO lengthy insights, NO elaboration{date_context}"""
+- NO lengthy insights, NO elaboration{date_context}{profile}"""
 
         prompt = f"""Reflect on {username}.
 
@@ -352,7 +563,7 @@ Rules:
 - Brief encouragement: "You've got this!"
 - Direct address only
 - End with ✓ or 💪
-- NO lengthy support, NO elaboration{date_context}"""
+- NO lengthy support, NO elaboration{date_context}{profile}"""
 
         prompt = f"""{username} said: "{message}"
 
@@ -360,17 +571,12 @@ Respond in max 8-10 words."""
 
     messages = [SystemMessage(content=system_prompt)]
 
-    # Add conversation history
-    if conversation_history:
-        for msg in conversation_history[-8:]:
-            if msg["role"] == "user":
-                messages.append(HumanMessage(content=msg["content"]))
-            elif msg["role"] == "assistant":
-                messages.append(AIMessage(content=msg["content"]))
+    # Add conversation history (packed into the node's token budget)
+    messages.extend(history_to_messages(conversation_history, "motivation_wellbeing"))
 
     messages.append(HumanMessage(content=prompt))
 
-    response = llm.invoke(messages)
+    response = llm.invoke(messages, config=REPLY_CONFIG)
 
     state["response"] = response.content.strip()
     state["metadata"] = {
@@ -390,6 +596,14 @@ def route_to_agent(state: AgentState) -> Literal["health_fitness", "notes_remind
     return next_agent
 
 
+SPECIALISTS = {
+    "health_fitness": instrument_node("health_fitness", health_fitness_agent),
+    "notes_reminders": instrument_node("notes_reminders", notes_reminders_agent),
+    "summary_analytics": instrument_node("summary_analytics", summary_analytics_agent),
+    "motivation_wellbeing": instrument_node("motivation_wellbeing", motivation_wellbeing_agent)
+}
+
+
 # BUILD LANGGRAPH WORKFLOW
 def build_workflow():
     """Build the LangGraph workflow with supervisor and specialized agents"""
@@ -397,12 +611,10 @@ def build_workflow():
 
     workflow = StateGraph(AgentState)
 
-    # Add nodes
-    workflow.add_node("supervisor", supervisor_agent)
-    workflow.add_node("health_fitness", health_fitness_agent)
-    workflow.add_node("notes_reminders", notes_reminders_agent)
-    workflow.add_node("summary_analytics", summary_analytics_agent)
-    workflow.add_node("motivation_wellbeing", motivation_wellbeing_agent)
+    # Add nodes (each run is a telemetry span)
+    workflow.add_node("supervisor", instrument_node("supervisor", supervisor_agent))
+    for use_case, agent in SPECIALISTS.items():
+        workflow.add_node(use_case, agent)
 
     # Set entry point
     workflow.set_entry_point("supervisor")
@@ -435,3 +647,359 @@ def build_workflow():
 
 # Main workflow instance
 nomi_workflow = build_workflow()
+
+
+# STREAMING
+class WorkflowStream:
+    """Iterate reply tokens from a workflow run - final_state is set once exhausted
+
+    Usable directly with st.write_stream. Replies that are not generated
+    token-by-token (templates, structured output, fallbacks) are yielded whole.
+    """
+
+    def __init__(self, initial_state, workflow=None):
+        self.initial_state = initial_state
+        self.workflow = workflow or nomi_workflow
+        self.final_state = None
+
+    def __iter__(self):
+        streamed = False
+        for mode, payload in self.workflow.stream(self.initial_state, stream_mode=["messages", "values"]):
+            if mode == "values":
+                self.final_state = payload
+                continue
+
+            chunk, metadata = payload
+            if REPLY_TAG in metadata.get("tags", []):
+                text = chunk.text
+                if text:
+                    streamed = True
+                    yield text
+
+        if not streamed and self.final_state:
+            yield self.final_state["response"]
+
+    @property
+    def response(self):
+        return self.final_state["response"] if self.final_state else ""
+
+
+# ASYNC AGENTS - nodes return partial state updates so branches can run in parallel
+async def load_context_agent(state: AgentState) -> dict:
+    """Load recent conversation history when the caller did not provide it"""
+    if state.get("conversation_history") is not None:
+        return {}
+
+    from db import get_recent_conversation_async
+
+    conversation_history = await get_recent_conversation_async(state["username"], max_messages=CONTEXT_MAX_MESSAGES, hours=24)
+    conversation_history = await asyncio.to_thread(with_summary, state["username"], conversation_history)
+    logger.info(f"ContextAgent: Loaded {len(conversation_history)} messages")
+    return {"conversation_history": conversation_history}
+
+
+async def supervisor_agent_async(state: AgentState) -> dict:
+    """Async supervisor - classification runs alongside context loading"""
+    logger.info(f"Supervisor: Classifying message for user '{state['username']}'")
+
+    message = state["message"]
+
+    use_case = fast_classify(message)
+    if use_case:
+        logger.info(f"Supervisor: Routed to '{use_case}' agent (fast path)")
+    else:
+        use_case = await classify_with_llm_async(message)
+
+    return {"use_case": use_case, "next_agent": use_case}
+
+
+async def classify_with_llm_async(message):
+    """LLM supervisor classification (no fast path)"""
+    response = await get_llm("supervisor").ainvoke(build_supervisor_messages(message))
+    use_case = parse_use_case(response.content)
+    logger.info(f"Supervisor: Routed to '{use_case}' agent")
+    return use_case
+
+
+async def invoke_structured_turn_async(node, schema, messages):
+    """Async variant of invoke_structured_turn (None on failure)"""
+    try:
+        return await get_llm(node).with_structured_output(schema).ainvoke(messages)
+    except Exception as e:
+        logger.warning(f"Structured {schema.__name__} call failed, falling back to two calls: {e}")
+        return None
+
+
+async def health_fitness_agent_async(state: AgentState) -> dict:
+    """Async health agent - parse and reply calls run concurrently"""
+    logger.info(f"HealthAgent: Processing workout for '{state['username']}'")
+
+    username = state["username"]
+    message = state["message"]
+    conversation_history = state.get("conversation_history") or []
+    llm = get_llm("health_fitness")
+
+    ack_mode = get_ack_mode("health_fitness")
+
+    if SINGLE_CALL_MODE and ack_mode == "llm":
+        turn_messages = build_turn_messages(username, WORKOUT_TURN_INSTRUCTIONS, conversation_history, message, "health_fitness")
+        turn = await invoke_structured_turn_async("health_fitness", WorkoutTurn, turn_messages)
+        if turn is not None:
+            logger.info(f"HealthAgent: Generated response (single call)")
+            return {
+                "response": turn.reply.strip(),
+                "metadata": turn.model_dump(exclude={"reply"}),
+                "next_agent": "end"
+            }
+
+    parse_messages = build_workout_parse_messages(message)
+    # The reply is generated from the raw message so it doesn't wait on the parse
+    response_messages = build_workout_reply_messages(username, conversation_history, message)
+
+    upgrade = None
+    if ack_mode == "llm":
+        parse_response, reply = await asyncio.gather(
+            llm.ainvoke(parse_messages),
+            llm.ainvoke(response_messages, config=REPLY_CONFIG)
+        )
+        activity, duration, details = parse_workout_json(parse_response.content, message)
+        response = reply.content.strip()
+    else:
+        parse_response = await llm.ainvoke(parse_messages)
+        activity, duration, details = parse_workout_json(parse_response.content, message)
+        response = render_workout_ack(activity, duration)
+        if ack_mode == "template_then_llm":
+            upgrade = lambda: llm.invoke(response_messages).content.strip()
+
+    logger.info(f"HealthAgent: Generated response")
+    return {
+        "response": response,
+        "metadata": {"activity": activity, "duration": duration, "details": details},
+        "next_agent": "end",
+        "upgrade": upgrade
+    }
+
+
+async def notes_reminders_agent_async(state: AgentState) -> dict:
+    """Async notes agent - summary and reply calls run concurrently"""
+    logger.info(f"NotesAgent: Processing note for '{state['username']}'")
+
+    username = state["username"]
+    message = state["message"]
+    conversation_history = state.get("conversation_history") or []
+    llm = get_llm("notes_reminders")
+
+    ack_mode = get_ack_mode("notes_reminders")
+
+    if SINGLE_CALL_MODE and ack_mode == "llm":
+        turn_messages = build_turn_messages(username, NOTE_TURN_INSTRUCTIONS, conversation_history, message, "notes_reminders")
+        turn = await invoke_structured_turn_async("notes_reminders", NoteTurn, turn_messages)
+        if turn is not None:
+            logger.info(f"NotesAgent: Generated response (single call)")
+            return {
+                "response": turn.reply.strip(),
+                "metadata": {**turn.model_dump(exclude={"reply"}), "full_content": message},
+                "next_agent": "end"
+            }
+
+    parse_messages = build_note_parse_messages(message)
+    # The reply is generated from the raw message so it doesn't wait on the parse
+    response_messages = build_note_reply_messages(username, conversation_history, message)
+
+    upgrade = None
+    if ack_mode == "llm":
+        parse_response, reply = await asyncio.gather(
+            llm.ainvoke(parse_messages),
+            llm.ainvoke(response_messages, config=REPLY_CONFIG)
+        )
+        note = parse_note_json(parse_response.content, message)
+        response = reply.content.strip()
+    else:
+        parse_response = await llm.ainvoke(parse_messages)
+        note = parse_note_json(parse_response.content, message)
+        response = render_note_ack(note["has_reminder"])
+        if ack_mode == "template_then_llm":
+            upgrade = lambda: llm.invoke(response_messages).content.strip()
+
+    logger.info(f"NotesAgent: Generated response")
+    return {
+        "response": response,
+        "metadata": note,
+        "next_agent": "end",
+        "upgrade": upgrade
+    }
+
+
+def run_in_thread(agent):
+    """Wrap a sync agent as an async node that runs on a worker thread"""
+    async def node(state: AgentState) -> dict:
+        result = await asyncio.to_thread(agent, dict(state))
+        return {key: result[key] for key in ("response", "metadata", "next_agent")}
+
+    node.__name__ = f"{agent.__name__}_async"
+    return node
+
+
+ASYNC_SPECIALISTS = {
+    "health_fitness": instrument_node("health_fitness", health_fitness_agent_async),
+    "notes_reminders": instrument_node("notes_reminders", notes_reminders_agent_async),
+    "summary_analytics": instrument_node("summary_analytics", run_in_thread(summary_analytics_agent)),
+    "motivation_wellbeing": instrument_node("motivation_wellbeing", run_in_thread(motivation_wellbeing_agent))
+}
+
+
+# BUILD ASYNC LANGGRAPH WORKFLOW
+def build_async_workflow():
+    """Build the async workflow - context loading and supervisor run in parallel"""
+    logger.info("Building async LangGraph workflow")
+
+    workflow = StateGraph(AgentState)
+
+    workflow.add_node("load_context", instrument_node("load_context", load_context_agent))
+    workflow.add_node("supervisor", instrument_node("supervisor", supervisor_agent_async))
+    workflow.add_node("dispatch", lambda state: {})
+    for use_case, agent in ASYNC_SPECIALISTS.items():
+        workflow.add_node(use_case, agent)
+
+    # Fan out from START, join both branches before dispatching
+    workflow.add_edge(START, "load_context")
+    workflow.add_edge(START, "supervisor")
+    workflow.add_edge(["load_context", "supervisor"], "dispatch")
+
+    workflow.add_conditional_edges(
+        "dispatch",
+        route_to_agent,
+        {
+            "health_fitness": "health_fitness",
+            "notes_reminders": "notes_reminders",
+            "summary_analytics": "summary_analytics",
+            "motivation_wellbeing": "motivation_wellbeing",
+            "end": END
+        }
+    )
+
+    workflow.add_edge("health_fitness", END)
+    workflow.add_edge("notes_reminders", END)
+    workflow.add_edge("summary_analytics", END)
+    workflow.add_edge("motivation_wellbeing", END)
+
+    app = workflow.compile()
+
+    logger.info("Async LangGraph workflow built successfully")
+    return app
+
+
+# Async workflow instance
+nomi_async_workflow = build_async_workflow()
+
+
+# ASYNC SPECULATIVE EXECUTION
+async def run_speculative(initial_state):
+    """Run supervisor and predicted specialist concurrently, commit only if they agree"""
+    state = dict(initial_state)
+    message = state["message"]
+
+    classify_task = None
+    use_case = fast_classify(message)
+    if not use_case:
+        classify_task = asyncio.create_task(classify_with_llm_async(message))
+
+    if state.get("conversation_history") is None:
+        state.update(await load_context_agent(state))
+
+    if use_case:
+        # Confident local classification - nothing to speculate on
+        record_speculation("fast_path", use_case)
+        result = await ASYNC_SPECIALISTS[use_case](state)
+    else:
+        predicted = predict_use_case(message)
+        if predicted not in SPECULATIVE_USE_CASES:
+            use_case = await classify_task
+            record_speculation("skipped", use_case)
+            result = await ASYNC_SPECIALISTS[use_case](state)
+        else:
+            speculative_task = asyncio.create_task(ASYNC_SPECIALISTS[predicted](state))
+            try:
+                use_case = await classify_task
+            except BaseException:
+                speculative_task.cancel()
+                raise
+
+            if use_case == predicted:
+                try:
+                    result = await speculative_task
+                    logger.info(f"Speculation: '{predicted}' committed")
+                    record_speculation("win", use_case)
+                except Exception as e:
+                    logger.warning(f"Speculation: '{predicted}' failed, running it normally: {e}")
+                    record_speculation("waste", use_case)
+                    result = await ASYNC_SPECIALISTS[use_case](state)
+            else:
+                logger.info(f"Speculation: '{predicted}' discarded, supervisor chose '{use_case}'")
+                record_speculation("waste", use_case)
+                speculative_task.cancel()
+                result = await ASYNC_SPECIALISTS[use_case](state)
+
+    state.update(result)
+    state["use_case"] = use_case
+    return state
+
+
+async def handle_message_async(user_message, username, conversation_history=None, submission_id=None):
+    """Async entry point - run the workflow, save the user/assistant messages and the unified entry
+
+    Leave conversation_history as None to load it concurrently with classification.
+    Pass the client's submission_id so a retried submission is deduplicated.
+    """
+    from db import save_unified_entry_async, save_message_async
+    from turns import turn_cache
+
+    turn, is_new = turn_cache.begin(username, user_message, submission_id)
+    if not is_new:
+        reply = await asyncio.to_thread(turn.wait)
+        if reply is not None:
+            return reply
+        turn, _ = turn_cache.begin(username, user_message, turn.submission_id)
+
+    initial_state = {
+        "username": username,
+        "message": user_message,
+        "conversation_history": conversation_history,
+        "use_case": "",
+        "response": "",
+        "metadata": {},
+        "next_agent": ""
+    }
+
+    try:
+        with metrics.time_message("async") as timing, span("turn", kind="turn", mode="async") as turn_span:
+            await save_message_async(username, "user", user_message, turn_id=turn.turn_id)
+            if SPECULATIVE_MODE:
+                final_state = await run_speculative(initial_state)
+            else:
+                final_state = await nomi_async_workflow.ainvoke(initial_state)
+            logger.info(f"Async workflow completed - routed to {final_state['use_case']} agent")
+
+            entry = {
+                "username": username,
+                "message": user_message,
+                "response": final_state["response"],
+                "use_case": final_state["use_case"],
+                "metadata": final_state["metadata"],
+                "timestamp": datetime.now(),
+                "turn_id": turn.turn_id
+            }
+            await save_unified_entry_async(entry)
+            if final_state.get("upgrade"):
+                schedule_upgrade(username, turn.turn_id, final_state["upgrade"])
+            await save_message_async(username, "assistant", final_state["response"], turn_id=turn.turn_id)
+            schedule_summary_update(username)
+            timing["use_case"] = final_state["use_case"]
+            if turn_span:
+                turn_span.attributes["use_case"] = final_state["use_case"]
+    except Exception:
+        turn_cache.discard(turn)
+        raise
+
+    turn_cache.complete(turn, final_state["response"])
+    return final_state["response"]
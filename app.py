@@ -1,9 +1,14 @@
 import streamlit as st
 import logging
+import json
 from auth import verify_login, create_user, init_users_file
 from claude_handler import generate_login_greeting
-from agents import nomi_workflow
-from db import save_message, get_messages, get_unified_entries, get_entries_by_use_case, update_last_login, is_first_login_today, get_recent_conversation, save_unified_entry
+from db import get_unified_entries, get_entries_page, update_last_login, is_first_login_today, get_day_totals
+from conversation_cache import ConversationCache
+from turns import turn_cache, new_submission_id
+import chat
+import telemetry
+import metrics
 from datetime import datetime, date
 from styles import CUSTOM_CSS, get_hero_section, get_user_profile, get_quick_actions, get_workout_card, get_note_card
 
@@ -14,6 +19,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Cards per page in the Workouts and Notes views
+ENTRIES_PAGE_SIZE = 20
+
 # Page config
 st.set_page_config(
     page_title="Nomi - Personal Assistant",
@@ -35,57 +43,59 @@ if 'messages' not in st.session_state:
 if 'greeting_shown' not in st.session_state:
     st.session_state.greeting_shown = False
 
-# Initialize users file
+# Bootstrap database schema (no-op after the first run in this process)
 init_users_file()
 
+# Prometheus /metrics endpoint (started once per process)
+if metrics.METRICS_ENABLED:
+    metrics.start_http_server()
+
 def logout():
+    st.session_state.pop("conversation_cache", None)
+    st.session_state.pop("workouts_cursors", None)
+    st.session_state.pop("notes_cursors", None)
+    st.session_state.pop("pending_turn", None)
     st.session_state.logged_in = False
     st.session_state.username = None
     st.session_state.messages = []
     st.session_state.greeting_shown = False
 
+def get_conversation_cache(username):
+    """Get this session's conversation cache, creating it on first use"""
+    cache = st.session_state.get("conversation_cache")
+    if cache is None or cache.username != username:
+        cache = ConversationCache(username)
+        st.session_state.conversation_cache = cache
+    return cache
+
 def handle_message(user_message, username):
     """Process user message using LangGraph agentic workflow"""
-    logger.info(f"Processing message for user: {username}")
-
-    # Get recent conversation history for context (last 10 messages or 24 hours)
-    conversation_history = get_recent_conversation(username, max_messages=10, hours=24)
-    logger.info(f"Retrieved {len(conversation_history)} messages from conversation history")
-
-    # Prepare initial state for LangGraph workflow
-    initial_state = {
-        "username": username,
-        "message": user_message,
-        "conversation_history": conversation_history,
-        "use_case": "",
-        "response": "",
-        "metadata": {},
-        "next_agent": ""
-    }
-
-    # Invoke LangGraph workflow
-    logger.info("Invoking LangGraph workflow")
-    final_state = nomi_workflow.invoke(initial_state)
-    logger.info(f"Workflow completed - routed to {final_state['use_case']} agent")
-
-    # Extract results
-    response = final_state["response"]
-    metadata = final_state["metadata"]
-    use_case = final_state["use_case"]
-
-    # Save unified entry to database
-    entry = {
-        "username": username,
-        "message": user_message,
-        "response": response,
-        "use_case": use_case,
-        "metadata": metadata,
-        "timestamp": datetime.now()
-    }
-    save_unified_entry(entry)
-    logger.info(f"Saved unified entry to database")
-
-    return response
+    return chat.handle_message(user_message, username, get_conversation_cache(username))
+
+def stream_message(user_message, username):
+    """Process user message, streaming reply tokens (see agents.WorkflowStream)"""
+    return chat.stream_message(user_message, username, get_conversation_cache(username))
+
+def get_entry_page_for_view(key, use_case, view):
+    """Fetch the current page for a paginated view (cursor stack kept in session state)"""
+    cursors = st.session_state.setdefault(f"{key}_cursors", [None])
+    return get_entries_page(st.session_state.username, use_case=use_case, view=view,
+                            before=cursors[-1], page_size=ENTRIES_PAGE_SIZE)
+
+def render_page_controls(key, next_cursor):
+    """Newer/Older buttons for a paginated view"""
+    cursors = st.session_state[f"{key}_cursors"]
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if len(cursors) > 1 and st.button("← Newer", key=f"{key}_newer", use_container_width=True):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        st.caption(f"Page {len(cursors)}")
+    with col3:
+        if next_cursor and st.button("Older →", key=f"{key}_older", use_container_width=True):
+            cursors.append(next_cursor)
+            st.rerun()
 
 # Login/Signup Page
 if not st.session_state.logged_in:
@@ -182,7 +192,10 @@ else:
         st.markdown("<div style='margin: 1rem 0;'></div>", unsafe_allow_html=True)
 
         st.markdown("<p style='color: #000000; font-size: 0.85rem; font-weight: 500;'>Views</p>", unsafe_allow_html=True)
-        tab = st.pills("Navigate", ["💬 Chat", "🏋️ Workouts", "📝 Notes", "📊 Summary"], label_visibility="collapsed", selection_mode="single", default="💬 Chat")
+        views = ["💬 Chat", "🏋️ Workouts", "📝 Notes", "📊 Summary"]
+        if telemetry.is_admin(st.session_state.username):
+            views.append("📈 Metrics")
+        tab = st.pills("Navigate", views, label_visibility="collapsed", selection_mode="single", default="💬 Chat")
 
         st.markdown("<div style='margin: 1.5rem 0;'></div>", unsafe_allow_html=True)
 
@@ -204,12 +217,7 @@ else:
 
         # Load chat history from DB on first load
         if not st.session_state.messages:
-            db_messages = get_messages(st.session_state.username)
-            for msg in db_messages:
-                st.session_state.messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
+            st.session_state.messages = get_conversation_cache(st.session_state.username).get_all()
 
         # Show greeting on first login
         if not st.session_state.greeting_shown:
@@ -224,7 +232,7 @@ else:
                 greeting = generate_login_greeting(st.session_state.username, day_of_week, hints)
 
             st.session_state.messages.append({"role": "assistant", "content": greeting})
-            save_message(st.session_state.username, "assistant", greeting)
+            get_conversation_cache(st.session_state.username).save("assistant", greeting)
             st.session_state.greeting_shown = True
 
         # Display chat messages
@@ -246,92 +254,96 @@ else:
 
         # Chat input - keep light for visibility
 
+        # A submission keeps its ID in session state until its reply is saved, so a
+        # rerun that interrupts it resumes the same turn instead of starting a new one
         if prompt := st.chat_input("Type your message..."):
-            # Add user message
+            st.session_state.pending_turn = {"submission_id": new_submission_id(), "prompt": prompt}
             st.session_state.messages.append({"role": "user", "content": prompt})
-            save_message(st.session_state.username, "user", prompt)
-
             with st.chat_message("user"):
                 st.markdown(prompt)
 
-            # Get response from agents with custom spinner
-            with st.spinner("🤔 Nomi is thinking..."):
-                response = handle_message(prompt, st.session_state.username)
-
-            st.session_state.messages.append({"role": "assistant", "content": response})
-            save_message(st.session_state.username, "assistant", response)
-
-            with st.chat_message("assistant"):
-                st.markdown(response)
-
+        if pending := st.session_state.get("pending_turn"):
+            prompt = pending["prompt"]
+            turn, is_new = turn_cache.begin(st.session_state.username, prompt, pending["submission_id"])
+
+            # Replayed submission - the original run already shows (or will show) the reply
+            if not is_new:
+                if turn.wait() is not None:
+                    st.session_state.pending_turn = None
+                    st.rerun()
+                turn, _ = turn_cache.begin(st.session_state.username, prompt, pending["submission_id"])
+
+            try:
+                get_conversation_cache(st.session_state.username).save("user", prompt, turn_id=turn.turn_id)
+
+                with metrics.time_message("stream") as timing, telemetry.span("turn", kind="turn", mode="stream") as turn_span:
+                    # Stream the reply from agents as it is generated
+                    with st.chat_message("assistant"):
+                        stream = stream_message(prompt, st.session_state.username)
+                        st.write_stream(stream)
+
+                    # Persist the full reply once the workflow has finished
+                    response = stream.response
+                    chat.save_turn_entry(prompt, st.session_state.username, stream.final_state, turn.turn_id)
+                    timing["use_case"] = stream.final_state["use_case"]
+                    if turn_span:
+                        turn_span.attributes["use_case"] = stream.final_state["use_case"]
+
+                st.session_state.messages.append({"role": "assistant", "content": response})
+                get_conversation_cache(st.session_state.username).save("assistant", response, turn_id=turn.turn_id)
+            except Exception:
+                turn_cache.discard(turn)
+                st.session_state.pending_turn = None
+                raise
+            except BaseException:
+                # Streamlit's stop/rerun control exceptions mid-stream - the next run resumes the turn
+                turn_cache.discard(turn)
+                raise
+
+            st.session_state.pending_turn = None
+            turn_cache.complete(turn, response)
             st.rerun()
 
     elif tab == "🏋️ Workouts":
         pass
 
-        # Get health/fitness entries
-        entries = get_entries_by_use_case(st.session_state.username, "health_fitness")
+        # Get one page of health/fitness entries
+        entries, next_cursor = get_entry_page_for_view("workouts", "health_fitness", "workout_card")
 
         if entries:
+            cards = []
             for entry in entries:
-                metadata = entry.get('metadata', {})
+                metadata = entry.metadata
                 activity = metadata.get('activity', 'workout')
                 duration = metadata.get('duration', '')
-                intensity = metadata.get('intensity', '')
                 details = metadata.get('details', '')
-                timestamp = entry['timestamp'].strftime('%b %d, %I:%M %p')
-
-                # Complete card in one HTML block
-                card_html = f"""
-                <div style='background-color: #FAF8F5; padding: 1.5rem; border-radius: 12px;
-                            margin-bottom: 1rem; box-shadow: 0 2px 4px rgba(0,0,0,0.05);
-                            border-left: 4px solid #CC785C;'>
-                    <div style='display: flex; justify-content: space-between; align-items: start;'>
-                        <div style='flex: 1;'>
-                            <p style='color: #000000; font-size: 1rem; font-weight: 600; margin: 0 0 0.5rem 0;'>💪 {activity.title()}</p>
-                            {f"<p style='color: #666; font-size: 0.9rem; margin: 0.25rem 0;'>⏱️ {duration}</p>" if duration else ""}
-                            {f"<p style='color: #888; font-size: 0.85rem; margin: 0.25rem 0;'>{details}</p>" if details else ""}
-                        </div>
-                        <div style='text-align: right; margin-left: 1rem;'>
-                            <p style='color: #999; font-size: 0.8rem; margin: 0;'>{timestamp}</p>
-                        </div>
-                    </div>
-                </div>
-                """
-                st.markdown(card_html, unsafe_allow_html=True)
+                timestamp = entry.timestamp.strftime('%b %d, %I:%M %p')
+                cards.append(get_workout_card(activity, duration, details, timestamp))
+
+            # Whole page in one HTML block
+            st.markdown("".join(cards), unsafe_allow_html=True)
+            render_page_controls("workouts", next_cursor)
         else:
             st.info("💡 No workouts logged yet. Start by saying 'Did 30 pushups' in chat!")
 
     elif tab == "📝 Notes":
         pass
 
-        # Get notes/reminders entries
-        entries = get_entries_by_use_case(st.session_state.username, "notes_reminders")
+        # Get one page of notes/reminders entries
+        entries, next_cursor = get_entry_page_for_view("notes", "notes_reminders", "note_card")
 
         if entries:
+            cards = []
             for entry in entries:
-                metadata = entry.get('metadata', {})
-                summary = metadata.get('summary', entry.get('message', ''))
-                full_message = entry.get('message', '')
-                timestamp = entry['timestamp'].strftime('%b %d, %I:%M %p')
-
-                # Complete card in one HTML block
-                card_html = f"""
-                <div style='background-color: #FAF8F5; padding: 1.5rem; border-radius: 12px;
-                            margin-bottom: 1rem; box-shadow: 0 2px 4px rgba(0,0,0,0.05);
-                            border-left: 4px solid #E89B7B;'>
-                    <div style='display: flex; justify-content: space-between; align-items: start;'>
-                        <div style='flex: 1;'>
-                            <p style='color: #000000; font-size: 1rem; font-weight: 600; margin: 0 0 0.5rem 0;'>📝 {summary}</p>
-                            {f"<p style='color: #666; font-size: 0.9rem; margin: 0.25rem 0;'>{full_message}</p>" if full_message and full_message != summary else ""}
-                        </div>
-                        <div style='text-align: right; margin-left: 1rem;'>
-                            <p style='color: #999; font-size: 0.8rem; margin: 0;'>{timestamp}</p>
-                        </div>
-                    </div>
-                </div>
-                """
-                st.markdown(card_html, unsafe_allow_html=True)
+                metadata = entry.metadata
+                summary = metadata.get('summary', entry.message or '')
+                full_message = entry.message or ''
+                timestamp = entry.timestamp.strftime('%b %d, %I:%M %p')
+                cards.append(get_note_card(summary, full_message, timestamp))
+
+            # Whole page in one HTML block
+            st.markdown("".join(cards), unsafe_allow_html=True)
+            render_page_controls("notes", next_cursor)
         else:
             st.info("💡 No notes logged yet. Start by saying 'Note: meeting with team' in chat!")
 
@@ -340,13 +352,15 @@ else:
 
         # Get all entries for today
         today = date.today()
-        entries = get_unified_entries(st.session_state.username, start_date=today, end_date=today)
+        totals = get_day_totals(st.session_state.username, today)
+
+        if totals["total"]:
+            entries = get_unified_entries(st.session_state.username, start_date=today, end_date=today, view="summary_list")
 
-        if entries:
             # Categorize entries
-            health_entries = [e for e in entries if e.get("use_case") == "health_fitness"]
-            note_entries = [e for e in entries if e.get("use_case") == "notes_reminders"]
-            summary_entries = [e for e in entries if e.get("use_case") == "summary_analytics"]
+            health_entries = [e for e in entries if e.use_case == "health_fitness"]
+            note_entries = [e for e in entries if e.use_case == "notes_reminders"]
+            summary_entries = [e for e in entries if e.use_case == "summary_analytics"]
 
             st.markdown("### Today's Activity")
 
@@ -357,21 +371,21 @@ else:
                     <p style='font-size: 2rem; margin: 0; color: #CC785C;'>{}</p>
                     <p style='font-size: 0.9rem; color: #666; margin: 0;'>Total Entries</p>
                 </div>
-                """.format(len(entries)), unsafe_allow_html=True)
+                """.format(totals["total"]), unsafe_allow_html=True)
             with col2:
                 st.markdown("""
                 <div style='background-color: #F0F9FF; padding: 1.5rem; border-radius: 12px; text-align: center;'>
                     <p style='font-size: 2rem; margin: 0; color: #0284C7;'>💪 {}</p>
                     <p style='font-size: 0.9rem; color: #666; margin: 0;'>Workouts</p>
                 </div>
-                """.format(len(health_entries)), unsafe_allow_html=True)
+                """.format(totals["use_cases"]["health_fitness"]), unsafe_allow_html=True)
             with col3:
                 st.markdown("""
                 <div style='background-color: #FEF3C7; padding: 1.5rem; border-radius: 12px; text-align: center;'>
                     <p style='font-size: 2rem; margin: 0; color: #D97706;'>📝 {}</p>
                     <p style='font-size: 0.9rem; color: #666; margin: 0;'>Notes</p>
                 </div>
-                """.format(len(note_entries)), unsafe_allow_html=True)
+                """.format(totals["use_cases"]["notes_reminders"]), unsafe_allow_html=True)
 
             st.markdown("---")
 
@@ -381,7 +395,7 @@ else:
                 st.markdown("#### 🏋️ Workouts")
                 if health_entries:
                     for e in health_entries:
-                        metadata = e.get('metadata', {})
+                        metadata = e.metadata
                         st.write(f"- {metadata.get('activity', 'workout')} ({metadata.get('duration', '')})")
                 else:
                     st.caption("No workouts today")
@@ -390,8 +404,8 @@ else:
                 st.markdown("#### 📝 Notes")
                 if note_entries:
                     for e in note_entries:
-                        metadata = e.get('metadata', {})
-                        st.write(f"- {metadata.get('summary', e.get('message', ''))}")
+                        metadata = e.metadata
+                        st.write(f"- {metadata.get('summary', e.message or '')}")
                 else:
                     st.caption("No notes today")
 
@@ -399,6 +413,21 @@ else:
             if summary_entries:
                 st.markdown("---")
                 st.markdown("### Latest Summary")
-                st.info(summary_entries[0].get('response', ''))
+                st.info(summary_entries[0].response or '')
         else:
             st.info("Nothing logged yet today. Start chatting with Nomi to track your day!")
+
+    elif tab == "📈 Metrics" and telemetry.is_admin(st.session_state.username):
+        st.markdown("### 📈 Metrics")
+        st.caption("Per-span latency, tokens, cache hits and DB calls for this server process")
+
+        snapshot = telemetry.get_metrics()
+        if snapshot["spans"]:
+            st.dataframe([{k: v for k, v in row.items() if k != "buckets"} for row in snapshot["spans"]], use_container_width=True)
+
+            st.markdown("#### Recent spans")
+            st.dataframe(list(reversed(snapshot["recent"])), use_container_width=True)
+
+            st.download_button("Download metrics JSON", json.dumps(snapshot, indent=2, default=str), file_name="nomi_metrics.json", mime="application/json")
+        else:
+            st.info("No spans recorded yet - send a chat message first.")
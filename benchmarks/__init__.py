@@ -0,0 +1,10 @@
+"""
+Offline benchmarks for the Nomi chat pipeline
+
+Runs the real agents, handlers and db.py code against a deterministic fake
+LLM (benchmarks/fake_llm.py) and an in-process MongoDB stand-in
+(benchmarks/fake_db.py) - no Anthropic key or MongoDB server needed.
+
+Usage (from the repo root):
+    python -m benchmarks.run_benchmarks --help
+"""
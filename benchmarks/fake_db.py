@@ -0,0 +1,277 @@
+"""
+Fake DB - In-process MongoDB stand-in with round-trip counting
+
+install_fake_db() registers a mongomock client in db._clients, wrapped so
+every collection operation is counted. install_counting_db(uri) does the
+same for a real server using a pymongo command listener. Either way,
+db.py runs unmodified.
+
+Connection pool contention is recorded in DBStats: from pymongo pool events
+on a real server, or from a simulated pool (a semaphore of pool_size slots,
+held for each operation plus optional op_latency) in process.
+"""
+import time
+import threading
+from collections import Counter
+from pymongo import InsertOne, UpdateOne, MongoClient, monitoring
+from pymongo.monitoring import ConnectionCheckOutFailedReason
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+import db
+import telemetry
+
+# Collection methods that cost one round trip
+COUNTED_OPS = {
+    "find", "find_one", "insert_one", "insert_many", "update_one", "update_many",
+    "replace_one", "delete_one", "delete_many", "find_one_and_update", "aggregate",
+    "count_documents", "distinct", "bulk_write", "create_index"
+}
+
+
+class DBStats:
+    """Thread-safe counters of DB operations, time spent and concurrency"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.ops = Counter()
+            self.seconds = 0.0
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self.pool_checkouts = 0
+            self.pool_wait_seconds = 0.0
+            self.max_pool_wait = 0.0
+            self.pool_timeouts = 0
+
+    def pool_wait(self, seconds, timed_out=False):
+        """Record one connection checkout and how long it waited"""
+        with self._lock:
+            self.pool_checkouts += 1
+            self.pool_wait_seconds += seconds
+            self.max_pool_wait = max(self.max_pool_wait, seconds)
+            if timed_out:
+                self.pool_timeouts += 1
+
+    def start(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def finish(self, op, seconds):
+        with self._lock:
+            self.in_flight -= 1
+            self.ops[op] += 1
+            self.seconds += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return Counter(self.ops)
+
+
+class UpdateResult:
+    """Minimal BulkWriteResult for the mongomock bulk_write shim"""
+
+    def __init__(self, upserted_ids):
+        self.upserted_ids = upserted_ids
+
+
+def bulk_write_compat(collection, requests, ordered=True):
+    """bulk_write for mongomock, which rejects current pymongo UpdateOne objects"""
+    upserted = {}
+    errors = []
+    for index, request in enumerate(requests):
+        try:
+            if isinstance(request, InsertOne):
+                collection.insert_one(request._doc)
+            elif isinstance(request, UpdateOne):
+                result = collection.update_one(request._filter, request._doc, upsert=request._upsert)
+                if result.upserted_id is not None:
+                    upserted[index] = result.upserted_id
+            else:
+                raise TypeError(f"Unsupported bulk request {type(request).__name__}")
+        except DuplicateKeyError:
+            errors.append({"index": index, "code": 11000})
+            if ordered:
+                break
+
+    if errors:
+        raise BulkWriteError({
+            "writeErrors": errors,
+            "upserted": [{"index": i, "_id": _id} for i, _id in upserted.items()]
+        })
+    return UpdateResult(upserted)
+
+
+class CountingCollection:
+    """Collection proxy that counts (and times) each operation"""
+
+    def __init__(self, collection, stats, compat=False, pool=None, op_latency=0.0):
+        self._collection = collection
+        self._stats = stats
+        self._compat = compat
+        self._pool = pool
+        self._op_latency = op_latency
+
+    @property
+    def name(self):
+        return self._collection.name
+
+    def with_options(self, *args, **kwargs):
+        collection = self._collection.with_options(*args, **kwargs)
+        return CountingCollection(collection, self._stats, self._compat, self._pool, self._op_latency)
+
+    def _counted(self, op, func):
+        def call(*args, **kwargs):
+            if self._pool is not None:
+                waiting = time.perf_counter()
+                self._pool.acquire()
+                self._stats.pool_wait(time.perf_counter() - waiting)
+            self._stats.start()
+            started = time.perf_counter()
+            try:
+                if self._op_latency:
+                    time.sleep(self._op_latency)
+                return func(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - started
+                self._stats.finish(f"{self._collection.name}.{op}", seconds)
+                telemetry.record_db(op, seconds)
+                if self._pool is not None:
+                    self._pool.release()
+        return call
+
+    def __getattr__(self, name):
+        if name == "bulk_write" and self._compat:
+            return self._counted(name, lambda requests, ordered=True, **_: bulk_write_compat(self._collection, requests, ordered))
+        attr = getattr(self._collection, name)
+        if name in COUNTED_OPS and callable(attr):
+            return self._counted(name, attr)
+        return attr
+
+
+class CountingDatabase:
+    """Database proxy handing out counting collections"""
+
+    def __init__(self, database, stats, compat=False, pool=None, op_latency=0.0):
+        self._database = database
+        self._stats = stats
+        self._compat = compat
+        self._pool = pool
+        self._op_latency = op_latency
+
+    def __getitem__(self, name):
+        return CountingCollection(self._database[name], self._stats, self._compat, self._pool, self._op_latency)
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name in ("name", "client", "command", "list_collection_names", "drop_collection"):
+            return getattr(self._database, name)
+        return self[name]
+
+
+class CountingClient:
+    """Client proxy registered in db._clients"""
+
+    def __init__(self, client, stats, compat=False, pool=None, op_latency=0.0):
+        self._client = client
+        self.stats = stats
+        self._compat = compat
+        self._pool = pool
+        self._op_latency = op_latency
+
+    def __getitem__(self, name):
+        return CountingDatabase(self._client[name], self.stats, self._compat, self._pool, self._op_latency)
+
+    def drop_database(self, name):
+        self._client.drop_database(name)
+
+    def close(self):
+        self._client.close()
+
+
+def install_fake_db(pool_size=None, op_latency=0.0):
+    """Register an in-process mongomock client for db.py, returns its DBStats
+
+    pool_size simulates a connection pool of that many slots (None = unlimited);
+    op_latency adds a fixed server round trip to every operation.
+    """
+    try:
+        import mongomock
+    except ImportError:
+        raise SystemExit("The in-process DB needs mongomock: pip install -r benchmarks/requirements.txt")
+
+    stats = DBStats()
+    pool = threading.BoundedSemaphore(pool_size) if pool_size else None
+    db._clients[db.MONGO_URI] = CountingClient(mongomock.MongoClient(), stats, compat=True, pool=pool, op_latency=op_latency)
+    return stats
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts server commands by name (real MongoDB only)"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def started(self, event):
+        self.stats.start()
+
+    def succeeded(self, event):
+        self.stats.finish(event.command_name, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        self.stats.finish(event.command_name, event.duration_micros / 1e6)
+
+
+class PoolWaitListener(monitoring.ConnectionPoolListener):
+    """Records connection checkout waits and timeouts (real MongoDB only)"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def connection_checked_out(self, event):
+        self.stats.pool_wait(event.duration)
+
+    def connection_check_out_failed(self, event):
+        self.stats.pool_wait(event.duration, timed_out=event.reason == ConnectionCheckOutFailedReason.TIMEOUT)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+
+def install_counting_db(uri, db_name="nomi_bench", pool_size=None):
+    """Point db.py at a real MongoDB (in a scratch database), counting every command"""
+    stats = DBStats()
+    client = MongoClient(
+        uri,
+        maxPoolSize=pool_size or db.MONGO_MAX_POOL_SIZE,
+        event_listeners=[CommandCounter(stats), PoolWaitListener(stats)]
+    )
+    client.drop_database(db_name)
+    db.DB_NAME = db_name
+    db._clients[db.MONGO_URI] = client
+    return stats
@@ -0,0 +1,287 @@
+"""
+Fake LLM - Deterministic stand-in for ChatAnthropic
+
+Answers every call the agents and handlers make without a network round
+trip: one-word routing for the supervisor, JSON for extraction prompts,
+tool calls for structured output and a short reply otherwise. Latency and
+token usage are configurable, and every call is recorded in LLMStats.
+
+For load tests, a ClientLimit caps concurrent calls like a shared API
+client or rate limit would, and a SpikeSchedule injects periodic windows
+of extra latency and errors.
+"""
+import json
+import time
+import random
+import asyncio
+import threading
+from collections import Counter
+from typing import Any
+from pydantic import Field, PrivateAttr
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+import llm_profiles
+from classifier import keyword_scores
+from context_window import count_tokens
+
+# Values for structured-output and JSON fields, by field name
+CANNED_FIELDS = {
+    "activity": "running",
+    "duration": "30 min",
+    "intensity": "moderate",
+    "calories": "",
+    "details": "morning run in the park",
+    "summary": "Call the dentist tomorrow morning",
+    "category": "task",
+    "priority": "medium",
+    "has_reminder": True,
+    "reminder_time": "tomorrow 9am",
+    "tags": ["health", "errand"],
+    "reply": "Nice work! ✓"
+}
+
+CANNED_REPLY = "Nice work, keep it up! ✓"
+
+TYPE_DEFAULTS = {"string": "", "boolean": False, "array": [], "integer": 0, "number": 0}
+
+
+class LLMStats:
+    """Thread-safe record of fake LLM calls, tokens and latency per node"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = Counter()
+            self.errors = Counter()
+            self.input_tokens = Counter()
+            self.output_tokens = Counter()
+            self.latency = Counter()
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self.waits = 0
+            self.wait_seconds = 0.0
+            self.max_wait = 0.0
+
+    def start(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def waited(self, seconds):
+        """Record time spent waiting for the client limit"""
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+    def finish(self, node, input_tokens, output_tokens, seconds, error=False):
+        with self._lock:
+            self.in_flight -= 1
+            self.calls[node] += 1
+            self.input_tokens[node] += input_tokens
+            self.output_tokens[node] += output_tokens
+            self.latency[node] += seconds
+            if error:
+                self.errors[node] += 1
+
+    def snapshot(self):
+        """Copy of the counters (subtract two snapshots to get per-message usage)"""
+        with self._lock:
+            return {
+                "calls": Counter(self.calls),
+                "errors": Counter(self.errors),
+                "input_tokens": Counter(self.input_tokens),
+                "output_tokens": Counter(self.output_tokens)
+            }
+
+
+class FakeLLMError(Exception):
+    """Injected LLM failure (see error_rate)"""
+
+
+class ClientLimit:
+    """Caps concurrent LLM calls across threads and event loops"""
+
+    def __init__(self, size):
+        self.size = size
+        self._semaphore = threading.BoundedSemaphore(size)
+
+    def acquire(self):
+        """Block until a slot is free, returns the seconds waited"""
+        started = time.perf_counter()
+        self._semaphore.acquire()
+        return time.perf_counter() - started
+
+    async def aacquire(self):
+        """Async acquire - polls so the event loop is never blocked"""
+        started = time.perf_counter()
+        while not self._semaphore.acquire(blocking=False):
+            await asyncio.sleep(0.001)
+        return time.perf_counter() - started
+
+    def release(self):
+        self._semaphore.release()
+
+
+class SpikeSchedule:
+    """Periodic windows of extra LLM latency and errors (e.g. 5s out of every 30s)"""
+
+    def __init__(self, every, duration, latency=0.0, error_rate=0.0):
+        self.every = every
+        self.duration = duration
+        self.latency = latency
+        self.error_rate = error_rate
+        self.started = time.monotonic()
+
+    def active(self, now=None):
+        elapsed = (now if now is not None else time.monotonic()) - self.started
+        return elapsed % self.every < self.duration
+
+    def overlaps(self, start, end):
+        """Whether any spike window overlaps [start, end] (time.monotonic values)"""
+        start, end = start - self.started, end - self.started
+        window = start // self.every * self.every
+        return start < window + self.duration or window + self.every <= end
+
+
+class FakeChatAnthropic(BaseChatModel):
+    """Deterministic ChatAnthropic stand-in for one profile node"""
+
+    node: str = "default"
+    model: str = "fake-claude"
+    latency: float = 0.0            # Seconds per call
+    jitter: float = 0.0             # +/- fraction of latency, seeded
+    error_rate: float = 0.0         # Fraction of calls that raise FakeLLMError
+    output_tokens: int = 20
+    routes: dict = Field(default_factory=dict)   # message -> use case for the supervisor
+    seed: int = 0
+    stats: Any = Field(default=None, exclude=True)
+    limit: Any = Field(default=None, exclude=True)    # Shared ClientLimit
+    spikes: Any = Field(default=None, exclude=True)   # Shared SpikeSchedule
+
+    _rng: Any = PrivateAttr(default=None)
+    _rng_lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self):
+        return "fake-anthropic"
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools])
+
+    def _draw(self):
+        """Seeded (delay, fail) for the next call"""
+        with self._rng_lock:
+            if self._rng is None:
+                self._rng = random.Random(f"{self.seed}:{self.node}")
+            spread = self._rng.uniform(-self.jitter, self.jitter)
+            error_rate = self.error_rate
+            delay = max(0.0, self.latency * (1 + spread))
+            if self.spikes is not None and self.spikes.active():
+                delay += self.spikes.latency
+                error_rate = max(error_rate, self.spikes.error_rate)
+            fail = self._rng.random() < error_rate
+        return delay, fail
+
+    def _respond(self, messages, tools=None):
+        """Build the deterministic reply for a call"""
+        if tools:
+            function = tools[0]["function"]
+            properties = function.get("parameters", {}).get("properties", {})
+            args = {
+                name: CANNED_FIELDS.get(name, TYPE_DEFAULTS.get(spec.get("type"), ""))
+                for name, spec in properties.items()
+            }
+            return AIMessage(content="", tool_calls=[{"name": function["name"], "args": args, "id": "call_fake", "type": "tool_call"}])
+
+        system = " ".join(m.content for m in messages if isinstance(m, SystemMessage))
+        last_human = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+
+        if self.node == "supervisor":
+            use_case = self.routes.get(last_human)
+            if not use_case:
+                scores = keyword_scores(last_human)
+                use_case = max(scores, key=scores.get) if any(scores.values()) else "notes_reminders"
+            return AIMessage(content=use_case)
+
+        if "JSON" in system:
+            return AIMessage(content=json.dumps({k: v for k, v in CANNED_FIELDS.items() if k != "reply"}))
+
+        return AIMessage(content=CANNED_REPLY)
+
+    def _result(self, messages, kwargs, delay, fail):
+        input_tokens = sum(count_tokens(m.content if isinstance(m.content, str) else str(m.content)) for m in messages)
+        if self.stats is not None:
+            self.stats.finish(self.node, input_tokens, self.output_tokens, delay, error=fail)
+        if fail:
+            raise FakeLLMError(f"Injected failure in '{self.node}'")
+
+        message = self._respond(messages, kwargs.get("tools"))
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": input_tokens + self.output_tokens
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.limit is not None:
+            waited = self.limit.acquire()
+            if self.stats is not None:
+                self.stats.waited(waited)
+        try:
+            delay, fail = self._draw()
+            if self.stats is not None:
+                self.stats.start()
+            time.sleep(delay)
+            return self._result(messages, kwargs, delay, fail)
+        finally:
+            if self.limit is not None:
+                self.limit.release()
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.limit is not None:
+            waited = await self.limit.aacquire()
+            if self.stats is not None:
+                self.stats.waited(waited)
+        try:
+            delay, fail = self._draw()
+            if self.stats is not None:
+                self.stats.start()
+            await asyncio.sleep(delay)
+            return self._result(messages, kwargs, delay, fail)
+        finally:
+            if self.limit is not None:
+                self.limit.release()
+
+
+def install_fake_llms(latency=0.0, jitter=0.0, error_rate=0.0, output_tokens=20, routes=None, seed=0, overrides=None,
+                      max_concurrency=0, spikes=None):
+    """Replace every profile's LLM with a FakeChatAnthropic, returns the shared LLMStats
+
+    overrides maps node -> dict of field overrides, e.g. {"supervisor": {"latency": 0.3}}.
+    max_concurrency > 0 shares one ClientLimit across all nodes.
+    """
+    stats = LLMStats()
+    limit = ClientLimit(max_concurrency) if max_concurrency > 0 else None
+    for node in llm_profiles.DEFAULT_PROFILES:
+        fields = {
+            "node": node,
+            "latency": latency,
+            "jitter": jitter,
+            "error_rate": error_rate,
+            "output_tokens": output_tokens,
+            "routes": routes or {},
+            "seed": seed,
+            "stats": stats,
+            "limit": limit,
+            "spikes": spikes
+        }
+        fields.update((overrides or {}).get(node, {}))
+        llm_profiles.set_llm(node, FakeChatAnthropic(**fields))
+    return stats
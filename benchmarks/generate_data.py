@@ -0,0 +1,369 @@
+"""
+Generate Data - Seeded synthetic users, messages and entries for scale testing
+
+Bulk-loads a scratch database with users who log workouts, notes, summary
+requests and wellbeing check-ins over months or years. Entry metadata has
+the same shape the handlers save, so rollups, profiles, the Summary tab and
+the history views can be measured against realistic data.
+
+Data goes in with batched insert_many; indexes, rollups and profiles are
+then built by the regular migrations. The defaults (1000 users, 2 years)
+produce about 1.5M entries and 3M messages.
+
+Usage (from the repo root):
+    python -m benchmarks.generate_data --mongo-uri mongodb://localhost:27017/
+    python -m benchmarks.generate_data --users 5000 --days 1095 --burst-rate 0.1
+    python -m benchmarks.generate_data --activities "running=5,yoga=3,cycling=1" --measure 20
+    python -m benchmarks.generate_data --in-process --users 20 --days 60 --measure 5
+"""
+import sys
+import time
+import uuid
+import random
+import logging
+import argparse
+from datetime import datetime, timedelta
+from bson import ObjectId
+import db
+import migrations
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_NAME = "nomi_synth"
+
+# Default distributions - override any of them with "name=weight,..." on the command line
+USE_CASE_MIX = {"health_fitness": 40, "notes_reminders": 35, "summary_analytics": 10, "motivation_wellbeing": 15}
+
+ACTIVITIES = {
+    "running": 30, "walking": 20, "strength training": 15, "yoga": 10,
+    "cycling": 10, "swimming": 5, "hiit": 5, "pushups": 5
+}
+
+TAGS = {
+    "work": 30, "meeting": 15, "family": 12, "health": 10, "errand": 10,
+    "finance": 6, "ideas": 6, "home": 5, "travel": 3, "reading": 3
+}
+
+# Typical session length in minutes per activity (low, high)
+ACTIVITY_MINUTES = {"walking": (15, 60), "yoga": (15, 60), "hiit": (15, 40), "pushups": (5, 15)}
+DEFAULT_MINUTES = (20, 75)
+
+NOTE_CATEGORIES = {
+    "work": ["Finish the {tag} report", "Send the {tag} update to the team", "Review {tag} numbers"],
+    "meeting": ["Meeting with {person} about {tag}", "Sync with {person} on {tag} plans"],
+    "task": ["Call {person} about {tag}", "Pay the {tag} bill", "Book {tag} appointment"],
+    "idea": ["Idea: try a new {tag} routine", "Maybe start a {tag} side project"],
+    "personal": ["Dinner with {person}", "Pick up {person} from practice"]
+}
+
+PEOPLE = ["Sarah", "John", "Alex", "Priya", "Mom", "Dad", "the dentist", "the landlord", "Chen", "Maria"]
+REMINDER_TIMES = ["tomorrow", "tomorrow 9am", "tonight", "friday", "next week", "in 2 hours"]
+
+SUMMARY_REQUESTS = {"today": "What did I do today?", "week": "Give me a weekly summary", "insights": "Any insights on my progress?"}
+WELLBEING_REQUESTS = {
+    "morning_motivation": "Good morning! Motivate me",
+    "encouragement": "Need some encouragement today",
+    "reflection": "How am I doing lately?",
+    "general_support": "Feeling a bit stressed"
+}
+
+
+def parse_weights(text):
+    """Parse 'name=weight,...' into a dict (argparse type)"""
+    weights = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if not name.strip():
+            continue
+        try:
+            weights[name.strip()] = float(weight) if weight else 1.0
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid weight in '{item}' (expected name=number)")
+    if not weights:
+        raise argparse.ArgumentTypeError("Expected at least one name=weight pair")
+    return weights
+
+
+class Weighted:
+    """Weighted random choice over a {value: weight} dict"""
+
+    def __init__(self, weights):
+        self.values = list(weights)
+        self.weights = list(weights.values())
+
+    def pick(self, rng, k=1):
+        return rng.choices(self.values, self.weights, k=k)
+
+
+class UserGenerator:
+    """Generates one user's days of messages and entries from its own seeded RNG"""
+
+    def __init__(self, username, rng, config):
+        self.username = username
+        self.rng = rng
+        self.config = config
+
+        # Each user favours a couple of activities and has a usual time of day
+        favourites = {name: weight * rng.choice([1, 1, 3, 6]) for name, weight in config.activities.items()}
+        self.activities = Weighted(favourites)
+        self.peak_hour = rng.choice([7, 8, 12, 18, 19, 21])
+        self.entries_per_day = max(0.5, rng.gauss(config.entries_per_day, config.entries_per_day / 3))
+
+    def timestamp(self, day):
+        hour = min(23, max(5, round(self.rng.gauss(self.peak_hour, 2.5))))
+        return day + timedelta(hours=hour, minutes=self.rng.randrange(60), seconds=self.rng.randrange(60))
+
+    def day_count(self):
+        """Entries for one day - most days are ordinary, some are bursts, some are skipped"""
+        if self.rng.random() > self.config.active_rate:
+            return 0
+        count = max(1, round(self.rng.expovariate(1 / self.entries_per_day)))
+        if self.rng.random() < self.config.burst_rate:
+            count *= self.config.burst_factor
+        return count
+
+    def workout(self):
+        activity = self.activities.pick(self.rng)[0]
+        low, high = ACTIVITY_MINUTES.get(activity, DEFAULT_MINUTES)
+        minutes = self.rng.randint(low, high)
+        duration = f"{minutes} min" if minutes < 90 else f"{minutes / 60:.1f} hours"
+        intensity = self.rng.choice(["low", "moderate", "moderate", "high"])
+        calories = str(minutes * self.rng.randint(5, 11)) if self.rng.random() < 0.4 else ""
+        message = f"Did {duration} of {activity}"
+        metadata = {
+            "activity": activity,
+            "duration": duration,
+            "intensity": intensity,
+            "calories": calories,
+            "details": self.rng.choice(["", "felt great", "tough one", "morning session", "with a friend"])
+        }
+        return message, "Nice work! 💪 Logged it. ✓", metadata
+
+    def note(self):
+        category = self.rng.choice(list(NOTE_CATEGORIES))
+        tags = list(dict.fromkeys(self.config.tags.pick(self.rng, k=self.rng.randint(1, 3))))
+        summary = self.rng.choice(NOTE_CATEGORIES[category]).format(tag=tags[0], person=self.rng.choice(PEOPLE))
+        has_reminder = self.rng.random() < self.config.reminder_rate
+        reminder_time = self.rng.choice(REMINDER_TIMES) if has_reminder else ""
+        message = f"Remind me: {summary} {reminder_time}" if has_reminder else f"Note: {summary}"
+        metadata = {
+            "summary": summary,
+            "category": category,
+            "priority": self.rng.choice(["low", "medium", "medium", "high"]),
+            "has_reminder": has_reminder,
+            "reminder_time": reminder_time,
+            "tags": tags
+        }
+        return message, "Got it, noted! ✓", metadata
+
+    def summary(self, day_total):
+        period = self.rng.choice(list(SUMMARY_REQUESTS))
+        metadata = {"count": day_total, "health_count": day_total // 2, "notes_count": day_total - day_total // 2, "period": period}
+        return SUMMARY_REQUESTS[period], "You crushed it today! 🔥", metadata
+
+    def wellbeing(self):
+        support_type = self.rng.choice(list(WELLBEING_REQUESTS))
+        return WELLBEING_REQUESTS[support_type], "You've got this! 🌅", {"type": support_type}
+
+    def day(self, day):
+        """Generate (entries, messages) for one calendar day, in time order"""
+        entries, messages = [], []
+        count = self.day_count()
+        for timestamp in sorted(self.timestamp(day) for _ in range(count)):
+            use_case = self.config.use_cases.pick(self.rng)[0]
+            if use_case == "health_fitness":
+                message, response, metadata = self.workout()
+            elif use_case == "notes_reminders":
+                message, response, metadata = self.note()
+            elif use_case == "summary_analytics":
+                message, response, metadata = self.summary(len(entries))
+            else:
+                message, response, metadata = self.wellbeing()
+
+            turn_id = uuid.UUID(int=self.rng.getrandbits(128)).hex
+            entries.append({
+                "_id": ObjectId(),
+                "username": self.username,
+                "message": message,
+                "response": response,
+                "use_case": use_case,
+                "metadata": metadata,
+                "timestamp": timestamp,
+                "turn_id": turn_id
+            })
+            reply_at = timestamp + timedelta(seconds=self.rng.randint(1, 5))
+            messages.append({"_id": ObjectId(), "username": self.username, "role": "user", "content": message, "timestamp": timestamp, "turn_id": turn_id})
+            messages.append({"_id": ObjectId(), "username": self.username, "role": "assistant", "content": response, "timestamp": reply_at, "turn_id": turn_id})
+        return entries, messages
+
+
+class BatchWriter:
+    """Buffers documents per collection and writes them with insert_many"""
+
+    def __init__(self, database, batch_size):
+        self.database = database
+        self.batch_size = batch_size
+        self.buffers = {}
+        self.written = {}
+
+    def add(self, collection, documents):
+        buffer = self.buffers.setdefault(collection, [])
+        buffer.extend(documents)
+        if len(buffer) >= self.batch_size:
+            self.flush(collection)
+
+    def flush(self, collection=None):
+        for name in [collection] if collection else list(self.buffers):
+            buffer = self.buffers.get(name)
+            if buffer:
+                self.database[name].insert_many(buffer, ordered=False)
+                self.written[name] = self.written.get(name, 0) + len(buffer)
+                self.buffers[name] = []
+
+
+def to_buckets(messages):
+    """Group one user's messages into per-day bucket documents (MESSAGE_STORAGE=buckets)"""
+    buckets = {}
+    for message in messages:
+        day = message["timestamp"].strftime("%Y-%m-%d")
+        bucket = buckets.setdefault(day, {
+            "_id": f"{message['username']}|{day}",
+            "username": message["username"],
+            "day": day,
+            "messages": [],
+            "count": 0
+        })
+        bucket["messages"].append({k: v for k, v in message.items() if k != "username"})
+        bucket["count"] += 1
+    for bucket in buckets.values():
+        bucket["messages"].sort(key=lambda m: m["timestamp"])
+    return list(buckets.values())
+
+def generate(database, config):
+    """Generate and insert all users, returns {collection: documents written}"""
+    writer = BatchWriter(database, config.batch_size)
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    first_day = today - timedelta(days=config.days)
+    started = time.perf_counter()
+
+    for i in range(config.users):
+        username = f"{config.prefix}{i:06d}"
+        rng = random.Random(f"{config.seed}:{username}")
+
+        # Sign-ups are spread over the first half of the period
+        signup = first_day + timedelta(days=rng.randrange(max(1, config.days // 2)))
+        user = UserGenerator(username, rng, config)
+        writer.add("users", [{"username": username, "password": "synthetic", "created_at": signup, "last_login": today}])
+
+        user_messages = []
+        day = signup
+        while day <= today:
+            entries, messages = user.day(day)
+            writer.add("entries", entries)
+            user_messages.extend(messages)
+            day += timedelta(days=1)
+
+        if config.message_storage == "buckets":
+            writer.add("message_buckets", to_buckets(user_messages))
+        else:
+            writer.add("messages", user_messages)
+
+        if (i + 1) % 100 == 0 or i + 1 == config.users:
+            writer.flush()
+            elapsed = time.perf_counter() - started
+            print(f"  {i + 1}/{config.users} users, {writer.written.get('entries', 0):,} entries ({elapsed:.0f}s)")
+
+    writer.flush()
+    return writer.written
+
+def measure(usernames, runs=3):
+    """Time the history and analytics read paths against the loaded data"""
+    from datetime import date
+    from benchmarks.harness import latency_summary
+
+    since = date.today() - timedelta(days=90)
+    checks = {
+        "get_unified_entries(limit=100)": lambda u: db.get_unified_entries(u, limit=100),
+        "get_entries_page(health, summary_list)": lambda u: db.get_entries_page(u, use_case="health_fitness", view="summary_list"),
+        "get_week_totals": lambda u: db.get_week_totals(u),
+        "get_range_totals(365 days)": lambda u: db.get_range_totals(u, date.today() - timedelta(days=365)),
+        "get_entry_analytics(90 days)": lambda u: db.get_entry_analytics(u, start_date=since),
+        "read_messages(limit=50)": lambda u: db.read_messages(u, limit=50),
+        "get_user_profile": lambda u: db.get_user_profile(u)
+    }
+
+    print(f"\nRead paths over {len(usernames)} users x {runs} runs (ms):")
+    print(f"{'query':<42}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, check in checks.items():
+        seconds = []
+        for _ in range(runs):
+            for username in usernames:
+                started = time.perf_counter()
+                check(username)
+                seconds.append(time.perf_counter() - started)
+        lat = latency_summary(seconds)
+        print(f"{name:<42}{lat['p50']:>9}{lat['p95']:>9}{lat['p99']:>9}{lat['max']:>9}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-load synthetic Nomi data for scale testing")
+    parser.add_argument("--users", type=int, default=1000, help="Number of users")
+    parser.add_argument("--days", type=int, default=730, help="Days of history to generate")
+    parser.add_argument("--entries-per-day", type=float, default=3.0, help="Mean entries on an active day")
+    parser.add_argument("--active-rate", type=float, default=0.7, help="Share of days a user logs anything")
+    parser.add_argument("--burst-rate", type=float, default=0.05, help="Share of active days that are bursts")
+    parser.add_argument("--burst-factor", type=int, default=4, help="Entry multiplier on burst days")
+    parser.add_argument("--reminder-rate", type=float, default=0.3, help="Share of notes with a reminder")
+    parser.add_argument("--use-cases", type=parse_weights, default=USE_CASE_MIX, help="Use case mix, e.g. health_fitness=4,notes_reminders=3")
+    parser.add_argument("--activities", type=parse_weights, default=ACTIVITIES, help="Activity weights, e.g. running=5,yoga=2")
+    parser.add_argument("--tags", type=parse_weights, default=TAGS, help="Note tag weights, e.g. work=3,family=1")
+    parser.add_argument("--message-storage", choices=["documents", "buckets"], default=db.MESSAGE_STORAGE, help="Chat history layout")
+    parser.add_argument("--prefix", default="synth_", help="Username prefix")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (same seed, same data)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Documents per insert_many")
+    parser.add_argument("--mongo-uri", default=db.MONGO_URI, help="MongoDB to load into")
+    parser.add_argument("--db-name", default=DEFAULT_DB_NAME, help="Scratch database (dropped first)")
+    parser.add_argument("--in-process", action="store_true", help="Use in-process mongomock instead (small runs only)")
+    parser.add_argument("--measure", type=int, default=0, metavar="N", help="Afterwards, time read paths for N users")
+    parser.add_argument("--measure-only", action="store_true", help="Skip loading and measure an existing dataset")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    unknown = set(args.use_cases) - set(USE_CASE_MIX)
+    if unknown:
+        parser.error(f"Unknown use cases: {', '.join(sorted(unknown))}")
+    if args.db_name == db.DB_NAME and not args.measure_only:
+        parser.error(f"Refusing to drop the application database '{db.DB_NAME}' - choose another --db-name")
+
+    args.use_cases = Weighted(args.use_cases)
+    args.tags = Weighted(args.tags)
+
+    if args.in_process:
+        from benchmarks.fake_db import install_fake_db
+        install_fake_db()
+    else:
+        db.MONGO_URI = args.mongo_uri
+    db.DB_NAME = args.db_name
+    db.MESSAGE_STORAGE = args.message_storage
+    database = db.get_db()
+
+    if not args.measure_only:
+        db.get_client().drop_database(args.db_name)
+        print(f"Generating {args.users} users x {args.days} days into '{args.db_name}' (seed {args.seed})")
+        started = time.perf_counter()
+        written = generate(database, args)
+        print(f"Inserted {', '.join(f'{count:,} {name}' for name, count in written.items())} in {time.perf_counter() - started:.0f}s")
+
+        # Indexes after the bulk load; the migrations backfill rollups and profiles
+        started = time.perf_counter()
+        version = migrations.migrate(database)
+        print(f"Indexes, rollups and profiles built (schema v{version}) in {time.perf_counter() - started:.0f}s")
+
+    if args.measure:
+        usernames = [f"{args.prefix}{i:06d}" for i in random.Random(args.seed).sample(range(args.users), min(args.measure, args.users))]
+        measure(usernames)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Benchmark Harness - Shared setup, scenarios and measurement helpers
+"""
+import math
+import time
+import threading
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from langchain_core.callbacks import BaseCallbackHandler
+from benchmarks.fake_llm import install_fake_llms
+from benchmarks.fake_db import install_fake_db, install_counting_db
+
+logger = logging.getLogger(__name__)
+
+# Representative messages per use case (also the fake supervisor's routing table)
+SCENARIOS = {
+    "health_fitness": [
+        "I ran 5k this morning in 30 minutes",
+        "Did 30 pushups and 20 squats at the gym",
+        "45 min yoga session before work"
+    ],
+    "notes_reminders": [
+        "Remind me to call the dentist tomorrow at 9am",
+        "Meeting with Sarah went well, need to send the deck",
+        "Note: buy groceries after work"
+    ],
+    "summary_analytics": [
+        "What did I do today?",
+        "Give me a weekly summary",
+        "Any insights on my progress?"
+    ],
+    "motivation_wellbeing": [
+        "Good morning! Motivate me",
+        "I'm feeling stressed about work",
+        "How am I doing lately, reflect on my mood"
+    ]
+}
+
+ROUTES = {message: use_case for use_case, messages in SCENARIOS.items() for message in messages}
+
+
+class NodeTimer(BaseCallbackHandler):
+    """Collects wall time per LangGraph node from callback events"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._starts = {}
+        self.durations = defaultdict(list)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            with self._lock:
+                self._starts[run_id] = (node, time.perf_counter())
+
+    def _finish(self, run_id):
+        with self._lock:
+            item = self._starts.pop(run_id, None)
+            if item:
+                node, started = item
+                self.durations[node].append(time.perf_counter() - started)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def record(self, node, seconds):
+        """Record a timing for code outside LangGraph (e.g. the orchestrator path)"""
+        with self._lock:
+            self.durations[node].append(seconds)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile (0 for no values)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def latency_summary(seconds):
+    """p50/p95/p99/mean/max in milliseconds"""
+    return {
+        "p50": round(percentile(seconds, 50) * 1000, 2),
+        "p95": round(percentile(seconds, 95) * 1000, 2),
+        "p99": round(percentile(seconds, 99) * 1000, 2),
+        "mean": round(sum(seconds) / len(seconds) * 1000, 2) if seconds else 0.0,
+        "max": round(max(seconds) * 1000, 2) if seconds else 0.0
+    }
+
+def setup_environment(mongo_uri=None, llm_latency=0.0, llm_jitter=0.0, llm_error_rate=0.0,
+                      output_tokens=20, llm_cache=False, seed=0, llm_overrides=None,
+                      pool_size=None, db_latency=0.0, llm_max_concurrency=0, llm_spikes=None):
+    """Install the fake LLMs and DB, apply the schema, returns (llm_stats, db_stats)"""
+    import migrations
+    import claude_handler
+    from classifier import get_classifier
+
+    if mongo_uri:
+        db_stats = install_counting_db(mongo_uri, pool_size=pool_size)
+    else:
+        db_stats = install_fake_db(pool_size=pool_size, op_latency=db_latency)
+    llm_stats = install_fake_llms(
+        latency=llm_latency, jitter=llm_jitter, error_rate=llm_error_rate,
+        output_tokens=output_tokens, routes=ROUTES, seed=seed, overrides=llm_overrides,
+        max_concurrency=llm_max_concurrency, spikes=llm_spikes
+    )
+
+    if not llm_cache:
+        claude_handler.response_cache = None
+
+    migrations.ensure_schema()
+    get_classifier()
+    return llm_stats, db_stats
+
+def seed_user(username, days=14, per_day=3):
+    """Give a user some history so summary and wellbeing paths have work to do"""
+    import db
+
+    now = datetime.now()
+    for day in range(days, 0, -1):
+        for i in range(per_day):
+            timestamp = now - timedelta(days=day, hours=i * 3)
+            if i % 2 == 0:
+                use_case, metadata = "health_fitness", {"activity": "running", "duration": "30 min", "details": ""}
+            else:
+                use_case, metadata = "notes_reminders", {"summary": "Team sync notes", "tags": ["work"], "has_reminder": False}
+            db.save_unified_entry({
+                "username": username,
+                "message": f"seed {day}-{i}",
+                "response": "Nice! ✓",
+                "use_case": use_case,
+                "metadata": metadata,
+                "timestamp": timestamp
+            })
+    for i in range(6):
+        db.save_message(username, "user" if i % 2 == 0 else "assistant", f"seed message {i}")
+    db.flush_writes()
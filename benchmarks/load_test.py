@@ -0,0 +1,306 @@
+"""
+Load Test - Many virtual users chatting at once
+
+Each virtual user runs a chat script (morning motivation, log a workout,
+add a note, ask for a summary, ...) through the real pipeline, with thread
+or asyncio concurrency, backed by the fake LLM and an in-process MongoDB
+(or a real one with --mongo-uri). Reports throughput, latency percentiles,
+errors and contention on the Mongo connection pool and the LLM client.
+
+Usage (from the repo root):
+    python -m benchmarks.load_test --users 50 --latency 0.3 --jitter 0.3
+    python -m benchmarks.load_test --mode asyncio --users 200 --llm-concurrency 20
+    python -m benchmarks.load_test --users 50 --pool-size 5 --db-latency 0.005
+    python -m benchmarks.load_test --spike-every 10 --spike-duration 3 --spike-latency 2 --spike-error-rate 0.3
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from benchmarks.fake_llm import SpikeSchedule
+from benchmarks.harness import ROUTES, latency_summary, setup_environment, seed_user
+
+logger = logging.getLogger(__name__)
+
+# Chat scripts - virtual user i runs SCRIPTS[selected[i % len(selected)]]
+SCRIPTS = {
+    "daily": [
+        "Good morning! Motivate me",
+        "I ran 5k this morning in 30 minutes",
+        "Remind me to call the dentist tomorrow at 9am",
+        "What did I do today?"
+    ],
+    "gym": [
+        "Did 30 pushups and 20 squats at the gym",
+        "45 min yoga session before work",
+        "Give me a weekly summary"
+    ],
+    "planner": [
+        "Note: buy groceries after work",
+        "Meeting with Sarah went well, need to send the deck",
+        "I'm feeling stressed about work",
+        "Any insights on my progress?"
+    ]
+}
+
+
+class Recorder:
+    """Thread-safe list of per-message results"""
+
+    def __init__(self, spikes=None):
+        self._lock = threading.Lock()
+        self.samples = []
+        self.spikes = spikes
+        self.started = time.perf_counter()
+
+    def run(self, username, message, func):
+        """Time one synchronous message"""
+        started = time.perf_counter()
+        spike_started = time.monotonic()
+        error = None
+        try:
+            func()
+        except Exception as e:
+            error = type(e).__name__
+            logger.debug(f"LoadTest: '{username}' failed: {e}")
+        self.add(message, started, spike_started, error)
+
+    async def arun(self, username, message, coro_func):
+        """Time one async message"""
+        started = time.perf_counter()
+        spike_started = time.monotonic()
+        error = None
+        try:
+            await coro_func()
+        except Exception as e:
+            error = type(e).__name__
+            logger.debug(f"LoadTest: '{username}' failed: {e}")
+        self.add(message, started, spike_started, error)
+
+    def add(self, message, started, spike_started, error):
+        # In-spike if a spike window overlapped any part of the message
+        in_spike = bool(self.spikes and self.spikes.overlaps(spike_started, time.monotonic()))
+        with self._lock:
+            self.samples.append({
+                "use_case": ROUTES.get(message, "unknown"),
+                "at": started - self.started,
+                "seconds": time.perf_counter() - started,
+                "error": error,
+                "in_spike": in_spike
+            })
+
+
+def think(rng, think_time):
+    """Pause between messages, +/- 50%"""
+    return rng.uniform(think_time * 0.5, think_time * 1.5) if think_time else 0.0
+
+def run_user_thread(username, script, args, recorder, delay):
+    """One virtual user on its own thread - the Streamlit path"""
+    import chat
+    from conversation_cache import ConversationCache
+
+    rng = random.Random(username)
+    cache = ConversationCache(username)
+    time.sleep(delay)
+
+    for _ in range(args.iterations):
+        for message in script:
+            recorder.run(username, message, lambda: chat.handle_message(message, username, cache))
+            time.sleep(think(rng, args.think_time))
+
+async def run_user_async(username, script, args, recorder, delay):
+    """One virtual user as a coroutine - the async workflow path"""
+    from agents import handle_message_async
+
+    rng = random.Random(username)
+    await asyncio.sleep(delay)
+
+    for _ in range(args.iterations):
+        for message in script:
+            async def turn():
+                await handle_message_async(message, username)
+            await recorder.arun(username, message, turn)
+            await asyncio.sleep(think(rng, args.think_time))
+
+def run_load(usernames, scripts, args, recorder):
+    """Run every virtual user to completion, returns (wall seconds, CPU seconds)"""
+    ramp = args.ramp_up / len(usernames) if usernames else 0
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+
+    if args.mode == "asyncio":
+        async def main():
+            await asyncio.gather(*[
+                run_user_async(username, scripts[i % len(scripts)], args, recorder, i * ramp)
+                for i, username in enumerate(usernames)
+            ])
+        asyncio.run(main())
+    else:
+        with ThreadPoolExecutor(max_workers=len(usernames), thread_name_prefix="virtual-user") as pool:
+            futures = [
+                pool.submit(run_user_thread, username, scripts[i % len(scripts)], args, recorder, i * ramp)
+                for i, username in enumerate(usernames)
+            ]
+            for future in futures:
+                future.result()
+
+    return time.perf_counter() - started, time.process_time() - cpu_started
+
+def build_report(args, samples, wall, cpu, flush_seconds, llm_stats, db_stats):
+    """Summarize samples and contention counters"""
+    ok = [s for s in samples if not s["error"]]
+    errors = Counter(s["error"] for s in samples if s["error"])
+    by_use_case = {}
+    for use_case in sorted({s["use_case"] for s in samples}):
+        group = [s for s in samples if s["use_case"] == use_case]
+        by_use_case[use_case] = {
+            "messages": len(group),
+            "errors": sum(1 for s in group if s["error"]),
+            "latency_ms": latency_summary([s["seconds"] for s in group if not s["error"]])
+        }
+
+    llm = llm_stats.snapshot()
+    llm_calls = sum(llm["calls"].values())
+    db_ops = sum(db_stats.snapshot().values())
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("json_out", "verbose")},
+        "wall_seconds": round(wall, 2),
+        # Near 1.0 per core means the harness process, not the fakes' latency, is the bottleneck
+        "cpu_utilization": round(cpu / wall, 2) if wall else 0.0,
+        "final_flush_ms": round(flush_seconds * 1000, 2),
+        "messages": len(samples),
+        "errors": dict(errors),
+        "error_rate": round(len(samples) and sum(errors.values()) / len(samples), 4),
+        "throughput_msgs_per_s": round(len(ok) / wall, 2) if wall else 0.0,
+        "latency_ms": latency_summary([s["seconds"] for s in ok]),
+        "use_cases": by_use_case,
+        "llm": {
+            "calls": llm_calls,
+            "errors": sum(llm["errors"].values()),
+            "calls_per_msg": round(llm_calls / len(samples), 2) if samples else 0.0,
+            "max_in_flight": llm_stats.max_in_flight,
+            "limit_waits": llm_stats.waits,
+            "mean_wait_ms": round(llm_stats.wait_seconds / llm_stats.waits * 1000, 2) if llm_stats.waits else 0.0,
+            "max_wait_ms": round(llm_stats.max_wait * 1000, 2)
+        },
+        "db": {
+            "ops": db_ops,
+            "ops_per_msg": round(db_ops / len(samples), 2) if samples else 0.0,
+            "max_in_flight": db_stats.max_in_flight,
+            "pool_checkouts": db_stats.pool_checkouts,
+            "mean_pool_wait_ms": round(db_stats.pool_wait_seconds / db_stats.pool_checkouts * 1000, 3) if db_stats.pool_checkouts else 0.0,
+            "max_pool_wait_ms": round(db_stats.max_pool_wait * 1000, 2),
+            "pool_timeouts": db_stats.pool_timeouts
+        }
+    }
+
+    if args.spike_every:
+        for label, in_spike in (("in_spike", True), ("outside_spike", False)):
+            group = [s for s in samples if s["in_spike"] == in_spike]
+            report[label] = {
+                "messages": len(group),
+                "errors": sum(1 for s in group if s["error"]),
+                "latency_ms": latency_summary([s["seconds"] for s in group if not s["error"]])
+            }
+    return report
+
+def print_report(report):
+    """Print the load test summary"""
+    lat = report["latency_ms"]
+    print(f"\n{report['messages']} messages in {report['wall_seconds']}s "
+          f"-> {report['throughput_msgs_per_s']} msgs/s, error rate {report['error_rate']:.1%}")
+    print(f"latency ms: p50={lat['p50']} p95={lat['p95']} p99={lat['p99']} max={lat['max']}")
+    print(f"process CPU utilization: {report['cpu_utilization']} (of {os.cpu_count()} cores)")
+    if report["errors"]:
+        print("errors: " + ", ".join(f"{name}={count}" for name, count in report["errors"].items()))
+
+    print(f"\n{'use case':<22}{'msgs':>7}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for use_case, r in report["use_cases"].items():
+        lat = r["latency_ms"]
+        print(f"{use_case:<22}{r['messages']:>7}{r['errors']:>8}{lat['p50']:>9}{lat['p95']:>9}{lat['p99']:>9}")
+
+    for label in ("in_spike", "outside_spike"):
+        if label in report:
+            r = report[label]
+            print(f"{label}: {r['messages']} msgs, {r['errors']} errors, p95={r['latency_ms']['p95']}ms")
+
+    llm, dbs = report["llm"], report["db"]
+    print(f"\nLLM: {llm['calls']} calls ({llm['calls_per_msg']}/msg), {llm['errors']} errors, "
+          f"max in flight {llm['max_in_flight']}, client wait mean {llm['mean_wait_ms']}ms max {llm['max_wait_ms']}ms")
+    print(f"DB:  {dbs['ops']} ops ({dbs['ops_per_msg']}/msg), max in flight {dbs['max_in_flight']}, "
+          f"pool wait mean {dbs['mean_pool_wait_ms']}ms max {dbs['max_pool_wait_ms']}ms, {dbs['pool_timeouts']} timeouts")
+    print(f"final write-behind flush: {report['final_flush_ms']}ms")
+
+def main(argv=None):
+    import db
+
+    parser = argparse.ArgumentParser(description="Concurrent multi-user load test for the Nomi chat pipeline")
+    parser.add_argument("--users", type=int, default=20, help="Virtual users")
+    parser.add_argument("--iterations", type=int, default=2, help="Times each user runs its script")
+    parser.add_argument("--scripts", nargs="+", choices=list(SCRIPTS), default=list(SCRIPTS), help="Chat scripts to assign")
+    parser.add_argument("--mode", choices=["thread", "asyncio"], default="thread", help="Concurrency model")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds between a user's messages (+/- 50%%)")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds over which users start")
+    parser.add_argument("--seed-days", type=int, default=7, help="Days of history seeded per user")
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated LLM latency per call (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.25, help="LLM latency jitter (+/- fraction)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of LLM calls that fail")
+    parser.add_argument("--llm-concurrency", type=int, default=0, help="Max concurrent LLM calls (0 = unlimited)")
+    parser.add_argument("--spike-every", type=float, default=0.0, help="Start an LLM spike every N seconds (0 = off)")
+    parser.add_argument("--spike-duration", type=float, default=2.0, help="Spike length in seconds")
+    parser.add_argument("--spike-latency", type=float, default=1.0, help="Extra LLM latency during a spike (seconds)")
+    parser.add_argument("--spike-error-rate", type=float, default=0.2, help="LLM error rate during a spike")
+    parser.add_argument("--pool-size", type=int, default=db.MONGO_MAX_POOL_SIZE, help="Mongo connection pool size")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="Simulated DB round trip in process (seconds)")
+    parser.add_argument("--mongo-uri", help="Load test against a real MongoDB (scratch database nomi_bench)")
+    parser.add_argument("--json", dest="json_out", help="Write the report to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show application logs")
+    args = parser.parse_args(argv)
+
+    # Injected failures log expected fallback warnings - only show them with --verbose
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    spikes = SpikeSchedule(args.spike_every, args.spike_duration, args.spike_latency, args.spike_error_rate) if args.spike_every else None
+    llm_stats, db_stats = setup_environment(
+        mongo_uri=args.mongo_uri, llm_latency=args.latency, llm_jitter=args.jitter, llm_error_rate=args.error_rate,
+        pool_size=args.pool_size, db_latency=args.db_latency, llm_max_concurrency=args.llm_concurrency, llm_spikes=spikes
+    )
+
+    usernames = [f"load_{i:04d}" for i in range(args.users)]
+    print(f"Seeding {args.users} users...")
+    for username in usernames:
+        seed_user(username, days=args.seed_days)
+    llm_stats.reset()
+    db_stats.reset()
+
+    print(f"Running {args.users} virtual users x {args.iterations} iterations ({args.mode})...")
+    if spikes:
+        spikes.started = time.monotonic()
+    recorder = Recorder(spikes)
+    wall, cpu = run_load(usernames, [SCRIPTS[name] for name in args.scripts], args, recorder)
+
+    started = time.perf_counter()
+    db.flush_writes()
+    flush_seconds = time.perf_counter() - started
+
+    report = build_report(args, recorder.samples, wall, cpu, flush_seconds, llm_stats, db_stats)
+    print_report(report)
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+Run Benchmarks - Latency, LLM calls and DB round trips per message, per use case
+
+Drives representative messages for each use case through three paths:
+  app          - chat.handle_message (what the Streamlit app runs per message)
+  workflow     - the LangGraph workflow alone, no history loading or entry save
+  orchestrator - the legacy classify_use_case + route_message handlers
+
+Usage (from the repo root):
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --iterations 20 --latency 0.05 --json results.json
+    python -m benchmarks.run_benchmarks --baseline results.json   # exit 1 on regression
+"""
+import sys
+import json
+import time
+import logging
+import argparse
+from collections import Counter
+from datetime import datetime
+from benchmarks.harness import SCENARIOS, NodeTimer, latency_summary, setup_environment, seed_user
+
+logger = logging.getLogger(__name__)
+
+PATHS = ["app", "workflow", "orchestrator"]
+
+# Regression thresholds used with --baseline
+LATENCY_TOLERANCE = 0.25
+DB_OPS_TOLERANCE = 0.5
+
+
+def run_app(message, username, timer, cache):
+    import chat
+    return chat.handle_message(message, username, conversation_cache=cache, config={"callbacks": [timer]})
+
+def run_workflow(message, username, timer, cache):
+    from agents import nomi_workflow
+    state = {
+        "username": username,
+        "message": message,
+        "conversation_history": [],
+        "use_case": "",
+        "response": "",
+        "metadata": {},
+        "next_agent": ""
+    }
+    return nomi_workflow.invoke(state, config={"callbacks": [timer]})["response"]
+
+def run_orchestrator(message, username, timer, cache):
+    from orchestrator import classify_use_case, route_message
+    started = time.perf_counter()
+    use_case = classify_use_case(message)
+    timer.record("classify_use_case", time.perf_counter() - started)
+
+    started = time.perf_counter()
+    response, _, _ = route_message(message, username, use_case=use_case, conversation_history=[])
+    timer.record(f"handler:{use_case}", time.perf_counter() - started)
+    return response
+
+RUNNERS = {"app": run_app, "workflow": run_workflow, "orchestrator": run_orchestrator}
+
+
+def run_path(path, iterations, llm_stats, db_stats):
+    """Benchmark one path, returns (per-use-case results, per-node mean ms)"""
+    import db
+    from conversation_cache import ConversationCache
+
+    username = f"bench_{path}"
+    seed_user(username)
+    cache = ConversationCache(username) if path == "app" else None
+    timer = NodeTimer()
+    runner = RUNNERS[path]
+
+    results = {}
+    for use_case, messages in SCENARIOS.items():
+        latencies = []
+        usage = Counter()
+        for _ in range(iterations):
+            for message in messages:
+                llm_before = llm_stats.snapshot()
+                db_before = db_stats.snapshot()
+
+                started = time.perf_counter()
+                runner(message, username, timer, cache)
+                latencies.append(time.perf_counter() - started)
+
+                # Count write-behind inserts against the message that caused them
+                db.flush_writes()
+                llm_after = llm_stats.snapshot()
+                usage["llm_calls"] += sum((llm_after["calls"] - llm_before["calls"]).values())
+                usage["input_tokens"] += sum((llm_after["input_tokens"] - llm_before["input_tokens"]).values())
+                usage["output_tokens"] += sum((llm_after["output_tokens"] - llm_before["output_tokens"]).values())
+                usage["db_ops"] += sum((db_stats.snapshot() - db_before).values())
+
+        count = len(latencies)
+        results[use_case] = {
+            "messages": count,
+            "latency_ms": latency_summary(latencies),
+            "llm_calls_per_msg": round(usage["llm_calls"] / count, 2),
+            "db_ops_per_msg": round(usage["db_ops"] / count, 2),
+            "input_tokens_per_msg": round(usage["input_tokens"] / count, 1),
+            "output_tokens_per_msg": round(usage["output_tokens"] / count, 1)
+        }
+
+    nodes = {node: round(sum(d) / len(d) * 1000, 2) for node, d in sorted(timer.durations.items())}
+    return results, nodes
+
+def find_regressions(current, baseline):
+    """Compare two result sets, returns human-readable regressions"""
+    regressions = []
+    for path, use_cases in current["paths"].items():
+        for use_case, now in use_cases.items():
+            before = baseline.get("paths", {}).get(path, {}).get(use_case)
+            if not before:
+                continue
+            label = f"{path}/{use_case}"
+            if now["llm_calls_per_msg"] > before["llm_calls_per_msg"]:
+                regressions.append(f"{label}: LLM calls/msg {before['llm_calls_per_msg']} -> {now['llm_calls_per_msg']}")
+            if now["db_ops_per_msg"] > before["db_ops_per_msg"] * (1 + DB_OPS_TOLERANCE) + 1:
+                regressions.append(f"{label}: DB ops/msg {before['db_ops_per_msg']} -> {now['db_ops_per_msg']}")
+            # Latency is only comparable when the simulated LLM latency matches
+            if current["config"]["latency"] == baseline.get("config", {}).get("latency"):
+                limit = before["latency_ms"]["p50"] * (1 + LATENCY_TOLERANCE) + 1
+                if now["latency_ms"]["p50"] > limit:
+                    regressions.append(f"{label}: p50 {before['latency_ms']['p50']}ms -> {now['latency_ms']['p50']}ms")
+    return regressions
+
+def print_report(report):
+    """Print the results as plain-text tables"""
+    header = f"{'use case':<22}{'p50 ms':>9}{'p95 ms':>9}{'mean ms':>9}{'llm/msg':>9}{'db/msg':>9}{'tok in':>9}{'tok out':>9}"
+    for path, use_cases in report["paths"].items():
+        print(f"\n== {path} ==")
+        print(header)
+        for use_case, r in use_cases.items():
+            lat = r["latency_ms"]
+            print(f"{use_case:<22}{lat['p50']:>9}{lat['p95']:>9}{lat['mean']:>9}"
+                  f"{r['llm_calls_per_msg']:>9}{r['db_ops_per_msg']:>9}"
+                  f"{r['input_tokens_per_msg']:>9}{r['output_tokens_per_msg']:>9}")
+        nodes = report["nodes"].get(path)
+        if nodes:
+            print("per node (mean ms): " + ", ".join(f"{node}={ms}" for node, ms in nodes.items()))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the Nomi chat pipeline")
+    parser.add_argument("--paths", nargs="+", choices=PATHS, default=PATHS, help="Paths to benchmark")
+    parser.add_argument("--iterations", type=int, default=5, help="Repetitions of each scenario message")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated LLM latency per call (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="LLM latency jitter (+/- fraction of --latency)")
+    parser.add_argument("--output-tokens", type=int, default=20, help="Simulated output tokens per LLM reply")
+    parser.add_argument("--with-cache", action="store_true", help="Keep the LLM response cache enabled")
+    parser.add_argument("--mongo-uri", help="Benchmark against a real MongoDB (scratch database nomi_bench)")
+    parser.add_argument("--json", dest="json_out", help="Write results to this file")
+    parser.add_argument("--baseline", help="Compare against a previous --json file, exit 1 on regression")
+    parser.add_argument("--verbose", action="store_true", help="Show application logs")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    llm_stats, db_stats = setup_environment(
+        mongo_uri=args.mongo_uri, llm_latency=args.latency, llm_jitter=args.jitter,
+        output_tokens=args.output_tokens, llm_cache=args.with_cache
+    )
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "iterations": args.iterations,
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "output_tokens": args.output_tokens,
+            "with_cache": args.with_cache,
+            "db": "mongodb" if args.mongo_uri else "mongomock"
+        },
+        "paths": {},
+        "nodes": {}
+    }
+    for path in args.paths:
+        report["paths"][path], report["nodes"][path] = run_path(path, args.iterations, llm_stats, db_stats)
+
+    print_report(report)
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.json_out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(report, baseline)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Chat Pipeline - Runs one chat turn through the LangGraph workflow
+
+UI-free so the same code path serves the Streamlit app, benchmarks and load
+tests. Conversation history comes from a ConversationCache (the app passes
+the session's cache; without one a fresh cache is loaded from MongoDB).
+"""
+import logging
+from datetime import datetime
+from agents import nomi_workflow, WorkflowStream
+from db import save_unified_entry
+from response_templates import schedule_upgrade
+from conversation_cache import ConversationCache
+from turns import turn_cache
+from context_window import with_summary, schedule_summary_update, CONTEXT_MAX_MESSAGES
+from telemetry import span
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def build_initial_state(user_message, username, conversation_cache=None):
+    """Build the LangGraph initial state with recent conversation history"""
+    conversation_cache = conversation_cache or ConversationCache(username)
+
+    # Recent conversation (last 24 hours) led by the rolling summary - each agent
+    # packs what fits in its token budget
+    conversation_history = conversation_cache.get_recent(max_messages=CONTEXT_MAX_MESSAGES, hours=24)
+    conversation_history = with_summary(username, conversation_history)
+    logger.info(f"Retrieved {len(conversation_history)} messages from conversation history")
+
+    return {
+        "username": username,
+        "message": user_message,
+        "conversation_history": conversation_history,
+        "use_case": "",
+        "response": "",
+        "metadata": {},
+        "next_agent": ""
+    }
+
+def save_turn_entry(user_message, username, final_state, turn_id=None):
+    """Save the unified entry for a completed workflow run and schedule its reply upgrade and summary refresh"""
+    entry = {
+        "username": username,
+        "message": user_message,
+        "response": final_state["response"],
+        "use_case": final_state["use_case"],
+        "metadata": final_state["metadata"],
+        "timestamp": datetime.now()
+    }
+    if turn_id:
+        entry["turn_id"] = turn_id
+    save_unified_entry(entry)
+    logger.info(f"Saved unified entry to database")
+
+    # template_then_llm - only a committed, saved turn gets its reply upgraded
+    if turn_id and final_state.get("upgrade"):
+        schedule_upgrade(username, turn_id, final_state["upgrade"])
+
+    # Counts the turn's user + assistant messages towards the next summary refresh
+    schedule_summary_update(username)
+
+def handle_message(user_message, username, conversation_cache=None, config=None, submission_id=None):
+    """Process user message using LangGraph agentic workflow
+
+    Saves the user and assistant messages (through conversation_cache) and the
+    unified entry, all keyed by the turn ID. config is passed to the workflow (e.g. callbacks for benchmarks). Pass the
+    client's submission_id so a retried submission is deduplicated (see turns.py).
+    """
+    logger.info(f"Processing message for user: {username}")
+
+    turn, is_new = turn_cache.begin(username, user_message, submission_id)
+    if not is_new:
+        reply = turn.wait()
+        if reply is not None:
+            return reply
+        turn, _ = turn_cache.begin(username, user_message, turn.submission_id)
+
+    conversation_cache = conversation_cache or ConversationCache(username)
+    try:
+        with metrics.time_message("sync") as timing, span("turn", kind="turn") as turn_span:
+            conversation_cache.save("user", user_message, turn_id=turn.turn_id)
+            initial_state = build_initial_state(user_message, username, conversation_cache)
+
+            # Invoke LangGraph workflow
+            logger.info("Invoking LangGraph workflow")
+            final_state = nomi_workflow.invoke(initial_state, config=config)
+            logger.info(f"Workflow completed - routed to {final_state['use_case']} agent")
+
+            save_turn_entry(user_message, username, final_state, turn.turn_id)
+            conversation_cache.save("assistant", final_state["response"], turn_id=turn.turn_id)
+            timing["use_case"] = final_state["use_case"]
+            if turn_span:
+                turn_span.attributes["use_case"] = final_state["use_case"]
+    except Exception:
+        turn_cache.discard(turn)
+        raise
+
+    turn_cache.complete(turn, final_state["response"])
+    return final_state["response"]
+
+def stream_message(user_message, username, conversation_cache=None):
+    """Process user message, streaming reply tokens (see agents.WorkflowStream)"""
+    logger.info(f"Streaming message for user: {username}")
+    return WorkflowStream(build_initial_state(user_message, username, conversation_cache))
@@ -0,0 +1,208 @@
+"""
+Fast-Path Classifier - Local use case classification in front of the LLM supervisor
+
+Combines keyword scoring with a small multinomial Naive Bayes model trained
+from the labeled `use_case` field of the entries collection. Confidently
+classified messages are answered locally; ambiguous ones return None so the
+caller escalates to the LLM.
+
+Configure with CLASSIFIER_CONFIDENCE_THRESHOLD, CLASSIFIER_MIN_TRAINING_SAMPLES
+and CLASSIFIER_TRAINING_LIMIT. Set CLASSIFIER_ENABLED=false to always escalate.
+"""
+import os
+import re
+import math
+import logging
+import threading
+from collections import Counter, defaultdict
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+CLASSIFIER_ENABLED = os.getenv("CLASSIFIER_ENABLED", "true").lower() == "true"
+CLASSIFIER_CONFIDENCE_THRESHOLD = float(os.getenv("CLASSIFIER_CONFIDENCE_THRESHOLD", "0.75"))
+CLASSIFIER_MIN_TRAINING_SAMPLES = int(os.getenv("CLASSIFIER_MIN_TRAINING_SAMPLES", "50"))
+CLASSIFIER_TRAINING_LIMIT = int(os.getenv("CLASSIFIER_TRAINING_LIMIT", "5000"))
+
+USE_CASES = ["health_fitness", "notes_reminders", "summary_analytics", "motivation_wellbeing"]
+
+# Same keyword sets the supervisor/orchestrator prompts give the LLM
+KEYWORDS = {
+    "health_fitness": ["workout", "exercise", "ran", "gym", "pushups", "yoga", "lifted", "weight", "calories", "steps"],
+    "notes_reminders": ["note", "remember", "todo", "task", "meeting", "call", "finished", "completed", "remind me"],
+    "summary_analytics": ["summary", "what did i do", "recap", "analyze", "insights", "progress", "how many"],
+    "motivation_wellbeing": ["motivate", "inspire", "morning", "feeling", "mood", "stressed"]
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+def tokenize(text):
+    """Lowercase word tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def keyword_scores(message):
+    """Count keyword matches per use case (whole words, or phrases)"""
+    lowered = " " + " ".join(tokenize(message)) + " "
+    return {
+        use_case: sum(1 for kw in keywords if f" {kw} " in lowered)
+        for use_case, keywords in KEYWORDS.items()
+    }
+
+
+class NaiveBayesModel:
+    """Multinomial Naive Bayes over word tokens (Laplace smoothed)"""
+
+    def __init__(self):
+        self.class_counts = Counter()
+        self.token_counts = defaultdict(Counter)
+        self.token_totals = Counter()
+        self.vocab = set()
+
+    def fit(self, samples):
+        """Train on (message, use_case) pairs"""
+        for message, use_case in samples:
+            tokens = tokenize(message)
+            self.class_counts[use_case] += 1
+            self.token_counts[use_case].update(tokens)
+            self.token_totals[use_case] += len(tokens)
+            self.vocab.update(tokens)
+        return self
+
+    @property
+    def sample_count(self):
+        return sum(self.class_counts.values())
+
+    def predict_proba(self, message):
+        """Posterior probability per use case"""
+        tokens = tokenize(message)
+        total = self.sample_count
+        vocab_size = len(self.vocab) or 1
+
+        log_probs = {}
+        for use_case in USE_CASES:
+            count = self.class_counts.get(use_case, 0)
+            log_prob = math.log((count + 1) / (total + len(USE_CASES)))
+            denom = self.token_totals.get(use_case, 0) + vocab_size
+            counts = self.token_counts.get(use_case, {})
+            for token in tokens:
+                log_prob += math.log((counts.get(token, 0) + 1) / denom)
+            log_probs[use_case] = log_prob
+
+        top = max(log_probs.values())
+        exp = {k: math.exp(v - top) for k, v in log_probs.items()}
+        norm = sum(exp.values())
+        return {k: v / norm for k, v in exp.items()}
+
+
+class FastClassifier:
+    """Keyword + Naive Bayes classifier with escalation metrics"""
+
+    def __init__(self, threshold=CLASSIFIER_CONFIDENCE_THRESHOLD, model=None):
+        self.threshold = threshold
+        self.model = model
+        self._lock = threading.Lock()
+        self.fast_path = 0
+        self.escalated = 0
+
+    def predict(self, message):
+        """Return (use_case, confidence) from keywords and the model"""
+        scores = keyword_scores(message)
+        total_hits = sum(scores.values())
+
+        if total_hits:
+            distribution = {k: v / total_hits for k, v in scores.items()}
+        else:
+            distribution = None
+
+        if self.model is not None:
+            model_probs = self.model.predict_proba(message)
+            if distribution is None:
+                distribution = model_probs
+            else:
+                distribution = {k: (distribution[k] + model_probs[k]) / 2 for k in USE_CASES}
+
+        if distribution is None:
+            return None, 0.0
+
+        use_case = max(distribution, key=distribution.get)
+        return use_case, distribution[use_case]
+
+    def classify(self, message):
+        """Return a use case if confident, otherwise None (caller escalates)"""
+        use_case, confidence = self.predict(message)
+        confident = use_case is not None and confidence >= self.threshold
+
+        with self._lock:
+            if confident:
+                self.fast_path += 1
+            else:
+                self.escalated += 1
+
+        if confident:
+            logger.info(f"FastClassifier: '{use_case}' (confidence {confidence:.2f})")
+            return use_case
+
+        logger.info(f"FastClassifier: Escalating to LLM (best '{use_case}', confidence {confidence:.2f})")
+        return None
+
+    def stats(self):
+        with self._lock:
+            total = self.fast_path + self.escalated
+            return {
+                "fast_path": self.fast_path,
+                "escalated": self.escalated,
+                "escalation_rate": self.escalated / total if total else 0.0,
+                "threshold": self.threshold,
+                "model_samples": self.model.sample_count if self.model else 0
+            }
+
+
+def train_from_entries(limit=CLASSIFIER_TRAINING_LIMIT):
+    """Train a Naive Bayes model from labeled entries (None if too few samples)"""
+    from db import get_db, ENTRY_VIEWS
+
+    db = get_db()
+    cursor = db.entries.find(
+        {"use_case": {"$in": USE_CASES}},
+        ENTRY_VIEWS["training"]
+    ).sort("timestamp", -1).limit(limit)
+
+    samples = [(e["message"], e["use_case"]) for e in cursor if e.get("message")]
+    if len(samples) < CLASSIFIER_MIN_TRAINING_SAMPLES:
+        logger.info(f"FastClassifier: {len(samples)} labeled entries, using keywords only")
+        return None
+
+    logger.info(f"FastClassifier: Trained on {len(samples)} labeled entries")
+    return NaiveBayesModel().fit(samples)
+
+
+# Process-wide classifier, trained lazily on first use
+_classifier = None
+_classifier_lock = threading.Lock()
+
+def get_classifier():
+    """Get the shared classifier, training it from entries on first use"""
+    global _classifier
+    if _classifier is not None:
+        return _classifier
+
+    with _classifier_lock:
+        if _classifier is None:
+            try:
+                model = train_from_entries()
+            except Exception as e:
+                logger.warning(f"FastClassifier: Training failed ({e}), using keywords only")
+                model = None
+            _classifier = FastClassifier(model=model)
+    return _classifier
+
+def fast_classify(message):
+    """Classify locally when confident, else None to escalate to the LLM"""
+    if not CLASSIFIER_ENABLED:
+        return None
+    return get_classifier().classify(message)
+
+def get_classifier_stats():
+    """Get fast-path vs escalation counters"""
+    return get_classifier().stats()
@@ -1,21 +1,17 @@
-import os
-from langchain_anthropic import ChatAnthropic
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.messages import HumanMessage, SystemMessage
 from dotenv import load_dotenv
 import json
 from datetime import datetime
+from llm_profiles import get_llm, get_profile
+from llm_cache import response_cache, make_cache_key, TTL_CLASSIFICATION, TTL_EXTRACTION
+from telemetry import record
+import metrics
+from context_window import history_to_messages, pack_history
 
 load_dotenv()
 
-# Initialize LangChain ChatAnthropic
-llm = ChatAnthropic(
-    model=os.getenv("CLAUDE_MODEL", "claude-sonnet-4-5-20250929"),
-    api_key=os.getenv("ANTHROPIC_API_KEY"),
-    max_tokens=int(os.getenv("CLAUDE_LOGIN_GREETING_MAX_TOKENS", "1024"))
-)
-
-def get_claude_response(prompt, system_prompt=None, model="claude-sonnet-4-5-20250929", conversation_history=None):
-    """Get response from Claude API via LangChain with optional conversation context"""
+def build_messages(prompt, system_prompt=None, conversation_history=None, profile="default"):
+    """Build LangChain messages with date context and recent conversation history"""
     import logging
     logger = logging.getLogger(__name__)
 
@@ -36,25 +32,53 @@ def get_claude_response(prompt, system_prompt=None, model="claude-sonnet-4-5-202
     if system_prompt:
         messages.append(SystemMessage(content=system_prompt))
 
-    # Add conversation history if provided (for context/memory)
+    # Add conversation history if provided (packed into the profile's token budget)
     if conversation_history:
-        logger.info(f"Adding {len(conversation_history[-8:])} messages from conversation history")
-        # Only include last few messages to avoid token limits
-        for msg in conversation_history[-8:]:  # Last 8 messages for context
-            if msg["role"] == "user":
-                messages.append(HumanMessage(content=msg["content"]))
-            elif msg["role"] == "assistant":
-                messages.append(AIMessage(content=msg["content"]))
+        history_messages = history_to_messages(conversation_history, profile)
+        logger.info(f"Adding {len(history_messages)} messages from conversation history")
+        messages.extend(history_messages)
 
     # Add current prompt as latest user message
     messages.append(HumanMessage(content=prompt))
 
+    return messages
+
+def get_claude_response(prompt, system_prompt=None, model="claude-sonnet-4-5-20250929", conversation_history=None, cache_ttl=None, profile="default"):
+    """Get response from Claude API via LangChain with optional conversation context
+
+    Pass cache_ttl (seconds) to memoize the response for repeatable prompts.
+    The profile selects the model and token budget (see llm_profiles.py).
+    """
+    import logging
+    logger = logging.getLogger(__name__)
+
+    llm = get_llm(profile)
+
+    # Check response cache (keyed before the volatile date suffix is added)
+    cache_key = None
+    if cache_ttl and response_cache is not None:
+        budget = get_profile(profile).get("context_tokens", 0)
+        cache_key = make_cache_key(llm.model, system_prompt, pack_history(conversation_history, budget), prompt)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            logger.info("LLM response cache hit")
+            record(cache_hits=1)
+            metrics.LLM_CACHE.labels("hit").inc()
+            return cached
+        record(cache_misses=1)
+        metrics.LLM_CACHE.labels("miss").inc()
+
+    messages = build_messages(prompt, system_prompt, conversation_history, profile)
+
     logger.info(f"Invoking LangChain LLM with {len(messages)} messages")
 
     # Invoke LangChain LLM
     response = llm.invoke(messages)
     logger.info(f"Received response from LLM: {len(response.content)} chars")
 
+    if cache_key:
+        response_cache.set(cache_key, response.content, cache_ttl)
+
     return response.content
 
 def classify_intent(message):
@@ -76,7 +100,7 @@ Keywords:
 Respond with ONLY ONE WORD: workout, note, summary, or morning.
 If unclear, default to "note"."""
 
-    response = get_claude_response(message, system_prompt)
+    response = get_claude_response(message, system_prompt, cache_ttl=TTL_CLASSIFICATION, profile="supervisor")
     intent = response.strip().lower()
 
     # Validate intent
@@ -101,14 +125,15 @@ Output: {"activity": "pushups and running", "duration": "30 reps, 5k", "details"
 
 Respond with ONLY valid JSON, no extra text."""
 
-    response = get_claude_response(message, system_prompt)
+    response = get_claude_response(message, system_prompt, cache_ttl=TTL_EXTRACTION, profile="health_fitness")
 
     try:
         # Try to parse JSON response
         data = json.loads(response)
         return data.get("activity", "workout"), data.get("duration", ""), data.get("details", "")
-    except:
+    except Exception:
         # Fallback if JSON parsing fails
+        metrics.JSON_FALLBACKS.labels("parse_workout").inc()
         return "workout", "", message
 
 def summarize_note(message):
@@ -124,7 +149,7 @@ Output: "Completed Q1 report, sent to Sarah"
 
 Respond with ONLY the summary, no extra text."""
 
-    response = get_claude_response(message, system_prompt)
+    response = get_claude_response(message, system_prompt, cache_ttl=TTL_EXTRACTION, profile="notes_reminders")
     return response.strip()
 
 def generate_daily_summary(notes, workouts, username=None):
@@ -154,7 +179,7 @@ NOTES:
 
 Write a 2-4 sentence daily summary."""
 
-    response = get_claude_response(prompt, system_prompt)
+    response = get_claude_response(prompt, system_prompt, profile="summary_analytics")
     return response.strip()
 
 def generate_morning_motivation(username=None, yesterday_summary=None):
@@ -172,7 +197,7 @@ If you know what they did yesterday, reference it briefly."""
     else:
         prompt = f"Give a motivational morning message for {user_greeting} to start the day."
 
-    response = get_claude_response(prompt, system_prompt)
+    response = get_claude_response(prompt, system_prompt, profile="motivation_wellbeing")
     return response.strip()
 
 def generate_login_greeting(username, day_of_week, hints=None):
@@ -200,5 +225,20 @@ Generate a SHORT welcome message (1-2 sentences ONLY) that:
 
 Give a short, warm welcome (1-2 sentences max)."""
 
-    response = get_claude_response(prompt, system_prompt)
+    response = get_claude_response(prompt, system_prompt, profile="greeting")
     return response.strip()
+
+def get_structured_response(prompt, schema, system_prompt=None, conversation_history=None, profile="default"):
+    """Get a schema-validated response (pydantic model) via tool calling in a single LLM call"""
+    import logging
+    logger = logging.getLogger(__name__)
+
+    llm = get_llm(profile)
+
+    messages = build_messages(prompt, system_prompt, conversation_history, profile)
+
+    logger.info(f"Invoking structured LLM ({schema.__name__}) with {len(messages)} messages")
+    result = llm.with_structured_output(schema).invoke(messages)
+    logger.info(f"Received structured response: {schema.__name__}")
+
+    return result
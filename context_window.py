@@ -0,0 +1,199 @@
+"""
+Context Window - Token-aware conversation history with rolling summaries
+
+History is packed newest-first into the calling node's token budget
+(context_tokens in llm_profiles.py) instead of a fixed last-8 slice. Tokens
+are estimated locally from character counts.
+
+Turns that fall out of the recent window are folded into a per-user rolling
+summary (conversation_summaries collection). The summary is refreshed out of
+band on a background worker every SUMMARY_EVERY_N_MESSAGES saved messages,
+and leads the history as a {"role": "summary"} item.
+
+Configure with CONTEXT_MAX_MESSAGES, SUMMARY_ENABLED, SUMMARY_EVERY_N_MESSAGES,
+SUMMARY_KEEP_RECENT and SUMMARY_CACHE_SECONDS.
+"""
+import os
+import math
+import time
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from llm_profiles import get_llm, get_profile
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Recent messages loaded per request - the token budget decides how many are used
+CONTEXT_MAX_MESSAGES = int(os.getenv("CONTEXT_MAX_MESSAGES", "30"))
+
+SUMMARY_ENABLED = os.getenv("SUMMARY_ENABLED", "true").lower() == "true"
+SUMMARY_EVERY_N_MESSAGES = int(os.getenv("SUMMARY_EVERY_N_MESSAGES", "10"))
+SUMMARY_KEEP_RECENT = int(os.getenv("SUMMARY_KEEP_RECENT", "10"))
+# How long a process serves a loaded summary before re-reading it (other processes may update it)
+SUMMARY_CACHE_SECONDS = float(os.getenv("SUMMARY_CACHE_SECONDS", "60"))
+SUMMARY_MAX_MESSAGES = 200  # per summarizer call
+SUMMARY_ROLE = "summary"
+
+# Local token estimate - conservative for English text on Claude models
+CHARS_PER_TOKEN = 3.5
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_SYSTEM_PROMPT = """You maintain a running summary of a chat between {username} and Nomi, their personal assistant.
+
+Merge the new messages into the existing summary. Keep what helps future replies:
+goals, routines, recent workouts, open tasks and reminders, preferences, mood.
+Drop small talk. Max 120 words, plain text, third person."""
+
+_summaries = {}  # username -> (summary, loaded at)
+_summaries_lock = threading.Lock()
+_unsummarized = Counter()
+_in_flight = set()
+_summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-summary")
+
+
+def count_tokens(text):
+    """Estimate the token count of a string"""
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+def message_tokens(message):
+    """Estimate the token count of a history message, including role overhead"""
+    return count_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+def pack_history(conversation_history, budget):
+    """Most recent messages (and the leading summary, if any) that fit in the token budget
+
+    Messages stay contiguous and oldest first. If even the newest message is
+    over budget, its tail is kept.
+    """
+    if not conversation_history or budget <= 0:
+        return []
+
+    summary = None
+    messages = list(conversation_history)
+    if messages[0].get("role") == SUMMARY_ROLE:
+        summary = messages.pop(0)
+
+    packed = []
+    used = 0
+    for message in reversed(messages):
+        cost = message_tokens(message)
+        if used + cost > budget:
+            if not packed:
+                keep_chars = int((budget - MESSAGE_OVERHEAD_TOKENS) * CHARS_PER_TOKEN)
+                if keep_chars > 0:
+                    packed.append({**message, "content": "…" + message["content"][-keep_chars:]})
+            break
+        packed.append(message)
+        used += cost
+    packed.reverse()
+
+    # The summary only matters when older turns were dropped
+    if summary and len(packed) < len(messages) and used + message_tokens(summary) <= budget:
+        packed.insert(0, summary)
+    return packed
+
+def history_to_messages(conversation_history, node="default"):
+    """Pack history into the node's token budget and convert it to LangChain messages"""
+    budget = get_profile(node).get("context_tokens", 0)
+    messages = []
+    for msg in pack_history(conversation_history, budget):
+        if msg["role"] == "user":
+            messages.append(HumanMessage(content=msg["content"]))
+        elif msg["role"] == "assistant":
+            messages.append(AIMessage(content=msg["content"]))
+        elif msg["role"] == SUMMARY_ROLE:
+            # Follows the caller's system prompt, so it is sent as part of the system text
+            messages.append(SystemMessage(content=f"Summary of earlier conversation:\n{msg['content']}"))
+    return messages
+
+
+# Rolling summaries
+def get_summary(username):
+    """Get the user's rolling summary text ('' if none), re-read from MongoDB every SUMMARY_CACHE_SECONDS"""
+    cached = _summaries.get(username)
+    if cached is not None and time.monotonic() - cached[1] < SUMMARY_CACHE_SECONDS:
+        return cached[0]
+
+    from db import get_conversation_summary
+
+    doc = get_conversation_summary(username)
+    summary = doc.get("summary", "") if doc else ""
+    with _summaries_lock:
+        _summaries[username] = (summary, time.monotonic())
+    return summary
+
+def with_summary(username, conversation_history):
+    """Prepend the user's rolling summary to their recent history"""
+    summary = get_summary(username) if SUMMARY_ENABLED else ""
+    if not summary:
+        return conversation_history
+    return [{"role": SUMMARY_ROLE, "content": summary}] + list(conversation_history)
+
+def format_transcript(messages, max_chars=500):
+    """Render messages as 'role: content' lines for the summarizer"""
+    return "\n".join(f"{m['role']}: {m['content'][:max_chars]}" for m in messages)
+
+def update_summary(username):
+    """Fold messages older than the recent window into the user's rolling summary
+
+    Pages forward from the last summarized message, SUMMARY_MAX_MESSAGES per
+    summarizer call, until only the recent window is left.
+    """
+    from db import get_conversation_summary, save_conversation_summary, read_messages_after
+
+    doc = get_conversation_summary(username) or {}
+    summary = doc.get("summary", "")
+    covered_until = doc.get("covered_until")
+
+    while True:
+        messages = read_messages_after(username, covered_until, limit=SUMMARY_MAX_MESSAGES + SUMMARY_KEEP_RECENT)
+        to_summarize = messages[:len(messages) - SUMMARY_KEEP_RECENT][:SUMMARY_MAX_MESSAGES]
+        if not to_summarize:
+            return summary
+
+        prompt = f"""Existing summary:
+{summary or "(none)"}
+
+New messages:
+{format_transcript(to_summarize)}"""
+
+        response = get_llm("conversation_summary").invoke([
+            SystemMessage(content=SUMMARY_SYSTEM_PROMPT.format(username=username)),
+            HumanMessage(content=prompt)
+        ])
+        summary = response.content.strip()
+        covered_until = to_summarize[-1]["timestamp"]
+
+        save_conversation_summary(username, summary, covered_until)
+        with _summaries_lock:
+            _summaries[username] = (summary, time.monotonic())
+        logger.info(f"ContextWindow: Summarized {len(to_summarize)} messages for '{username}' ({count_tokens(summary)} tokens)")
+        if len(to_summarize) < SUMMARY_MAX_MESSAGES:
+            return summary
+
+def schedule_summary_update(username, new_messages=2):
+    """Count newly saved messages and refresh the summary in the background every N"""
+    if not SUMMARY_ENABLED:
+        return None
+
+    with _summaries_lock:
+        _unsummarized[username] += new_messages
+        if _unsummarized[username] < SUMMARY_EVERY_N_MESSAGES or username in _in_flight:
+            return None
+        _unsummarized[username] = 0
+        _in_flight.add(username)
+
+    def run():
+        try:
+            update_summary(username)
+        except Exception as e:
+            logger.warning(f"ContextWindow: Summary update failed for '{username}': {e}")
+        finally:
+            with _summaries_lock:
+                _in_flight.discard(username)
+
+    return _summary_executor.submit(run)
@@ -0,0 +1,90 @@
+"""
+Conversation Cache - Session-scoped read-through cache for chat history
+
+Seeded once from get_messages, appended as the session saves messages and
+bounded in size. Serves the agents' conversation_history from memory: writes
+by other sessions in this process show up in the process-local message
+version, and writes by other processes (or clear_messages / a reply upgrade
+there) in the user's message version in MongoDB, which is checked at most
+every CONVERSATION_CACHE_CHECK_SECONDS. Either one moving by more than this
+session's own saves reloads the cache from MongoDB.
+
+Configure the bound with CONVERSATION_CACHE_SIZE.
+"""
+import os
+import time
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from db import get_messages, save_message, get_message_version, get_local_message_version
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+CONVERSATION_CACHE_SIZE = int(os.getenv("CONVERSATION_CACHE_SIZE", "50"))
+# How often to check MongoDB for writes made by other processes
+CONVERSATION_CACHE_CHECK_SECONDS = float(os.getenv("CONVERSATION_CACHE_CHECK_SECONDS", "30"))
+
+
+class ConversationCache:
+    """Bounded, per-session copy of a user's recent messages"""
+
+    def __init__(self, username, max_messages=CONVERSATION_CACHE_SIZE):
+        self.username = username
+        self.max_messages = max_messages
+        self.messages = deque(maxlen=max_messages)
+        self.version = None       # MongoDB message version at the last check
+        self.checked_local = 0    # process-local version at the last check
+        self.local_version = 0    # process-local version the cached messages reflect
+        self.checked_at = 0.0
+
+    def reload(self):
+        """Seed the cache from MongoDB"""
+        self.checked_local = self.local_version = get_local_message_version(self.username)
+        self.version = get_message_version(self.username)
+        self.checked_at = time.monotonic()
+        self.messages.clear()
+        for msg in get_messages(self.username, limit=self.max_messages):
+            self.messages.append({"role": msg.role, "content": msg.content, "timestamp": msg.timestamp})
+        logger.info(f"ConversationCache: Loaded {len(self.messages)} messages for '{self.username}'")
+
+    def save(self, role, content, turn_id=None):
+        """Save a message to MongoDB and append it to the cache"""
+        save_message(self.username, role, content, turn_id=turn_id)
+        if self.version is not None:
+            self.messages.append({"role": role, "content": content, "timestamp": datetime.now()})
+            self.local_version += 1
+
+    def invalidate(self):
+        """Force a reload on next read"""
+        self.version = None
+
+    def sync(self):
+        """Reload if another session wrote since the last sync"""
+        local = get_local_message_version(self.username)
+        if self.version is None or local != self.local_version:
+            self.reload()
+            return
+        if time.monotonic() - self.checked_at < CONVERSATION_CACHE_CHECK_SECONDS:
+            return
+
+        # Flushes this process's queued writes, so the version includes them
+        version = get_message_version(self.username)
+        if version != self.version + local - self.checked_local:
+            self.reload()
+        else:
+            self.version, self.checked_local, self.checked_at = version, local, time.monotonic()
+
+    def get_all(self):
+        """All cached messages as {"role", "content"} dicts, oldest first (reloads if stale)"""
+        self.sync()
+        return [{"role": m["role"], "content": m["content"]} for m in self.messages]
+
+    def get_recent(self, max_messages=10, hours=24):
+        """Recent conversation in get_recent_conversation format (reloads if stale)"""
+        self.sync()
+
+        threshold = datetime.now() - timedelta(hours=hours)
+        recent = [m for m in self.messages if m["timestamp"] and m["timestamp"] >= threshold]
+        return [{"role": m["role"], "content": m["content"]} for m in recent[-max_messages:]]
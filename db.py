@@ -1,8 +1,18 @@
-from pymongo import MongoClient
-from datetime import datetime
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure
+from bson import ObjectId
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 import os
+import re
+import time
+import atexit
 import logging
+import threading
 from dotenv import load_dotenv
+from telemetry import DBCommandListener
+import metrics
 
 load_dotenv()
 
@@ -12,25 +22,481 @@ logger = logging.getLogger(__name__)
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 DB_NAME = "nomi_db"
 
+# Connection pool settings (shared by every session in the process)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "10000"))
+
+# Chat message layout: "documents" (one document per message) or
+# "buckets" (one message_buckets document per user per day)
+MESSAGE_STORAGE = os.getenv("MESSAGE_STORAGE", "documents").lower()
+# Also read the other layout while messages are being moved between them - on by
+# default for buckets (existing messages start in documents), off for documents
+MESSAGE_READ_FALLBACK = (os.getenv("MESSAGE_READ_FALLBACK") or str(MESSAGE_STORAGE == "buckets")).lower() == "true"
+
+# Write-behind settings for chat messages and entries
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() == "true"
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "50"))
+WRITE_BEHIND_FLUSH_INTERVAL_MS = int(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_MS", "200"))
+# Failed writes (other than connection errors) before a document is moved to failed_writes
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "5"))
+
+# Client registry - one pooled MongoClient per URI, created lazily.
+# Lives at module level so it survives Streamlit script reruns and is
+# shared across all user sessions served by this process.
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(uri=None):
+    """Get the shared MongoClient for a URI, creating it on first use"""
+    uri = uri or MONGO_URI
+    client = _clients.get(uri)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(uri)
+        if client is None:
+            client = MongoClient(
+                uri,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+                serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+                socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+                event_listeners=[DBCommandListener()]
+            )
+            _clients[uri] = client
+            logger.info(f"Created MongoDB client (maxPoolSize={MONGO_MAX_POOL_SIZE})")
+    return client
+
+def close_clients():
+    """Close all pooled MongoDB clients (called automatically at exit)"""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+
+    for client in clients:
+        try:
+            client.close()
+        except Exception as e:
+            logger.warning(f"Error closing MongoDB client: {e}")
+
+    if clients:
+        logger.info(f"Closed {len(clients)} MongoDB client(s)")
+
+atexit.register(close_clients)
+
 def get_db():
     """Get MongoDB database instance"""
-    client = MongoClient(MONGO_URI)
-    logger.debug(f"Connected to MongoDB: {DB_NAME}")
-    return client[DB_NAME]
+    return get_client()[DB_NAME]
 
-def init_collections():
-    """Initialize MongoDB collections with indexes"""
+# Write-behind queue - messages and entries are buffered in memory and written
+# in insert_many batches by a background thread, flushed by size or time.
+# Readers in this module call flush_writes(username) first (read-your-writes for
+# that user), and anything still queued is flushed at exit before the clients
+# are closed. A failed write never raises in a reader: connection errors are
+# requeued (and logged as stale reads), and a document that keeps failing is
+# moved to failed_writes.
+_write_queue = []          # (collection, document) in save order
+_write_pending = 0         # queued + in-flight documents
+_write_failures = {}       # document _id -> failed attempts
+_write_in_flight = set()   # users with documents being written - one flush per user at a time
+_write_active = 0          # batches being written (flushes and direct writes)
+_write_paused_by = None    # thread holding writes_paused(), if any
+_write_cond = threading.Condition()
+_writer_thread = None
+
+metrics.gauge("nomi_write_behind_pending_documents", "Documents queued or in flight in the write-behind queue",
+              function=lambda: _write_pending)
+
+# Fields that identify a chat turn's document - these are upserted, not inserted
+TURN_KEYS = {
+    "messages": ("turn_id", "role"),
+    "entries": ("turn_id",)
+}
+
+def enqueue_write(collection, document):
+    """Queue a document for a batched insert (written immediately if write-behind is off)"""
+    global _write_pending
+    # Client-side _id keeps retried batches idempotent
+    document.setdefault("_id", ObjectId())
+
+    if not WRITE_BEHIND_ENABLED:
+        with _write_cond:
+            _begin_write()
+        try:
+            _write_batch([(collection, document)])
+        finally:
+            with _write_cond:
+                _end_write()
+        return
+
+    with _write_cond:
+        _write_queue.append((collection, document))
+        _write_pending += 1
+        _ensure_writer()
+        if len(_write_queue) >= WRITE_BEHIND_BATCH_SIZE:
+            _write_cond.notify()
+
+def flush_writes(username=None):
+    """Persist queued writes (only username's, if given), returns the number of documents written
+
+    A user's documents are written by one flush at a time, in save order, so a
+    flush for one user only waits on that user's in-flight writes. Never raises -
+    documents that could not be written stay queued (see _write_with_retries).
+    """
+    global _write_pending
+    if not _write_pending:
+        return 0
+
+    with _write_cond:
+        _begin_write()
+        if username is None:
+            # Users with a flush in flight keep their documents queued for the next one
+            batch = [item for item in _write_queue if _write_owner(item) not in _write_in_flight]
+        else:
+            while username in _write_in_flight:
+                _write_cond.wait()
+            batch = [item for item in _write_queue if _write_owner(item) == username]
+        if not batch:
+            _end_write()
+            return 0
+        users = {_write_owner(item) for item in batch}
+        _write_queue[:] = [item for item in _write_queue if _write_owner(item) not in users]
+        _write_in_flight.update(users)
+
+    written, requeue = 0, batch
+    try:
+        written, requeue = _write_with_retries(batch)
+    finally:
+        with _write_cond:
+            _write_queue[:0] = requeue
+            _write_pending -= len(batch) - len(requeue)
+            _write_in_flight.difference_update(users)
+            _end_write()
+
+    if requeue and username is not None:
+        logger.error(f"Write-behind: {len(requeue)} of '{username}'s writes are still queued after a failed flush - "
+                     f"reads for this user may be stale")
+        metrics.WRITE_BEHIND_STALE_FLUSHES.inc()
+    return written
+
+def _write_owner(item):
+    """The user a queued write belongs to"""
+    return item[1].get("username")
+
+def _begin_write():
+    """Wait out another thread's writes_paused(), then count a write as active (caller holds _write_cond)"""
+    global _write_active
+    while _write_paused_by not in (None, threading.get_ident()):
+        _write_cond.wait()
+    _write_active += 1
+
+def _end_write():
+    """Count an active write as finished (caller holds _write_cond)"""
+    global _write_active
+    _write_active -= 1
+    _write_cond.notify_all()
+
+@contextmanager
+def writes_paused():
+    """Hold back writes from other threads of this process while rebuilding derived data
+
+    Waits for active writes to finish first, so their rollup and profile
+    updates land before the rebuild. The calling thread can still flush.
+    """
+    global _write_paused_by
+    me = threading.get_ident()
+    with _write_cond:
+        while _write_paused_by not in (None, me):
+            _write_cond.wait()
+        outer = _write_paused_by == me
+        _write_paused_by = me
+        while _write_active:
+            _write_cond.wait()
+    try:
+        yield
+    finally:
+        if not outer:
+            with _write_cond:
+                _write_paused_by = None
+                _write_cond.notify_all()
+
+def _write_with_retries(batch):
+    """Write a batch, isolating failing documents, returns (written, documents to requeue)"""
+    try:
+        _write_batch(batch)
+    except ConnectionFailure as e:
+        logger.error(f"Write-behind: flush of {len(batch)} documents failed, will retry: {e}")
+        return 0, batch
+    except Exception as e:
+        if len(batch) == 1:
+            return 0, _record_write_failure(batch[0], e)
+        logger.warning(f"Write-behind: batch of {len(batch)} documents failed, writing one at a time: {e}")
+        written, requeue = 0, []
+        for item in batch:
+            item_written, item_requeue = _write_with_retries([item])
+            written += item_written
+            requeue += item_requeue
+        return written, requeue
+
+    if _write_failures:
+        for _, document in batch:
+            _write_failures.pop(document["_id"], None)
+    return len(batch), []
+
+def _record_write_failure(item, error):
+    """Count a failed write, returns [item] to requeue or [] once it was moved aside"""
+    collection, document = item
+    attempts = _write_failures.get(document["_id"], 0) + 1
+    if attempts < WRITE_BEHIND_MAX_ATTEMPTS:
+        _write_failures[document["_id"]] = attempts
+        logger.error(f"Write-behind: '{collection}' document {document['_id']} failed (attempt {attempts}): {error}")
+        return [item]
+
+    _write_failures.pop(document["_id"], None)
+    logger.error(f"Write-behind: giving up on '{collection}' document {document['_id']} after {attempts} attempts: {error}")
+    try:
+        get_db().failed_writes.insert_one({
+            "collection": collection,
+            "document": document,
+            "error": str(error),
+            "attempts": attempts,
+            "failed_at": datetime.now()
+        })
+    except Exception as e:
+        logger.error(f"Write-behind: could not store failed document, dropping it: {document!r} ({e})")
+    return []
+
+def _ensure_writer():
+    """Start the background writer thread (caller holds _write_cond)"""
+    global _writer_thread
+    if _writer_thread is None or not _writer_thread.is_alive():
+        _writer_thread = threading.Thread(target=_writer_loop, name="db-write-behind", daemon=True)
+        _writer_thread.start()
+
+def _writer_loop():
+    """Flush when the batch is full or the flush interval has passed since the first queued write"""
+    interval = WRITE_BEHIND_FLUSH_INTERVAL_MS / 1000
+    while True:
+        with _write_cond:
+            while not _write_queue:
+                _write_cond.wait()
+            deadline = time.monotonic() + interval
+            while len(_write_queue) < WRITE_BEHIND_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                _write_cond.wait(remaining)
+
+        flush_writes()
+        with _write_cond:
+            if _write_queue:
+                # Failed documents were requeued - back off before retrying
+                _write_cond.wait(interval)
+
+def _write_batch(batch):
+    """Insert a batch grouped by collection, then apply daily rollups and profiles for new entries"""
     db = get_db()
+    by_collection = {}
+    for collection, document in batch:
+        by_collection.setdefault(collection, []).append(document)
+
+    for collection, documents in by_collection.items():
+        if collection == "message_buckets":
+            _push_to_buckets(db, documents)
+            _bump_message_versions(db, documents)
+            continue
+
+        if collection == "entries":
+            for doc in documents:
+                doc.setdefault("pending", list(ENTRY_SIDE_EFFECTS))
+
+        keyed = [doc for doc in documents if doc.get("turn_id")]
+        plain = [doc for doc in documents if not doc.get("turn_id")]
+        if plain:
+            _insert_many(db[collection], plain)
+        if keyed:
+            _upsert_turns(db[collection], keyed, TURN_KEYS[collection])
+        if collection == "entries":
+            _apply_entry_side_effects(db, documents)
+        elif collection == "messages":
+            _bump_message_versions(db, documents)
+
+    for collection, documents in by_collection.items():
+        metrics.WRITE_BEHIND_DOCUMENTS.labels(collection).inc(len(documents))
+    logger.info(f"Write-behind: wrote {len(batch)} documents")
 
-    # Create indexes for better performance
-    db.users.create_index("username", unique=True)
-    db.notes.create_index([("username", 1), ("timestamp", -1)])
-    db.workouts.create_index([("username", 1), ("timestamp", -1)])
-    db.messages.create_index([("username", 1), ("timestamp", -1)])
+# Per-entry updates applied after the insert. New entries are stored with
+# pending=[...] and each step is claimed - pulled from pending in the same
+# update that checks it is still there - before it runs. A retried batch runs
+# only the steps it can still claim, so no step is applied twice; a batch that
+# fails between a claim and its update leaves that step unapplied until
+# rebuild_rollups / rebuild_user_profiles recompute it.
+ENTRY_SIDE_EFFECTS = ("rollups", "profile")
 
-    # Unified entries collection (new orchestration system)
-    db.entries.create_index([("username", 1), ("timestamp", -1)])
-    db.entries.create_index([("username", 1), ("use_case", 1), ("timestamp", -1)])
+def _claim_entry_step(db, entry_id, step):
+    """Take a pending side-effect step for an entry, returns whether this caller owns it"""
+    return db.entries.find_one_and_update({"_id": entry_id, "pending": step},
+                                          {"$pull": {"pending": step}}, projection={"_id": 1}) is not None
+
+@contextmanager
+def _claimed_step(step, entries):
+    """Log the entries left without a claimed step if its update fails"""
+    try:
+        yield
+    except Exception as e:
+        logger.error(f"Write-behind: '{step}' update failed for claimed entries {[doc['_id'] for doc in entries]}, "
+                     f"not retried - run the rebuild to repair: {e}")
+        raise
+
+def _apply_entry_side_effects(db, documents):
+    """Apply rollups and profile updates for entries whose steps are still pending"""
+    rollups = [doc for doc in documents if _claim_entry_step(db, doc["_id"], "rollups")]
+    if rollups:
+        pending = {}
+        for entry in rollups:
+            _add_to_rollups(pending, entry)
+        with _claimed_step("rollups", rollups):
+            _flush_rollups(db, pending)
+
+    profiles = [doc for doc in documents if _claim_entry_step(db, doc["_id"], "profile")]
+    if profiles:
+        with _claimed_step("profile", profiles):
+            _apply_profile_updates(db, [op for entry in profiles for op in profile_updates(entry)])
+
+    db.entries.update_many({"_id": {"$in": [doc["_id"] for doc in documents]}, "pending": {"$size": 0}},
+                           {"$unset": {"pending": ""}})
+
+def _insert_many(collection, documents):
+    """insert_many that tolerates documents already written by an earlier attempt"""
+    try:
+        collection.insert_many(documents, ordered=False)
+        return documents
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != 11000 for error in errors):
+            raise
+        duplicates = {error["index"] for error in errors}
+        return [doc for i, doc in enumerate(documents) if i not in duplicates]
+
+def _upsert_turns(collection, documents, keys):
+    """Insert turn documents unless one with the same turn key exists, returns the new ones"""
+    requests = [
+        UpdateOne({key: doc[key] for key in keys}, {"$setOnInsert": doc}, upsert=True)
+        for doc in documents
+    ]
+    try:
+        result = collection.bulk_write(requests, ordered=False)
+        upserted = result.upserted_ids
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != 11000 for error in errors):
+            raise
+        # Lost a concurrent upsert race - the turn is already stored
+        upserted = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+
+    skipped = len(documents) - len(upserted)
+    if skipped:
+        logger.info(f"Write-behind: skipped {skipped} duplicate turn documents in '{collection.name}'")
+    return [documents[i] for i in sorted(upserted)]
+
+def _push_to_buckets(db, messages):
+    """Append messages to their per-day buckets, skipping ones already stored"""
+    requests = []
+    for message in messages:
+        key = f"{message['username']}|{message['timestamp'].strftime('%Y-%m-%d')}"
+        item = {k: v for k, v in message.items() if k != "username"}
+        if item.get("turn_id"):
+            already_stored = {"$elemMatch": {"turn_id": item["turn_id"], "role": item["role"]}}
+            query = {"_id": key, "messages": {"$not": already_stored}}
+        else:
+            query = {"_id": key, "messages._id": {"$ne": item["_id"]}}
+
+        requests.append(UpdateOne(query, {
+            "$push": {"messages": {"$each": [item], "$sort": {"timestamp": 1}}},
+            "$inc": {"count": 1},
+            "$setOnInsert": {"username": message["username"], "day": key.split("|", 1)[1]}
+        }, upsert=True))
+
+    try:
+        db.message_buckets.bulk_write(requests, ordered=False)
+    except BulkWriteError as e:
+        # A duplicate key means the bucket exists but already holds the message
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != 11000 for error in errors):
+            raise
+        logger.info(f"Write-behind: skipped {len(errors)} duplicate bucketed messages")
+
+def _flush_at_exit():
+    """Flush pending writes on interpreter shutdown"""
+    flushed = flush_writes()
+    if flushed:
+        logger.info(f"Flushed {flushed} pending writes at exit")
+    if _write_queue:
+        logger.error(f"Could not flush {len(_write_queue)} pending writes at exit")
+
+# Registered after close_clients so it runs first (atexit is LIFO)
+atexit.register(_flush_at_exit)
+
+# Read models - compact, projection-aware views of documents for read paths
+class Entry:
+    """Unified entry holding only the projected fields (others are None)"""
+    __slots__ = ("id", "username", "message", "response", "use_case", "metadata", "timestamp")
+
+    def __init__(self, doc):
+        self.id = doc.get("_id")
+        self.username = doc.get("username")
+        self.message = doc.get("message")
+        self.response = doc.get("response")
+        self.use_case = doc.get("use_case")
+        metadata = doc.get("metadata")
+        self.metadata = dict(metadata) if metadata else {}
+        self.timestamp = doc.get("timestamp")
+
+    def get(self, key, default=None):
+        value = getattr(self, "id" if key == "_id" else key, None)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        return getattr(self, "id" if key == "_id" else key)
+
+
+class Message:
+    """Chat message with role, content and timestamp only"""
+    __slots__ = ("role", "content", "timestamp")
+
+    def __init__(self, doc):
+        self.role = doc.get("role")
+        self.content = doc.get("content")
+        self.timestamp = doc.get("timestamp")
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+
+# Field projections per read path - fetch only what each view renders
+ENTRY_VIEWS = {
+    "workout_card": {"timestamp": 1, "metadata.activity": 1, "metadata.duration": 1, "metadata.intensity": 1, "metadata.details": 1},
+    "note_card": {"timestamp": 1, "message": 1, "metadata.summary": 1},
+    "summary_list": {"timestamp": 1, "use_case": 1, "message": 1, "response": 1,
+                     "metadata.activity": 1, "metadata.duration": 1, "metadata.summary": 1},
+    "training": {"_id": 0, "message": 1, "use_case": 1}
+}
+
+MESSAGE_PROJECTION = {"_id": 0, "role": 1, "content": 1, "timestamp": 1}
+
+def init_collections():
+    """Initialize MongoDB collections with indexes (once per process, see migrations.py)"""
+    from migrations import ensure_schema
+    ensure_schema()
 
 # User operations
 def create_user(username, password):
@@ -128,39 +594,162 @@ def get_workouts(username, date=None):
     return list(db.workouts.find(query).sort("timestamp", -1))
 
 # Message history operations
-def save_message(username, role, content):
-    """Save a chat message"""
-    db = get_db()
+
+# Per-user message write versions, stored in message_versions so session caches
+# in any process detect writes made by other sessions of the same user. Saved
+# messages bump the version when the write-behind batch is written (one per
+# message); clears, reply upgrades and migrations bump it directly. Every bump
+# is mirrored in a process-local counter when the change is made, so caches see
+# this process's writes without a database read.
+_local_message_versions = Counter()
+_local_message_versions_lock = threading.Lock()
+
+def _bump_local_message_version(username):
+    with _local_message_versions_lock:
+        _local_message_versions[username] += 1
+
+def get_local_message_version(username):
+    """Number of message changes this process has made for a user (no database read)"""
+    with _local_message_versions_lock:
+        return _local_message_versions[username]
+
+def bump_message_version(username, db=None):
+    """Record a change to a user's messages outside the write-behind queue"""
+    _bump_local_message_version(username)
+    db = db if db is not None else get_db()
+    db.message_versions.update_one({"_id": username}, {"$inc": {"version": 1}}, upsert=True)
+
+def _bump_message_versions(db, messages):
+    """Bump versions for a written batch of messages (one per message)"""
+    counts = Counter(message["username"] for message in messages)
+    db.message_versions.bulk_write([
+        UpdateOne({"_id": username}, {"$inc": {"version": count}}, upsert=True)
+        for username, count in counts.items()
+    ], ordered=False)
+
+def get_message_version(username):
+    """Get a user's message write version (after flushing this process's pending writes for them)"""
+    flush_writes(username)
+    doc = get_db().message_versions.find_one({"_id": username})
+    return doc["version"] if doc else 0
+
+def save_message(username, role, content, turn_id=None):
+    """Queue a chat message for saving
+
+    Messages with a turn_id are written at most once per (turn_id, role).
+    """
     logger.info(f"Saving message for user '{username}' with role '{role}'")
-    db.messages.insert_one({
+    message = {
         "username": username,
         "role": role,
         "content": content,
         "timestamp": datetime.now()
-    })
+    }
+    if turn_id:
+        message["turn_id"] = turn_id
+    _bump_local_message_version(username)
+    enqueue_write("message_buckets" if MESSAGE_STORAGE == "buckets" else "messages", message)
+
+def _document_messages(db, username, limit, since=None, before=None):
+    """Newest messages from the one-document-per-message layout, oldest first"""
+    query = {"username": username}
+    if since or before:
+        query["timestamp"] = {}
+        if since:
+            query["timestamp"]["$gte"] = since
+        if before:
+            query["timestamp"]["$lt"] = before
+    # _id breaks timestamp ties (client-side ObjectIds follow save order)
+    cursor = (db.messages.find(query, MESSAGE_PROJECTION)
+              .sort([("timestamp", -1), ("_id", -1)])
+              .limit(limit))
+    return list(cursor)[::-1]
+
+def _bucketed_messages(db, username, limit, since=None, before=None):
+    """Newest messages from per-day buckets, oldest first (usually one or two fetches)"""
+    query = {"username": username}
+    if since or before:
+        query["day"] = {}
+        if since:
+            query["day"]["$gte"] = since.strftime("%Y-%m-%d")
+        if before:
+            query["day"]["$lte"] = before.strftime("%Y-%m-%d")
+
+    messages = []
+    cursor = (db.message_buckets.find(query, {"messages": {"$slice": -limit}, "_id": 0})
+              .sort("day", -1)
+              .batch_size(2))
+    for bucket in cursor:
+        day_messages = [
+            m for m in bucket.get("messages", [])
+            if (not since or m["timestamp"] >= since) and (not before or m["timestamp"] < before)
+        ]
+        messages[:0] = day_messages
+        if len(messages) >= limit:
+            break
+    return messages[-limit:]
+
+def read_messages(username, limit=50, since=None):
+    """Newest messages as dicts, oldest first - serves both storage layouts
+
+    The configured layout is read first; with MESSAGE_READ_FALLBACK, older
+    messages still in the other layout (not migrated yet) top up the result.
+    """
+    flush_writes(username)
+    db = get_db()
+    if MESSAGE_STORAGE == "buckets":
+        primary, secondary = _bucketed_messages, _document_messages
+    else:
+        primary, secondary = _document_messages, _bucketed_messages
+
+    messages = primary(db, username, limit, since)
+    if MESSAGE_READ_FALLBACK and len(messages) < limit:
+        before = messages[0]["timestamp"] if messages else None
+        messages = secondary(db, username, limit - len(messages), since, before) + messages
+    return messages
+
+def _document_messages_after(db, username, after, limit):
+    """Oldest messages saved after a timestamp from the one-document-per-message layout"""
+    query = {"username": username}
+    if after:
+        query["timestamp"] = {"$gt": after}
+    return list(db.messages.find(query, MESSAGE_PROJECTION).sort([("timestamp", 1), ("_id", 1)]).limit(limit))
+
+def _bucketed_messages_after(db, username, after, limit):
+    """Oldest messages saved after a timestamp from per-day buckets"""
+    query = {"username": username}
+    if after:
+        query["day"] = {"$gte": after.strftime("%Y-%m-%d")}
+
+    messages = []
+    for bucket in db.message_buckets.find(query, {"messages": 1, "_id": 0}).sort("day", 1).batch_size(2):
+        messages += [m for m in bucket.get("messages", []) if not after or m["timestamp"] > after]
+        if len(messages) >= limit:
+            break
+    return messages[:limit]
+
+def read_messages_after(username, after=None, limit=50):
+    """Oldest messages saved after a timestamp (all, if None), oldest first - for paging forward"""
+    flush_writes(username)
+    db = get_db()
+    readers = [_document_messages_after, _bucketed_messages_after]
+    if MESSAGE_STORAGE == "buckets":
+        readers.reverse()
+    if not MESSAGE_READ_FALLBACK:
+        readers = readers[:1]
+
+    messages = [message for reader in readers for message in reader(db, username, after, limit)]
+    return sorted(messages, key=lambda m: m["timestamp"])[:limit]
 
 def get_messages(username, limit=50):
     """Get recent messages for a user"""
-    db = get_db()
-    return list(db.messages.find({"username": username})
-                .sort("timestamp", -1)
-                .limit(limit))[::-1]  # Reverse to show oldest first
+    return [Message(doc) for doc in read_messages(username, limit)]
 
 def get_recent_conversation(username, max_messages=10, hours=24):
     """Get recent conversation context for Claude (last N messages or last 24 hours)"""
-    db = get_db()
-    from datetime import timedelta
-
     # Get messages from last 24 hours
     time_threshold = datetime.now() - timedelta(hours=hours)
-
-    messages = list(db.messages.find({
-        "username": username,
-        "timestamp": {"$gte": time_threshold}
-    }).sort("timestamp", -1).limit(max_messages))
-
-    # Reverse to get chronological order (oldest first)
-    messages.reverse()
+    messages = read_messages(username, max_messages, since=time_threshold)
 
     # Format for Claude API (exclude system messages, keep user/assistant)
     conversation_history = []
@@ -174,18 +763,29 @@ def get_recent_conversation(username, max_messages=10, hours=24):
 
 def clear_messages(username):
     """Clear chat history for a user"""
+    flush_writes(username)
     db = get_db()
     db.messages.delete_many({"username": username})
+    db.message_buckets.delete_many({"username": username})
+    bump_message_version(username)
 
 # Unified entries operations (Orchestration system)
 def save_unified_entry(entry):
-    """Save a unified entry to the database"""
-    db = get_db()
+    """Queue a unified entry for saving (its daily rollup is updated when the batch is written)
+
+    Entries with a turn_id are written at most once per turn.
+    """
     logger.info(f"Saving unified entry for user '{entry.get('username')}' with use_case '{entry.get('use_case')}'")
-    db.entries.insert_one(entry)
+    enqueue_write("entries", entry)
 
-def get_unified_entries(username, start_date=None, end_date=None, use_case=None, limit=100):
-    """Get unified entries with optional filters"""
+def get_unified_entries(username, start_date=None, end_date=None, use_case=None, limit=100, view=None, before=None):
+    """Get unified entries with optional filters, newest first
+
+    With a view name (see ENTRY_VIEWS) only that view's fields are fetched and
+    Entry objects are returned.
+    before=(timestamp, _id) is a keyset cursor - only older entries are returned.
+    """
+    flush_writes(username)
     db = get_db()
     query = {"username": username}
 
@@ -204,12 +804,369 @@ def get_unified_entries(username, start_date=None, end_date=None, use_case=None,
     if use_case:
         query["use_case"] = use_case
 
-    return list(db.entries.find(query).sort("timestamp", -1).limit(limit))
+    # Keyset pagination - (timestamp, _id) strictly older than the cursor
+    if before:
+        before_ts, before_id = before
+        query = {"$and": [query, {"$or": [
+            {"timestamp": {"$lt": before_ts}},
+            {"timestamp": before_ts, "_id": {"$lt": before_id}}
+        ]}]}
+
+    sort = [("timestamp", -1), ("_id", -1)]
+
+    if not view:
+        return list(db.entries.find(query).sort(sort).limit(limit))
+
+    cursor = db.entries.find(query, ENTRY_VIEWS[view]).sort(sort).limit(limit)
+    return [Entry(doc) for doc in cursor]
+
+def get_entries_page(username, use_case=None, view=None, before=None, page_size=20):
+    """Get one page of entries and the cursor for the next (older) page, or None if last"""
+    entries = get_unified_entries(username, use_case=use_case, limit=page_size + 1, view=view, before=before)
+    if len(entries) <= page_size:
+        return entries, None
+
+    entries = entries[:page_size]
+    last = entries[-1]
+    return entries, (last["timestamp"], last["_id"])
 
-def get_entries_by_use_case(username, use_case, limit=50):
+def get_entries_by_use_case(username, use_case, limit=50, view=None):
     """Get entries for a specific use case"""
-    return get_unified_entries(username, use_case=use_case, limit=limit)
+    return get_unified_entries(username, use_case=use_case, limit=limit, view=view)
 
 def get_all_entries(username, limit=100):
     """Get all entries for a user"""
     return get_unified_entries(username, limit=limit)
+
+def replace_turn_response(username, turn_id, new_response):
+    """Replace a turn's stored reply in its entry and assistant message, returns the kinds updated"""
+    flush_writes(username)
+    db = get_db()
+    updated = set()
+
+    entry = db.entries.update_one({"username": username, "turn_id": turn_id}, {"$set": {"response": new_response}})
+    if entry.matched_count:
+        updated.add("entry")
+
+    if MESSAGE_STORAGE == "buckets":
+        # The positional $ targets the element matched by $elemMatch
+        message = db.message_buckets.update_one(
+            {"username": username, "messages": {"$elemMatch": {"turn_id": turn_id, "role": "assistant"}}},
+            {"$set": {"messages.$.content": new_response}}
+        )
+    else:
+        message = db.messages.update_one(
+            {"username": username, "turn_id": turn_id, "role": "assistant"},
+            {"$set": {"content": new_response}}
+        )
+    if message.matched_count:
+        updated.add("message")
+        bump_message_version(username)
+    return updated
+
+def migrate_messages_to_buckets(username=None, db=None, batch_size=1000):
+    """Move messages from the one-document-per-message layout into per-day buckets
+
+    Each batch is appended to its buckets, then deleted from `messages`, so the
+    migration can be stopped and resumed. Returns the number of messages moved.
+    """
+    flush_writes(username)
+    db = db if db is not None else get_db()
+    query = {"username": username} if username else {}
+    moved = 0
+
+    while True:
+        batch = list(db.messages.find(query).sort([("username", 1), ("timestamp", 1)]).limit(batch_size))
+        if not batch:
+            break
+        _push_to_buckets(db, batch)
+        db.messages.delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+        moved += len(batch)
+        logger.info(f"Moved {moved} messages into day buckets")
+
+    for name in ({username} if username else db.message_buckets.distinct("username")):
+        bump_message_version(name, db)
+    return moved
+
+# Rolling conversation summaries - one document per user
+def get_conversation_summary(username):
+    """Get a user's rolling conversation summary document, or None"""
+    return get_db().conversation_summaries.find_one({"_id": username})
+
+def save_conversation_summary(username, summary, covered_until):
+    """Store a user's rolling summary covering messages up to covered_until"""
+    get_db().conversation_summaries.update_one(
+        {"_id": username},
+        {
+            "$set": {"summary": summary, "covered_until": covered_until, "updated_at": datetime.now()},
+            "$inc": {"revisions": 1}
+        },
+        upsert=True
+    )
+
+# Daily rollups - per (username, day) counters maintained on every entry save
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(hours?|hrs?|h|minutes?|mins?|m)\b", re.IGNORECASE)
+
+def rollup_key(value):
+    """Normalize a value for use as a MongoDB field name"""
+    return str(value).strip().lower().replace(".", "_").replace("$", "_")[:64] or "unknown"
+
+def parse_duration_minutes(duration):
+    """Parse '30 min', '1h', '1.5 hours' into minutes (0 if not a time)"""
+    minutes = 0.0
+    for amount, unit in DURATION_PATTERN.findall(duration or ""):
+        amount = float(amount)
+        minutes += amount * 60 if unit.lower().startswith("h") else amount
+    return minutes
+
+def rollup_increments(entry):
+    """Build the $inc document for one entry"""
+    metadata = entry.get("metadata") or {}
+    use_case = entry.get("use_case") or "unknown"
+
+    inc = {"total": 1, f"use_cases.{rollup_key(use_case)}": 1}
+
+    if use_case == "health_fitness":
+        activity = metadata.get("activity") or "workout"
+        inc[f"activities.{rollup_key(activity)}"] = 1
+        minutes = parse_duration_minutes(metadata.get("duration", ""))
+        if minutes:
+            inc["duration_minutes"] = minutes
+
+    for tag in metadata.get("tags") or []:
+        inc[f"tags.{rollup_key(tag)}"] = 1
+
+    if metadata.get("has_reminder"):
+        inc["reminders"] = 1
+
+    return inc
+
+def rebuild_rollups(username=None, db=None, batch_size=1000):
+    """Recompute daily rollups from entries (all users, or one)"""
+    flush_writes(username)
+    db = db if db is not None else get_db()
+    query = {"username": username} if username else {}
+    db.daily_rollups.delete_many(query)
+
+    pending = {}
+    projection = {"username": 1, "use_case": 1, "metadata": 1, "timestamp": 1}
+    for entry in db.entries.find(query, projection):
+        _add_to_rollups(pending, entry)
+
+        if len(pending) >= batch_size:
+            _flush_rollups(db, pending)
+
+    _flush_rollups(db, pending)
+
+def _add_to_rollups(pending, entry):
+    """Accumulate an entry's increments into a {rollup _id: doc} batch"""
+    day = entry["timestamp"].strftime("%Y-%m-%d")
+    key = f"{entry['username']}|{day}"
+    doc = pending.setdefault(key, {"_id": key, "username": entry["username"], "day": day, "inc": Counter()})
+    doc["inc"].update(rollup_increments(entry))
+
+def _flush_rollups(db, pending):
+    """Write accumulated rollup increments in one bulk_write"""
+    if not pending:
+        return
+    updates = [
+        (
+            {"_id": key},
+            {
+                "$inc": dict(doc["inc"]),
+                "$set": {"updated_at": datetime.now()},
+                "$setOnInsert": {"username": doc["username"], "day": doc["day"]}
+            }
+        )
+        for key, doc in pending.items()
+    ]
+    try:
+        db.daily_rollups.bulk_write([UpdateOne(query, update, upsert=True) for query, update in updates], ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != 11000 for error in errors):
+            raise
+        # Lost concurrent upsert races - those documents exist now
+        for error in errors:
+            query, update = updates[error["index"]]
+            db.daily_rollups.update_one(query, update)
+    pending.clear()
+
+def get_daily_rollup(username, day):
+    """Get the rollup for one day (date or 'YYYY-MM-DD'), or None"""
+    day = day.strftime("%Y-%m-%d") if hasattr(day, "strftime") else day
+    flush_writes(username)
+    return get_db().daily_rollups.find_one({"_id": f"{username}|{day}"})
+
+def get_rollups(username, start_date, end_date=None):
+    """Get daily rollups for a date range (inclusive), oldest first"""
+    from datetime import date
+    end_date = end_date or date.today()
+    flush_writes(username)
+    return list(get_db().daily_rollups.find({
+        "username": username,
+        "day": {"$gte": start_date.strftime("%Y-%m-%d"), "$lte": end_date.strftime("%Y-%m-%d")}
+    }).sort("day", 1))
+
+def summarize_rollups(rollups):
+    """Combine daily rollups into one totals dict"""
+    totals = {"total": 0, "days": 0, "duration_minutes": 0, "reminders": 0,
+              "use_cases": Counter(), "activities": Counter(), "tags": Counter()}
+    for rollup in rollups:
+        totals["days"] += 1
+        for field in ("total", "duration_minutes", "reminders"):
+            totals[field] += rollup.get(field, 0)
+        for field in ("use_cases", "activities", "tags"):
+            totals[field].update(rollup.get(field) or {})
+    return totals
+
+def get_day_totals(username, day=None):
+    """Totals for a single day (defaults to today)"""
+    from datetime import date
+    rollup = get_daily_rollup(username, day or date.today())
+    return summarize_rollups([rollup] if rollup else [])
+
+def get_range_totals(username, start_date, end_date=None):
+    """Totals for an arbitrary date range (inclusive)"""
+    return summarize_rollups(get_rollups(username, start_date, end_date))
+
+def get_week_totals(username, end_date=None):
+    """Totals for the 7 days up to and including end_date (defaults to today)"""
+    from datetime import date
+    end_date = end_date or date.today()
+    return get_range_totals(username, end_date - timedelta(days=7), end_date)
+
+# User profiles - compact long-term memory per user, updated incrementally
+# as entries are written (see user_profile.py for the prompt rendering)
+PROFILE_MAX_REMINDERS = 10
+
+def profile_updates(entry):
+    """Build the profile updates for one entry: counters, reminders and the daily streak"""
+    metadata = entry.get("metadata") or {}
+    use_case = entry.get("use_case") or "unknown"
+    timestamp = entry.get("timestamp") or datetime.now()
+    day = timestamp.strftime("%Y-%m-%d")
+    yesterday = (timestamp - timedelta(days=1)).strftime("%Y-%m-%d")
+
+    inc = {"entries": 1, f"use_cases.{rollup_key(use_case)}": 1, f"hours.{timestamp.hour}": 1}
+    if use_case == "health_fitness":
+        inc[f"workout_types.{rollup_key(metadata.get('activity') or 'workout')}"] = 1
+    for tag in metadata.get("tags") or []:
+        inc[f"tags.{rollup_key(tag)}"] = 1
+
+    update = {
+        "$inc": inc,
+        "$set": {"updated_at": datetime.now()},
+        "$setOnInsert": {"first_seen": timestamp}
+    }
+    if metadata.get("has_reminder"):
+        reminder = {
+            "summary": metadata.get("summary") or (entry.get("message") or "")[:100],
+            "reminder_time": metadata.get("reminder_time", ""),
+            "created_at": timestamp
+        }
+        update["$push"] = {"open_reminders": {"$each": [reminder], "$slice": -PROFILE_MAX_REMINDERS}}
+
+    query = {"_id": entry.get("username")}
+    return [
+        UpdateOne(query, update, upsert=True),
+        # Streak - continues from yesterday, restarts after a gap, same day is a no-op
+        UpdateOne({**query, "last_active_day": yesterday},
+                  {"$inc": {"streak_days": 1}, "$set": {"last_active_day": day}}),
+        UpdateOne({**query, "$or": [{"last_active_day": {"$exists": False}}, {"last_active_day": {"$lt": yesterday}}]},
+                  {"$set": {"streak_days": 1, "last_active_day": day}})
+    ]
+
+def _apply_profile_updates(db, requests):
+    """Apply profile updates in order, retrying from a lost upsert race"""
+    while requests:
+        try:
+            db.user_profiles.bulk_write(requests, ordered=True)
+            return
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if not errors or any(error.get("code") != 11000 for error in errors):
+                raise
+            # The document exists now - resume from the failed upsert
+            requests = requests[errors[0]["index"]:]
+
+def rebuild_user_profiles(username=None, db=None, batch_size=1000):
+    """Recompute user profiles from entries (all users, or one)"""
+    flush_writes(username)
+    db = db if db is not None else get_db()
+    query = {"username": username} if username else {}
+    db.user_profiles.delete_many({"_id": username} if username else {})
+
+    requests = []
+    projection = {"username": 1, "use_case": 1, "metadata": 1, "message": 1, "timestamp": 1}
+    for entry in db.entries.find(query, projection).sort([("username", 1), ("timestamp", 1)]):
+        requests.extend(profile_updates(entry))
+        if len(requests) >= batch_size:
+            _apply_profile_updates(db, requests)
+            requests = []
+
+    _apply_profile_updates(db, requests)
+
+def get_user_profile(username):
+    """Get a user's long-term profile document, or None"""
+    flush_writes(username)
+    return get_db().user_profiles.find_one({"_id": username})
+
+# Analytics - server-side aggregation pipelines (no documents shipped to the client)
+def _entries_match(username, start_date=None, end_date=None):
+    """Build the $match stage for entry analytics (flushes pending writes first)"""
+    flush_writes(username)
+    match = {"username": username}
+    if start_date or end_date:
+        date_query = {}
+        if start_date:
+            date_query["$gte"] = datetime.combine(start_date, datetime.min.time())
+        if end_date:
+            date_query["$lte"] = datetime.combine(end_date, datetime.max.time())
+        match["timestamp"] = date_query
+    return {"$match": match}
+
+def get_entry_analytics(username, start_date=None, end_date=None):
+    """Use case counts, daily histogram and hour distribution in one $facet round trip"""
+    pipeline = [
+        _entries_match(username, start_date, end_date),
+        {"$facet": {
+            "use_cases": [{"$group": {"_id": "$use_case", "count": {"$sum": 1}}}],
+            "days": [
+                {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}}, "count": {"$sum": 1}}},
+                {"$sort": {"_id": 1}}
+            ],
+            "hours": [{"$group": {"_id": {"$hour": "$timestamp"}, "count": {"$sum": 1}}}]
+        }}
+    ]
+    result = next(get_db().entries.aggregate(pipeline), {"use_cases": [], "days": [], "hours": []})
+
+    use_cases = {doc["_id"]: doc["count"] for doc in result["use_cases"]}
+    return {
+        "total": sum(use_cases.values()),
+        "use_cases": use_cases,
+        "days": [{"day": doc["_id"], "count": doc["count"]} for doc in result["days"]],
+        "hours": {doc["_id"]: doc["count"] for doc in result["hours"]}
+    }
+
+# Async wrappers - run the blocking pymongo calls on worker threads so
+# async callers can overlap DB round trips with LLM calls
+async def get_recent_conversation_async(username, max_messages=10, hours=24):
+    """Async variant of get_recent_conversation"""
+    import asyncio
+    return await asyncio.to_thread(get_recent_conversation, username, max_messages, hours)
+
+async def save_message_async(username, role, content, turn_id=None):
+    """Async variant of save_message"""
+    import asyncio
+    return await asyncio.to_thread(save_message, username, role, content, turn_id)
+
+async def save_unified_entry_async(entry):
+    """Async variant of save_unified_entry"""
+    import asyncio
+    return await asyncio.to_thread(save_unified_entry, entry)
+
+async def get_unified_entries_async(username, start_date=None, end_date=None, use_case=None, limit=100):
+    """Async variant of get_unified_entries"""
+    import asyncio
+    return await asyncio.to_thread(get_unified_entries, username, start_date, end_date, use_case, limit)
@@ -1,17 +1,37 @@
 """
 Health & Fitness Handler - Specialized for workout and health tracking
 """
-from claude_handler import get_claude_response
+from claude_handler import get_claude_response, get_structured_response
+from llm_cache import TTL_EXTRACTION
+from schemas import SINGLE_CALL_MODE, WorkoutTurn, WORKOUT_TURN_INSTRUCTIONS
+from response_templates import get_ack_mode, render_workout_ack, schedule_upgrade
 import json
+import logging
+import metrics
 
-def handle_health_fitness(message, username, conversation_history=None):
-    """Handle health and fitness related messages"""
+logger = logging.getLogger(__name__)
 
-    # Extract workout/health data
-    workout_data = extract_workout_data(message, conversation_history)
+def handle_health_fitness(message, username, conversation_history=None, turn_id=None):
+    """Handle health and fitness related messages (turn_id enables template_then_llm upgrades)"""
 
-    # Generate response
-    response = generate_fitness_response(username, workout_data, conversation_history)
+    ack_mode = get_ack_mode("health_fitness")
+
+    workout_data = None
+    if SINGLE_CALL_MODE and ack_mode == "llm":
+        workout_data, response = extract_and_respond(message, username, conversation_history)
+
+    if workout_data is None:
+        # Extract workout/health data
+        workout_data = extract_workout_data(message, conversation_history)
+
+        if ack_mode == "llm":
+            # Generate response
+            response = generate_fitness_response(username, workout_data, conversation_history)
+        else:
+            # Template acknowledgement - no reply LLM call on the hot path
+            response = render_workout_ack(workout_data.get("activity", ""), workout_data.get("duration", ""))
+            if ack_mode == "template_then_llm" and turn_id:
+                schedule_upgrade(username, turn_id, lambda: generate_fitness_response(username, workout_data, conversation_history))
 
     # Prepare metadata for unified entry
     metadata = {
@@ -24,6 +44,24 @@ def handle_health_fitness(message, username, conversation_history=None):
 
     return response, metadata, "health_fitness"
 
+def extract_and_respond(message, username, conversation_history=None):
+    """Extract workout data and generate the reply in one structured LLM call
+
+    Returns (None, None) if the structured call fails so the caller can fall back.
+    """
+    system_prompt = f"""You are Nomi, {username}'s PA and fitness tracking assistant.
+
+{WORKOUT_TURN_INSTRUCTIONS}"""
+
+    try:
+        turn = get_structured_response(message, WorkoutTurn, system_prompt, conversation_history=conversation_history, profile="health_fitness")
+    except Exception as e:
+        logger.warning(f"Structured workout call failed, falling back to two calls: {e}")
+        return None, None
+
+    workout_data = turn.model_dump(exclude={"reply"})
+    return workout_data, turn.reply.strip()
+
 def extract_workout_data(message, conversation_history=None):
     """Extract structured workout data from message"""
     system_prompt = """You are a fitness tracking assistant. Extract workout information from the message.
@@ -44,12 +82,13 @@ Output: {"activity": "HIIT", "duration": "45 min", "intensity": "high", "calorie
 
 Respond with ONLY valid JSON, no extra text."""
 
-    response = get_claude_response(message, system_prompt, conversation_history=conversation_history)
+    response = get_claude_response(message, system_prompt, conversation_history=conversation_history, cache_ttl=TTL_EXTRACTION, profile="health_fitness")
 
     try:
         data = json.loads(response)
         return data
-    except:
+    except Exception:
+        metrics.JSON_FALLBACKS.labels("extract_workout_data").inc()
         return {
             "activity": "workout",
             "duration": "",
@@ -78,5 +117,5 @@ Rules:
 
 Respond in max 8-10 words."""
 
-    response = get_claude_response(prompt, system_prompt, conversation_history=conversation_history)
+    response = get_claude_response(prompt, system_prompt, conversation_history=conversation_history, profile="health_fitness")
     return response.strip()
@@ -0,0 +1,163 @@
+"""
+LLM Response Cache - Memoizes get_claude_response results
+
+Keys are built from the model, the caller's system prompt (without the
+volatile date suffix), the conversation history and the prompt. Two
+backends are available:
+- memory: in-process LRU with per-entry TTL (default)
+- sqlite: on-disk cache shared across processes and restarts
+
+Configure with LLM_CACHE_BACKEND (memory | sqlite | off),
+LLM_CACHE_MAX_ENTRIES and LLM_CACHE_PATH.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory").lower()
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".nomi_llm_cache.sqlite3")
+
+# Per call site TTLs (seconds)
+TTL_CLASSIFICATION = 24 * 60 * 60   # One-word routing / intent labels
+TTL_EXTRACTION = 24 * 60 * 60       # JSON extraction and note summaries
+TTL_ACKNOWLEDGEMENT = 60 * 60       # Fixed "saved" style confirmations
+
+
+def make_cache_key(model, system_prompt, conversation_history, prompt):
+    """Build a stable cache key for an LLM call"""
+    payload = json.dumps({
+        "model": model,
+        "system": system_prompt or "",
+        "history": [[m.get("role"), m.get("content")] for m in (conversation_history or [])],
+        "prompt": prompt
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryCache:
+    """In-memory LRU cache with per-entry TTL"""
+
+    def __init__(self, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] < time.time():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+
+class SQLiteCache:
+    """On-disk cache backed by SQLite with per-entry TTL and LRU trimming"""
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now)
+            )
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            return {"backend": "sqlite", "hits": self.hits, "misses": self.misses, "size": size}
+
+
+def build_cache(backend=LLM_CACHE_BACKEND):
+    """Create the configured cache backend (None when caching is off)"""
+    if backend == "off":
+        return None
+    if backend == "sqlite":
+        return SQLiteCache()
+    if backend != "memory":
+        logger.warning(f"Unknown LLM_CACHE_BACKEND '{backend}', using memory")
+    return MemoryCache()
+
+
+# Process-wide cache instance
+response_cache = build_cache()
+
+def get_cache_stats():
+    """Get hit/miss counters for the response cache"""
+    if response_cache is None:
+        return {"backend": "off", "hits": 0, "misses": 0, "size": 0}
+    return response_cache.stats()
@@ -0,0 +1,117 @@
+"""
+LLM Profiles - Per-node model tiering and token budgets
+
+Each LangGraph node (and handler use case) gets its own ChatAnthropic
+profile: model, max_tokens, temperature and timeout, plus context_tokens -
+the input token budget for conversation history (see context_window.py).
+Cheap one-word and short-acknowledgement nodes default to CLAUDE_FAST_MODEL
+with tight caps.
+
+Profiles resolve as: built-in defaults < JSON file (LLM_PROFILES_FILE) < env.
+Env overrides use LLM_<NODE>_MODEL, LLM_<NODE>_MAX_TOKENS,
+LLM_<NODE>_TEMPERATURE, LLM_<NODE>_TIMEOUT and LLM_<NODE>_CONTEXT_TOKENS,
+e.g. LLM_SUPERVISOR_MODEL.
+"""
+import os
+import json
+import logging
+import threading
+from langchain_anthropic import ChatAnthropic
+from telemetry import attach_llm
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+CLAUDE_MODEL = os.getenv("CLAUDE_MODEL", "claude-sonnet-4-5-20250929")
+CLAUDE_FAST_MODEL = os.getenv("CLAUDE_FAST_MODEL", "claude-haiku-4-5-20251001")
+CLAUDE_MAX_TOKENS = int(os.getenv("CLAUDE_MAX_TOKENS", "4000"))
+LLM_PROFILES_FILE = os.getenv("LLM_PROFILES_FILE", "")
+
+DEFAULT_PROFILES = {
+    "default": {"model": CLAUDE_MODEL, "max_tokens": CLAUDE_MAX_TOKENS, "temperature": None, "timeout": 60, "context_tokens": 2000},
+    "greeting": {"model": CLAUDE_MODEL, "max_tokens": int(os.getenv("CLAUDE_LOGIN_GREETING_MAX_TOKENS", "1024")), "temperature": None, "timeout": 30, "context_tokens": 800},
+    "supervisor": {"model": CLAUDE_FAST_MODEL, "max_tokens": 10, "temperature": 0.0, "timeout": 10, "context_tokens": 0},
+    "health_fitness": {"model": CLAUDE_FAST_MODEL, "max_tokens": 512, "temperature": 0.0, "timeout": 20, "context_tokens": 600},
+    "notes_reminders": {"model": CLAUDE_FAST_MODEL, "max_tokens": 512, "temperature": 0.0, "timeout": 20, "context_tokens": 400},
+    "summary_analytics": {"model": CLAUDE_MODEL, "max_tokens": 512, "temperature": None, "timeout": 30, "context_tokens": 1000},
+    "motivation_wellbeing": {"model": CLAUDE_MODEL, "max_tokens": 256, "temperature": None, "timeout": 30, "context_tokens": 1000},
+    "conversation_summary": {"model": CLAUDE_FAST_MODEL, "max_tokens": 300, "temperature": 0.0, "timeout": 30, "context_tokens": 0}
+}
+
+PROFILE_FIELDS = {"model": str, "max_tokens": int, "temperature": float, "timeout": float, "context_tokens": int}
+
+_profiles = None
+_llms = {}
+_lock = threading.Lock()
+
+
+def load_profiles():
+    """Resolve all profiles from defaults, the optional JSON file and env overrides"""
+    profiles = {name: dict(profile) for name, profile in DEFAULT_PROFILES.items()}
+
+    if LLM_PROFILES_FILE:
+        try:
+            with open(LLM_PROFILES_FILE) as f:
+                file_profiles = json.load(f)
+            for name, overrides in file_profiles.items():
+                profiles.setdefault(name, dict(profiles["default"])).update(overrides)
+            logger.info(f"Loaded LLM profiles from {LLM_PROFILES_FILE}")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load LLM profiles file '{LLM_PROFILES_FILE}': {e}")
+
+    for name, profile in profiles.items():
+        for field, cast in PROFILE_FIELDS.items():
+            value = os.getenv(f"LLM_{name.upper()}_{field.upper()}")
+            if value:
+                profile[field] = cast(value)
+
+    return profiles
+
+def get_profile(node):
+    """Get the resolved profile for a node (falls back to 'default')"""
+    global _profiles
+    if _profiles is None:
+        with _lock:
+            if _profiles is None:
+                _profiles = load_profiles()
+    return _profiles.get(node, _profiles["default"])
+
+def build_llm(profile):
+    """Create a ChatAnthropic client for a profile"""
+    kwargs = {
+        "model": profile["model"],
+        "api_key": os.getenv("ANTHROPIC_API_KEY"),
+        "max_tokens": profile["max_tokens"],
+        "default_request_timeout": profile["timeout"]
+    }
+    if profile.get("temperature") is not None:
+        kwargs["temperature"] = profile["temperature"]
+    return ChatAnthropic(**kwargs)
+
+def get_llm(node="default"):
+    """Get the shared LLM client for a node, creating it on first use"""
+    llm = _llms.get(node)
+    if llm is not None:
+        return llm
+
+    profile = get_profile(node)
+    with _lock:
+        llm = _llms.get(node)
+        if llm is None:
+            llm = attach_llm(node, build_llm(profile))
+            _llms[node] = llm
+            logger.info(f"Created LLM for '{node}': {profile['model']} (max_tokens={profile['max_tokens']})")
+    return llm
+
+def set_llm(node, llm):
+    """Override the LLM client for a node (e.g. a fake model in benchmarks)"""
+    with _lock:
+        _llms[node] = attach_llm(node, llm)
+
+def reset_llms():
+    """Drop cached clients and profiles so they are rebuilt on next use"""
+    global _profiles
+    with _lock:
+        _llms.clear()
+        _profiles = None
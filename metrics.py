@@ -0,0 +1,290 @@
+"""
+Metrics - Prometheus-style counters and histograms with a local HTTP endpoint
+
+A small thread-safe registry (module-level, so it survives Streamlit script
+reruns and is shared by all sessions in the process). claude_handler, agents,
+chat/app and db feed it; with METRICS_ENABLED=true it is served in Prometheus
+text format on http://METRICS_ADDR:METRICS_PORT/metrics.
+
+Updates take one short lock per metric, so they are cheap enough for the
+hot path (per LLM call and per DB command).
+"""
+import os
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+METRICS_ADDR = os.getenv("METRICS_ADDR", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    """Base for labelled metrics - children are created on first use per label set"""
+
+    kind = "untyped"
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        if len(values) != len(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {values}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        """Value holder for one label set"""
+
+    @abstractmethod
+    def samples(self):
+        """(suffix, label values, extra labels, value) tuples for rendering"""
+
+    def render(self):
+        lines = [f"# HELP {self.name} {escape(self.description)}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, values, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{format_labels(self.label_names, values, extra)} {format_value(value)}")
+        return "\n".join(lines)
+
+
+class Value:
+    """A single float guarded by its metric's lock"""
+
+    def __init__(self, lock):
+        self._lock = lock
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return Value(self._lock)
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def samples(self):
+        with self._lock:
+            return [("_total" if not self.name.endswith("_total") else "", values, None, child.value)
+                    for values, child in sorted(self._children.items())]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name, description, labels=(), function=None):
+        super().__init__(name, description, labels)
+        self.function = function
+
+    def _new_child(self):
+        return Value(self._lock)
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def samples(self):
+        if self.function is not None:
+            try:
+                return [("", (), None, self.function())]
+            except Exception as e:
+                logger.warning(f"Metrics: Gauge {self.name} failed: {e}")
+                return []
+        with self._lock:
+            return [("", values, None, child.value) for values, child in sorted(self._children.items())]
+
+
+class HistogramValue:
+    """Bucket counts, sum and count for one label set"""
+
+    def __init__(self, lock, buckets):
+        self._lock = lock
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return HistogramValue(self._lock, self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for values, child in sorted(self._children.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                    cumulative += count
+                    samples.append(("_bucket", values, [("le", format_value(float(bound)))], cumulative))
+                samples.append(("_sum", values, None, child.sum))
+                samples.append(("_count", values, None, child.count))
+        return samples
+
+
+class Registry:
+    """Named metrics in registration order"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+registry = Registry()
+
+def counter(name, description, labels=()):
+    return registry.register(Counter(name, description, labels))
+
+def gauge(name, description, labels=(), function=None):
+    return registry.register(Gauge(name, description, labels, function))
+
+def histogram(name, description, labels=(), buckets=DEFAULT_BUCKETS):
+    return registry.register(Histogram(name, description, labels, buckets))
+
+
+# Nomi metrics
+MESSAGES = counter("nomi_messages_total", "Chat messages handled, by entry path and use case", ["path", "use_case"])
+MESSAGE_ERRORS = counter("nomi_message_errors_total", "Chat messages that raised an error", ["path"])
+MESSAGE_SECONDS = histogram("nomi_message_duration_seconds", "End-to-end chat message latency", ["path"])
+NODE_SECONDS = histogram("nomi_node_duration_seconds", "LangGraph node latency", ["node"])
+LLM_CALLS = counter("nomi_llm_calls_total", "LLM calls by profile node", ["node"])
+LLM_ERRORS = counter("nomi_llm_errors_total", "Failed LLM calls by profile node", ["node"])
+LLM_TOKENS = counter("nomi_llm_tokens_total", "LLM tokens by profile node and direction", ["node", "direction"])
+LLM_SECONDS = histogram("nomi_llm_call_duration_seconds", "LLM call latency", ["node"])
+LLM_CACHE = counter("nomi_llm_cache_requests_total", "LLM response cache lookups", ["result"])
+JSON_FALLBACKS = counter("nomi_json_parse_fallbacks_total", "LLM replies that were not valid JSON and fell back to defaults", ["site"])
+DB_SECONDS = histogram("nomi_db_command_duration_seconds", "MongoDB command latency", ["command"])
+DB_ERRORS = counter("nomi_db_command_errors_total", "Failed MongoDB commands", ["command"])
+WRITE_BEHIND_DOCUMENTS = counter("nomi_write_behind_documents_total", "Documents written by the write-behind queue", ["collection"])
+WRITE_BEHIND_STALE_FLUSHES = counter("nomi_write_behind_stale_flushes_total", "Read-your-writes flushes that left the user's writes queued")
+
+
+@contextmanager
+def time_message(path):
+    """Count and time one chat message - set result["use_case"] once known"""
+    result = {"use_case": "unknown"}
+    started = time.perf_counter()
+    try:
+        yield result
+    except Exception:
+        MESSAGE_ERRORS.labels(path).inc()
+        raise
+    finally:
+        MESSAGE_SECONDS.labels(path).observe(time.perf_counter() - started)
+    MESSAGES.labels(path, result["use_case"]).inc()
+
+
+# HTTP endpoint
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Metrics: {self.address_string()} {format % args}")
+
+
+_server = None
+_server_attempted = False
+_server_lock = threading.Lock()
+
+def start_http_server(port=None, addr=None):
+    """Serve /metrics on a daemon thread (tried once per process), returns the server or None"""
+    global _server, _server_attempted
+    with _server_lock:
+        if _server_attempted:
+            return _server
+        _server_attempted = True
+        port = METRICS_PORT if port is None else port
+        addr = addr or METRICS_ADDR
+        try:
+            server = ThreadingHTTPServer((addr, port), MetricsHandler)
+        except OSError as e:
+            # e.g. a second Streamlit process on the same host
+            logger.warning(f"Metrics: Could not listen on {addr}:{port}: {e}")
+            return None
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        _server = server
+        logger.info(f"Metrics: Serving http://{addr}:{server.server_address[1]}/metrics")
+        return server
@@ -0,0 +1,191 @@
+"""
+Migrations - Versioned schema bootstrap for the Nomi MongoDB database
+
+Applied schema version is recorded in the `schema_meta` collection. Index
+creation runs once per process (or once from the CLI), not on every
+Streamlit rerun. Pending migrations run under a lock document in
+`schema_meta`, so one process migrates while others wait, and with this
+process's write-behind paused, so backfills do not race its rollup and
+profile updates.
+
+Usage:
+    python migrations.py                    # Apply pending migrations
+    python migrations.py --status           # Show current and latest schema version
+    python migrations.py --bucket-messages  # Move chat messages into per-day buckets
+"""
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from db import get_db, writes_paused
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_META_COLLECTION = "schema_meta"
+SCHEMA_DOC_ID = "schema"
+MIGRATION_LOCK_ID = "migration_lock"
+# A lock older than this is treated as abandoned (its process died mid-migration)
+MIGRATION_LOCK_SECONDS = 3600
+MIGRATION_LOCK_POLL_SECONDS = 1.0
+
+# Process-wide bootstrap guard
+_bootstrapped = False
+_bootstrap_lock = threading.Lock()
+
+
+# MIGRATIONS - append new (version, description, function) tuples at the end.
+# Each function receives the database and must be idempotent.
+def migration_001_initial_indexes(db):
+    """Initial indexes for users, notes, workouts, messages and entries"""
+    db.users.create_index("username", unique=True)
+    db.notes.create_index([("username", 1), ("timestamp", -1)])
+    db.workouts.create_index([("username", 1), ("timestamp", -1)])
+    db.messages.create_index([("username", 1), ("timestamp", -1)])
+
+    # Unified entries collection (new orchestration system)
+    db.entries.create_index([("username", 1), ("timestamp", -1)])
+    db.entries.create_index([("username", 1), ("use_case", 1), ("timestamp", -1)])
+
+
+def migration_002_daily_rollups(db):
+    """Daily rollup index and backfill from existing entries"""
+    from db import rebuild_rollups
+
+    db.daily_rollups.create_index([("username", 1), ("day", 1)])
+    rebuild_rollups(db=db)
+
+
+def migration_003_entry_keyset_indexes(db):
+    """Indexes covering (timestamp, _id) keyset pagination of entries"""
+    db.entries.create_index([("username", 1), ("timestamp", -1), ("_id", -1)])
+    db.entries.create_index([("username", 1), ("use_case", 1), ("timestamp", -1), ("_id", -1)])
+
+
+def migration_004_turn_id_indexes(db):
+    """Unique turn IDs so a chat turn is persisted at most once"""
+    has_turn_id = {"turn_id": {"$exists": True}}
+    db.messages.create_index([("turn_id", 1), ("role", 1)], unique=True, partialFilterExpression=has_turn_id)
+    db.entries.create_index("turn_id", unique=True, partialFilterExpression=has_turn_id)
+
+
+def migration_005_message_buckets(db):
+    """Index for per-day message buckets (MESSAGE_STORAGE=buckets)"""
+    db.message_buckets.create_index([("username", 1), ("day", -1)])
+
+
+def migration_006_user_profiles(db):
+    """Backfill long-term user profiles from existing entries"""
+    from db import rebuild_user_profiles
+
+    rebuild_user_profiles(db=db)
+
+
+MIGRATIONS = [
+    (1, "Initial indexes", migration_001_initial_indexes),
+    (2, "Daily rollups", migration_002_daily_rollups),
+    (3, "Entry keyset pagination indexes", migration_003_entry_keyset_indexes),
+    (4, "Unique chat turn IDs", migration_004_turn_id_indexes),
+    (5, "Message bucket index", migration_005_message_buckets),
+    (6, "User profiles", migration_006_user_profiles),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(db=None):
+    """Get the schema version recorded in the metadata collection"""
+    db = db if db is not None else get_db()
+    doc = db[SCHEMA_META_COLLECTION].find_one({"_id": SCHEMA_DOC_ID})
+    return doc.get("version", 0) if doc else 0
+
+def acquire_migration_lock(db, owner):
+    """Claim the migration lock, returns False if another process holds it"""
+    now = datetime.now()
+    try:
+        db[SCHEMA_META_COLLECTION].find_one_and_update(
+            {"_id": MIGRATION_LOCK_ID, "expires_at": {"$lt": now}},
+            {"$set": {"owner": owner, "locked_at": now, "expires_at": now + timedelta(seconds=MIGRATION_LOCK_SECONDS)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # The lock document exists and has not expired
+        return False
+    return True
+
+def release_migration_lock(db, owner):
+    db[SCHEMA_META_COLLECTION].delete_one({"_id": MIGRATION_LOCK_ID, "owner": owner})
+
+def migrate(db=None):
+    """Apply all pending migrations and return the resulting schema version"""
+    db = db if db is not None else get_db()
+    current = get_schema_version(db)
+    if current >= LATEST_VERSION:
+        return current
+
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    while not acquire_migration_lock(db, owner):
+        logger.info("Waiting for another process to finish migrating")
+        time.sleep(MIGRATION_LOCK_POLL_SECONDS)
+
+    try:
+        with writes_paused():
+            # Another process may have migrated while we waited
+            current = get_schema_version(db)
+            for version, description, func in MIGRATIONS:
+                if version <= current:
+                    continue
+
+                logger.info(f"Applying migration {version}: {description}")
+                func(db)
+
+                db[SCHEMA_META_COLLECTION].update_one(
+                    {"_id": SCHEMA_DOC_ID},
+                    {
+                        "$max": {"version": version},
+                        "$push": {"applied": {"version": version, "description": description, "applied_at": datetime.now()}}
+                    },
+                    upsert=True
+                )
+                current = version
+    finally:
+        release_migration_lock(db, owner)
+
+    return current
+
+def ensure_schema():
+    """Bootstrap the schema once per process - cheap no-op on later calls"""
+    global _bootstrapped
+    if _bootstrapped:
+        return
+
+    with _bootstrap_lock:
+        if _bootstrapped:
+            return
+        version = migrate()
+        _bootstrapped = True
+        logger.info(f"Schema ready at version {version}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Apply Nomi MongoDB schema migrations")
+    parser.add_argument("--status", action="store_true", help="Show schema version without migrating")
+    parser.add_argument("--bucket-messages", action="store_true", help="Move chat messages into per-day buckets (set MESSAGE_STORAGE=buckets)")
+    parser.add_argument("--username", help="Only migrate this user's messages (with --bucket-messages)")
+    args = parser.parse_args()
+
+    if args.status:
+        print(f"Current schema version: {get_schema_version()} (latest: {LATEST_VERSION})")
+    elif args.bucket_messages:
+        from db import migrate_messages_to_buckets
+        print(f"Schema migrated to version {migrate()}")
+        print(f"Moved {migrate_messages_to_buckets(username=args.username)} messages into day buckets")
+    else:
+        print(f"Schema migrated to version {migrate()}")
@@ -1,17 +1,37 @@
 """
 Notes & Reminders Handler - Specialized for note-taking and task management
 """
-from claude_handler import get_claude_response
+from claude_handler import get_claude_response, get_structured_response
+from llm_cache import TTL_EXTRACTION, TTL_ACKNOWLEDGEMENT
+from schemas import SINGLE_CALL_MODE, NoteTurn, NOTE_TURN_INSTRUCTIONS
+from response_templates import get_ack_mode, render_note_ack, schedule_upgrade
 import json
+import logging
+import metrics
 
-def handle_notes_reminders(message, username, conversation_history=None):
-    """Handle notes and reminders"""
+logger = logging.getLogger(__name__)
 
-    # Extract note/reminder data
-    note_data = extract_note_data(message, conversation_history)
+def handle_notes_reminders(message, username, conversation_history=None, turn_id=None):
+    """Handle notes and reminders (turn_id enables template_then_llm upgrades)"""
 
-    # Generate response
-    response = generate_note_response(username, note_data, conversation_history)
+    ack_mode = get_ack_mode("notes_reminders")
+
+    note_data = None
+    if SINGLE_CALL_MODE and ack_mode == "llm":
+        note_data, response = extract_and_respond(message, username, conversation_history)
+
+    if note_data is None:
+        # Extract note/reminder data
+        note_data = extract_note_data(message, conversation_history)
+
+        if ack_mode == "llm":
+            # Generate response
+            response = generate_note_response(username, note_data, conversation_history)
+        else:
+            # Template acknowledgement - no reply LLM call on the hot path
+            response = render_note_ack(note_data.get("has_reminder", False))
+            if ack_mode == "template_then_llm" and turn_id:
+                schedule_upgrade(username, turn_id, lambda: generate_note_response(username, note_data, conversation_history))
 
     # Prepare metadata
     metadata = {
@@ -25,6 +45,24 @@ def handle_notes_reminders(message, username, conversation_history=None):
 
     return response, metadata, "notes_reminders"
 
+def extract_and_respond(message, username, conversation_history=None):
+    """Extract note data and generate the reply in one structured LLM call
+
+    Returns (None, None) if the structured call fails so the caller can fall back.
+    """
+    system_prompt = f"""You are Nomi, {username}'s PA and note-taking assistant.
+
+{NOTE_TURN_INSTRUCTIONS}"""
+
+    try:
+        turn = get_structured_response(message, NoteTurn, system_prompt, conversation_history=conversation_history, profile="notes_reminders")
+    except Exception as e:
+        logger.warning(f"Structured note call failed, falling back to two calls: {e}")
+        return None, None
+
+    note_data = turn.model_dump(exclude={"reply"})
+    return note_data, turn.reply.strip()
+
 def extract_note_data(message, conversation_history=None):
     """Extract structured note data from message"""
     system_prompt = """You are a note-taking assistant. Extract information from the message.
@@ -49,12 +87,13 @@ Output: {"summary": "Completed project documentation", "category": "work", "prio
 
 Respond with ONLY valid JSON, no extra text."""
 
-    response = get_claude_response(message, system_prompt)
+    response = get_claude_response(message, system_prompt, cache_ttl=TTL_EXTRACTION, profile="notes_reminders")
 
     try:
         data = json.loads(response)
         return data
-    except:
+    except Exception:
+        metrics.JSON_FALLBACKS.labels("extract_note_data").inc()
         return {
             "summary": message[:50],
             "category": "note",
@@ -83,5 +122,5 @@ Rules:
     else:
         prompt = f"""Note saved. Confirm in max 5 words."""
 
-    response = get_claude_response(prompt, system_prompt, conversation_history=conversation_history)
+    response = get_claude_response(prompt, system_prompt, conversation_history=conversation_history, cache_ttl=TTL_ACKNOWLEDGEMENT, profile="notes_reminders")
     return response.strip()
@@ -3,6 +3,8 @@ Orchestrator - Routes user messages to appropriate specialized handlers
 """
 from datetime import datetime
 from claude_handler import get_claude_response
+from llm_cache import TTL_CLASSIFICATION
+from classifier import fast_classify
 
 def classify_use_case(message):
     """Classify message into specific use case category"""
@@ -11,6 +13,11 @@ def classify_use_case(message):
 
     logger.info(f"Classifying message: {message[:50]}...")
 
+    # Fast path - answer confidently classified messages locally
+    use_case = fast_classify(message)
+    if use_case:
+        return use_case
+
     system_prompt = """You are a use case classifier for Nomi, a personal assistant.
 
 Classify the user's message into ONE of these categories:
@@ -28,7 +35,7 @@ Keywords:
 Respond with ONLY ONE WORD: health_fitness, notes_reminders, summary_analytics, or motivation_wellbeing.
 If unclear, default to "notes_reminders"."""
 
-    response = get_claude_response(message, system_prompt)
+    response = get_claude_response(message, system_prompt, cache_ttl=TTL_CLASSIFICATION, profile="supervisor")
     use_case = response.strip().lower()
 
     valid_cases = ["health_fitness", "notes_reminders", "summary_analytics", "motivation_wellbeing"]
@@ -39,8 +46,11 @@ If unclear, default to "notes_reminders"."""
     logger.info(f"Classified as: {use_case}")
     return use_case
 
-def route_message(message, username, use_case=None, conversation_history=None):
-    """Route message to appropriate handler based on use case"""
+def route_message(message, username, use_case=None, conversation_history=None, turn_id=None):
+    """Route message to appropriate handler based on use case
+
+    Pass the turn_id the entry will be saved with to enable template_then_llm upgrades.
+    """
     import logging
     logger = logging.getLogger(__name__)
 
@@ -68,12 +78,15 @@ def route_message(message, username, use_case=None, conversation_history=None):
     # Each handler returns: (response_text, entry_data, entry_type)
     # Pass conversation history for context/memory
     logger.info(f"Invoking handler: {handler.__name__}")
-    result = handler(message, username, conversation_history)
+    if handler in (handle_health_fitness, handle_notes_reminders):
+        result = handler(message, username, conversation_history, turn_id=turn_id)
+    else:
+        result = handler(message, username, conversation_history)
     logger.info(f"Handler returned response")
 
     return result
 
-def save_unified_entry(username, message, response, use_case, metadata=None):
+def save_unified_entry(username, message, response, use_case, metadata=None, turn_id=None):
     """Save a unified entry to the database"""
     from db import save_unified_entry as db_save_entry
 
@@ -85,5 +98,7 @@ def save_unified_entry(username, message, response, use_case, metadata=None):
         "metadata": metadata or {},
         "timestamp": datetime.now()
     }
+    if turn_id:
+        entry["turn_id"] = turn_id
 
     db_save_entry(entry)
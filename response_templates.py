@@ -0,0 +1,116 @@
+"""
+Response Templates - Zero-LLM acknowledgements for workouts and notes
+
+Slot-filled phrase banks produce the short "Nice! ... ✓" / "Got it ✓" replies
+locally. The acknowledgement mode is set per use case:
+- template: template reply only (no reply LLM call)
+- llm: LLM-generated reply (previous behaviour)
+- template_then_llm: template reply now, LLM reply generated in the
+  background and written over the turn's stored entry/message when ready
+  (scheduled once the turn is saved, keyed by its turn ID)
+
+Configure with ACK_MODE_HEALTH_FITNESS and ACK_MODE_NOTES_REMINDERS.
+"""
+import os
+import time
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+ACK_MODES = ["template", "llm", "template_then_llm"]
+
+ACK_MODE_DEFAULTS = {
+    "health_fitness": "llm",
+    "notes_reminders": "template"
+}
+
+# Background LLM upgrades (template_then_llm mode)
+UPGRADE_MAX_WORKERS = int(os.getenv("ACK_UPGRADE_MAX_WORKERS", "2"))
+UPGRADE_PERSIST_RETRIES = 5
+UPGRADE_PERSIST_DELAY = 1.0
+
+WORKOUT_PHRASES = [
+    "Nice {activity}{duration}! ✓",
+    "You crushed that {activity}{duration}! ✓",
+    "{Activity}{duration} done, nice work! ✓",
+    "Solid {activity}{duration}, logged! ✓",
+    "Great {activity}{duration}, keep it up! ✓"
+]
+
+WORKOUT_PHRASES_NO_ACTIVITY = [
+    "Nice workout! ✓",
+    "You crushed it! ✓",
+    "Workout logged, nice work! ✓"
+]
+
+NOTE_PHRASES = [
+    "Got it ✓",
+    "Saved ✓",
+    "Noted ✓",
+    "Got it, saved ✓"
+]
+
+NOTE_REMINDER_PHRASES = [
+    "Got it, reminder set ✓",
+    "Saved with reminder ✓",
+    "Noted, I'll remind you ✓"
+]
+
+_rng = random.Random()
+_upgrade_executor = ThreadPoolExecutor(max_workers=UPGRADE_MAX_WORKERS, thread_name_prefix="ack-upgrade")
+
+
+def get_ack_mode(use_case):
+    """Get the acknowledgement mode for a use case"""
+    default = ACK_MODE_DEFAULTS.get(use_case, "llm")
+    mode = os.getenv(f"ACK_MODE_{use_case.upper()}", default).lower()
+    if mode not in ACK_MODES:
+        logger.warning(f"Invalid ACK_MODE_{use_case.upper()} '{mode}', using {default}")
+        return default
+    return mode
+
+def render_workout_ack(activity="", duration=""):
+    """Workout acknowledgement from the phrase bank"""
+    activity = (activity or "").strip()
+    if not activity or activity.lower() == "workout":
+        return _rng.choice(WORKOUT_PHRASES_NO_ACTIVITY)
+
+    duration = (duration or "").strip()
+    duration_slot = f" ({duration})" if duration else ""
+    phrase = _rng.choice(WORKOUT_PHRASES)
+    return phrase.format(activity=activity.lower(), Activity=activity.capitalize(), duration=duration_slot)
+
+def render_note_ack(has_reminder=False):
+    """Note acknowledgement from the phrase bank"""
+    return _rng.choice(NOTE_REMINDER_PHRASES if has_reminder else NOTE_PHRASES)
+
+def schedule_upgrade(username, turn_id, generate_reply):
+    """Generate the LLM reply in the background and overwrite the turn's stored template reply"""
+
+    def run():
+        try:
+            upgraded = generate_reply()
+        except Exception as e:
+            logger.warning(f"Acknowledgement upgrade failed: {e}")
+            return
+
+        if not upgraded:
+            return
+
+        from db import replace_turn_response
+
+        # The entry and assistant message may not be persisted yet - retry briefly
+        updated = set()
+        for _ in range(UPGRADE_PERSIST_RETRIES):
+            updated.update(replace_turn_response(username, turn_id, upgraded))
+            if len(updated) >= 2:
+                break
+            time.sleep(UPGRADE_PERSIST_DELAY)
+
+        logger.info(f"Turn {turn_id}: Upgraded template acknowledgement for '{username}' ({len(updated)} documents)")
+
+    return _upgrade_executor.submit(run)
@@ -0,0 +1,55 @@
+"""
+Structured Output Schemas - Single-call extraction + reply for agents and handlers
+
+Each schema holds the metadata we store on the entry plus the short
+user-facing reply, so one tool-calling LLM round trip replaces the
+separate parse and reply calls.
+"""
+import os
+from typing import List
+from pydantic import BaseModel, Field
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Single structured call per workout/note instead of parse + reply
+SINGLE_CALL_MODE = os.getenv("SINGLE_CALL_MODE", "true").lower() == "true"
+
+
+class WorkoutTurn(BaseModel):
+    """Workout details extracted from the message and the reply to send"""
+    activity: str = Field(description="Type of exercise (running, yoga, pushups, swimming, etc.)")
+    duration: str = Field(default="", description="Time or reps/sets (e.g. '30 min', '3x10', '5k')")
+    intensity: str = Field(default="", description="low, moderate or high if mentioned, else empty")
+    calories: str = Field(default="", description="Calories if mentioned, else empty")
+    details: str = Field(default="", description="Additional context (time of day, location, feeling)")
+    reply: str = Field(description="One short sentence, max 8-10 words, ending with ✓")
+
+
+class NoteTurn(BaseModel):
+    """Note details extracted from the message and the reply to send"""
+    summary: str = Field(description="Concise 5-8 word summary of the note")
+    category: str = Field(default="note", description="meeting, task, idea, event, personal or work")
+    priority: str = Field(default="medium", description="low, medium or high")
+    has_reminder: bool = Field(default=False, description="True if the user wants to be reminded")
+    reminder_time: str = Field(default="", description="When to remind, if mentioned")
+    tags: List[str] = Field(default_factory=list, description="Relevant keywords")
+    reply: str = Field(description="Very short acknowledgement, max 5-6 words, ending with ✓")
+
+
+WORKOUT_TURN_INSTRUCTIONS = """Extract the workout from the user's latest message and write the reply.
+
+Reply rules:
+- Max 8-10 words, ONE short sentence
+- Direct address: "Nice!" or "You crushed it!"
+- End with ✓
+- NO explanations, NO tips, NO extra encouragement
+- If they mentioned it earlier, briefly acknowledge: "You did it!" ✓"""
+
+NOTE_TURN_INSTRUCTIONS = """Extract the note from the user's latest message and write the reply.
+
+Reply rules:
+- Max 5-6 words
+- Just acknowledge: "Got it ✓" or "Saved ✓"
+- NO elaboration, NO explanations
+- End with ✓"""
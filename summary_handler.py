@@ -2,7 +2,8 @@
 Summary & Analytics Handler - Specialized for generating insights and summaries
 """
 from claude_handler import get_claude_response
-from db import get_unified_entries
+from user_profile import profile_context
+from db import get_unified_entries, get_day_totals, get_week_totals, get_entry_analytics
 from datetime import date, timedelta
 
 def handle_summary_analytics(message, username, conversation_history=None):
@@ -37,16 +38,18 @@ def determine_summary_type(message):
 def generate_daily_summary(username):
     """Generate daily summary from all entries"""
     today = date.today()
-    entries = get_unified_entries(username, start_date=today)
+    totals = get_day_totals(username, today)
 
-    if not entries:
+    if not totals["total"]:
         response = "You haven't logged anything yet today. Start by logging a workout or jotting down a note!"
         metadata = {"count": 0, "period": "today"}
         return response, metadata
 
-    # Categorize entries
-    health_entries = [e for e in entries if e.get("use_case") == "health_fitness"]
-    note_entries = [e for e in entries if e.get("use_case") == "notes_reminders"]
+    # Only workouts and notes are listed in the prompt
+    health_entries = get_unified_entries(username, start_date=today, use_case="health_fitness", view="summary_list")
+    note_entries = get_unified_entries(username, start_date=today, use_case="notes_reminders", view="summary_list")
+
+    profile = profile_context(username)
 
     system_prompt = f"""You are Nomi, {username}'s PA.
 
@@ -57,11 +60,11 @@ Rules:
 - Celebrate briefly, no elaboration
 - Mention key activities in ONE sentence
 - End with ✓
-- NO lengthy praise, NO extra encouragement"""
+- NO lengthy praise, NO extra encouragement{profile}"""
 
-    health_text = "\n".join([f"- {e['metadata'].get('activity', 'workout')} ({e['metadata'].get('duration', '')})"
+    health_text = "\n".join([f"- {e.metadata.get('activity', 'workout')} ({e.metadata.get('duration', '')})"
                               for e in health_entries]) if health_entries else "No workouts today"
-    notes_text = "\n".join([f"- {e['metadata'].get('summary', e.get('message', ''))}"
+    notes_text = "\n".join([f"- {e.metadata.get('summary', e.message or '')}"
                              for e in note_entries]) if note_entries else "No notes today"
 
     prompt = f"""Review {username}'s day:
@@ -71,12 +74,12 @@ NOTES: {notes_text}
 
 Respond in max 2-3 short sentences."""
 
-    response = get_claude_response(prompt, system_prompt)
+    response = get_claude_response(prompt, system_prompt, profile="summary_analytics")
 
     metadata = {
-        "count": len(entries),
-        "health_count": len(health_entries),
-        "notes_count": len(note_entries),
+        "count": totals["total"],
+        "health_count": totals["use_cases"]["health_fitness"],
+        "notes_count": totals["use_cases"]["notes_reminders"],
         "period": "today"
     }
 
@@ -84,15 +87,15 @@ Respond in max 2-3 short sentences."""
 
 def generate_weekly_summary(username):
     """Generate weekly summary"""
-    today = date.today()
-    week_ago = today - timedelta(days=7)
-    entries = get_unified_entries(username, start_date=week_ago, end_date=today)
+    totals = get_week_totals(username)
 
-    if not entries:
+    if not totals["total"]:
         response = "You haven't logged anything this week yet."
         metadata = {"count": 0, "period": "week"}
         return response, metadata
 
+    profile = profile_context(username)
+
     system_prompt = f"""You are Nomi, {username}'s PA.
 
 CRITICAL: Keep responses SHORT - max 3-4 short sentences.
@@ -102,23 +105,23 @@ Rules:
 - Mention workout count and key pattern in ONE sentence
 - Brief celebration only
 - End with ✓
-- NO lengthy feedback, NO extra encouragement"""
+- NO lengthy feedback, NO extra encouragement{profile}"""
 
-    health_entries = [e for e in entries if e.get("use_case") == "health_fitness"]
-    note_entries = [e for e in entries if e.get("use_case") == "notes_reminders"]
+    health_count = totals["use_cases"]["health_fitness"]
+    notes_count = totals["use_cases"]["notes_reminders"]
 
     prompt = f"""Review {username}'s week:
-- {len(health_entries)} workouts
-- {len(note_entries)} notes/tasks
+- {health_count} workouts
+- {notes_count} notes/tasks
 
 Respond in max 3-4 short sentences."""
 
-    response = get_claude_response(prompt, system_prompt)
+    response = get_claude_response(prompt, system_prompt, profile="summary_analytics")
 
     metadata = {
-        "count": len(entries),
-        "health_count": len(health_entries),
-        "notes_count": len(note_entries),
+        "count": totals["total"],
+        "health_count": health_count,
+        "notes_count": notes_count,
         "period": "week"
     }
 
@@ -126,15 +129,15 @@ Respond in max 3-4 short sentences."""
 
 def generate_insights(username):
     """Generate insights and patterns"""
-    today = date.today()
-    week_ago = today - timedelta(days=7)
-    entries = get_unified_entries(username, start_date=week_ago, end_date=today)
+    totals = get_week_totals(username)
 
-    if not entries:
+    if not totals["total"]:
         response = "Not enough data yet to generate insights. Keep logging your activities!"
         metadata = {"count": 0, "period": "insights"}
         return response, metadata
 
+    profile = profile_context(username)
+
     system_prompt = f"""You are Nomi, {username}'s PA.
 
 CRITICAL: Keep responses SHORT - max 2-3 short sentences.
@@ -144,24 +147,35 @@ Rules:
 - Identify ONE key pattern
 - ONE brief actionable tip
 - End with ✓
-- NO lengthy analysis, NO extra suggestions"""
+- NO lengthy analysis, NO extra suggestions{profile}"""
+
+    health_count = totals["use_cases"]["health_fitness"]
+    notes_count = totals["use_cases"]["notes_reminders"]
 
-    health_entries = [e for e in entries if e.get("use_case") == "health_fitness"]
-    note_entries = [e for e in entries if e.get("use_case") == "notes_reminders"]
+    # Timing patterns computed server-side
+    today = date.today()
+    analytics = get_entry_analytics(username, start_date=today - timedelta(days=7), end_date=today)
+    hours = analytics["hours"]
+    peak_hour = max(hours, key=hours.get) if hours else None
+    active_days = len(analytics["days"])
 
     prompt = f"""{username}'s past week:
-- Total: {len(entries)}
-- Workouts: {len(health_entries)}
-- Notes: {len(note_entries)}
+- Total: {totals["total"]}
+- Workouts: {health_count}
+- Notes: {notes_count}
+- Active days: {active_days} of 7
+- Most active hour: {f"{peak_hour}:00" if peak_hour is not None else "n/a"}
 
 Share ONE key insight in max 2-3 short sentences."""
 
-    response = get_claude_response(prompt, system_prompt)
+    response = get_claude_response(prompt, system_prompt, profile="summary_analytics")
 
     metadata = {
-        "count": len(entries),
-        "health_count": len(health_entries),
-        "notes_count": len(note_entries),
+        "count": totals["total"],
+        "health_count": health_count,
+        "notes_count": notes_count,
+        "active_days": active_days,
+        "peak_hour": peak_hour,
         "period": "insights"
     }
 
@@ -0,0 +1,396 @@
+"""
+Telemetry - Structured spans and in-process latency histograms
+
+Each chat turn, LangGraph node and LLM call is a span carrying its name,
+duration, input/output tokens, LLM calls, response cache hits and DB calls.
+Child spans roll their counts up into their parent, so a node span shows
+what its LLM calls and queries cost and a turn span shows the whole message.
+
+Finished spans are logged as one JSON line each (logger "telemetry.spans")
+and aggregated per (kind, name) into histograms. Read them with
+get_metrics(), the admin Metrics view in the app, or a metrics file
+dumped every TELEMETRY_DUMP_INTERVAL_SECONDS:
+
+    python telemetry.py nomi_metrics.json
+
+Configure with TELEMETRY_ENABLED, TELEMETRY_JSON_LOGS, TELEMETRY_METRICS_FILE,
+TELEMETRY_DUMP_INTERVAL_SECONDS and TELEMETRY_ADMIN_USERS.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import atexit
+import asyncio
+import logging
+import functools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from langchain_core.callbacks import BaseCallbackHandler
+from pymongo import monitoring
+from dotenv import load_dotenv
+import metrics
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+span_logger = logging.getLogger(f"{__name__}.spans")
+
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "true").lower() == "true"
+TELEMETRY_JSON_LOGS = os.getenv("TELEMETRY_JSON_LOGS", "true").lower() == "true"
+TELEMETRY_METRICS_FILE = os.getenv("TELEMETRY_METRICS_FILE", "")
+TELEMETRY_DUMP_INTERVAL_SECONDS = float(os.getenv("TELEMETRY_DUMP_INTERVAL_SECONDS", "60"))
+TELEMETRY_ADMIN_USERS = {u.strip() for u in os.getenv("TELEMETRY_ADMIN_USERS", "").split(",") if u.strip()}
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+RECENT_SPANS = 200
+
+COUNTERS = ["input_tokens", "output_tokens", "llm_calls", "cache_hits", "cache_misses", "db_calls", "db_ms"]
+
+_current_span = contextvars.ContextVar("telemetry_span", default=None)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (not thread-safe - guarded by its owner)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, pct):
+        """Upper bound of the bucket holding the pct-th value (max for the overflow bucket)"""
+        if not self.count:
+            return 0.0
+        rank = pct / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+
+
+class Span:
+    """One timed unit of work and the counts attributed to it"""
+
+    def __init__(self, kind, name, parent=None, **attributes):
+        self.kind = kind
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.attributes = attributes
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.error = None
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self.duration_ms = 0.0
+
+    def add(self, **counts):
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+
+    def finish(self, error=None):
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        self.error = error
+        if self.parent is not None:
+            self.parent.add(**self.counts)
+        _registry.record(self)
+
+    def to_dict(self):
+        record = {
+            "trace_id": self.trace_id,
+            "kind": self.kind,
+            "name": self.name,
+            "start": self.started_at.isoformat(timespec="milliseconds"),
+            "duration_ms": round(self.duration_ms, 2),
+            **{key: round(value, 2) if isinstance(value, float) else value for key, value in self.counts.items() if value},
+            **self.attributes
+        }
+        if self.parent is not None:
+            record["parent"] = f"{self.parent.kind}:{self.parent.name}"
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+class SpanStats:
+    """Aggregate for one (kind, name): latency histogram plus counter totals"""
+
+    def __init__(self):
+        self.histogram = Histogram()
+        self.errors = 0
+        self.totals = dict.fromkeys(COUNTERS, 0)
+
+
+class Registry:
+    """Thread-safe span aggregates and a ring buffer of recent spans"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+            self._recent = deque(maxlen=RECENT_SPANS)
+
+    def record(self, span):
+        record = span.to_dict()
+        with self._lock:
+            stats = self._stats.setdefault((span.kind, span.name), SpanStats())
+            stats.histogram.observe(span.duration_ms)
+            if span.error:
+                stats.errors += 1
+            for key, value in span.counts.items():
+                stats.totals[key] = stats.totals.get(key, 0) + value
+            self._recent.append(record)
+
+        if TELEMETRY_JSON_LOGS:
+            span_logger.info(json.dumps(record, default=str))
+
+    def observe(self, kind, name, duration_ms, error=False):
+        """Record a timing without a span (e.g. individual DB commands)"""
+        with self._lock:
+            stats = self._stats.setdefault((kind, name), SpanStats())
+            stats.histogram.observe(duration_ms)
+            if error:
+                stats.errors += 1
+
+    def snapshot(self):
+        """Aggregates and recent spans as plain dicts"""
+        with self._lock:
+            rows = []
+            for (kind, name), stats in sorted(self._stats.items()):
+                h = stats.histogram
+                rows.append({
+                    "kind": kind,
+                    "name": name,
+                    "count": h.count,
+                    "errors": stats.errors,
+                    "mean_ms": round(h.sum / h.count, 2) if h.count else 0.0,
+                    "p50_ms": round(h.percentile(50), 2),
+                    "p95_ms": round(h.percentile(95), 2),
+                    "p99_ms": round(h.percentile(99), 2),
+                    "max_ms": round(h.max, 2),
+                    **{key: round(value, 2) for key, value in stats.totals.items()},
+                    "buckets": {str(le): count for le, count in zip(h.buckets + ["+Inf"], h.counts)}
+                })
+            return {"generated_at": datetime.now().isoformat(timespec="seconds"), "spans": rows, "recent": list(self._recent)}
+
+
+_registry = Registry()
+
+
+# Spans
+def current_span():
+    return _current_span.get()
+
+@contextmanager
+def span(name, kind="span", **attributes):
+    """Time a block as a child of the current span"""
+    if not TELEMETRY_ENABLED:
+        yield None
+        return
+
+    current = Span(kind, name, parent=_current_span.get(), **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        _current_span.reset(token)
+        current.finish(error=type(e).__name__)
+        raise
+    _current_span.reset(token)
+    current.finish()
+
+def instrument_node(name, func):
+    """Wrap a LangGraph node (sync or async) so each run is a 'node' span"""
+    node_seconds = metrics.NODE_SECONDS.labels(name)
+
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_node(state):
+            started = time.perf_counter()
+            try:
+                with span(name, kind="node"):
+                    return await func(state)
+            finally:
+                node_seconds.observe(time.perf_counter() - started)
+        return async_node
+
+    @functools.wraps(func)
+    def node(state):
+        started = time.perf_counter()
+        try:
+            with span(name, kind="node"):
+                return func(state)
+        finally:
+            node_seconds.observe(time.perf_counter() - started)
+    return node
+
+def record(**counts):
+    """Add counts (e.g. cache_hits=1) to the current span, if any"""
+    current = _current_span.get()
+    if current is not None:
+        current.add(**counts)
+
+def record_db(command, seconds, error=False):
+    """Count one DB round trip against the current span and its histogram"""
+    if not TELEMETRY_ENABLED:
+        return
+    record(db_calls=1, db_ms=seconds * 1000)
+    _registry.observe("db", command, seconds * 1000, error)
+
+
+class LLMTelemetry(BaseCallbackHandler):
+    """LangChain callback attached to a profile's LLM - one 'llm' span per call (and its metrics)"""
+
+    run_inline = True
+
+    def __init__(self, node):
+        self.node = node
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id):
+        current = Span("llm", self.node, parent=_current_span.get()) if TELEMETRY_ENABLED else None
+        with self._lock:
+            self._spans[run_id] = (time.perf_counter(), current)
+
+    def _pop(self, run_id):
+        with self._lock:
+            started, current = self._spans.pop(run_id, (None, None))
+        if started is not None:
+            metrics.LLM_CALLS.labels(self.node).inc()
+            metrics.LLM_SECONDS.labels(self.node).observe(time.perf_counter() - started)
+        return current
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        current = self._pop(run_id)
+
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+        input_tokens, output_tokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+        metrics.LLM_TOKENS.labels(self.node, "input").inc(input_tokens)
+        metrics.LLM_TOKENS.labels(self.node, "output").inc(output_tokens)
+
+        if current is None:
+            return
+        cached = (usage.get("input_token_details") or {}).get("cache_read", 0)
+        current.add(llm_calls=1, input_tokens=input_tokens, output_tokens=output_tokens)
+        if cached:
+            current.attributes["cached_input_tokens"] = cached
+        current.finish()
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        current = self._pop(run_id)
+        metrics.LLM_ERRORS.labels(self.node).inc()
+        if current is not None:
+            current.add(llm_calls=1)
+            current.finish(error=type(error).__name__)
+
+def attach_llm(node, llm):
+    """Add the telemetry callback to an LLM client (idempotent)"""
+    callbacks = list(getattr(llm, "callbacks", None) or [])
+    if not any(isinstance(callback, LLMTelemetry) for callback in callbacks):
+        callbacks.append(LLMTelemetry(node))
+        try:
+            llm.callbacks = callbacks
+        except (AttributeError, ValueError) as e:
+            logger.warning(f"Telemetry: Could not instrument LLM for '{node}': {e}")
+    return llm
+
+
+class DBCommandListener(monitoring.CommandListener):
+    """pymongo listener - events fire on the calling thread, so spans see their queries"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        seconds = event.duration_micros / 1e6
+        metrics.DB_SECONDS.labels(event.command_name).observe(seconds)
+        record_db(event.command_name, seconds)
+
+    def failed(self, event):
+        seconds = event.duration_micros / 1e6
+        metrics.DB_SECONDS.labels(event.command_name).observe(seconds)
+        metrics.DB_ERRORS.labels(event.command_name).inc()
+        record_db(event.command_name, seconds, error=True)
+
+
+# Reading and exporting
+def get_metrics():
+    """Span aggregates and recent spans"""
+    return _registry.snapshot()
+
+def reset_metrics():
+    _registry.reset()
+
+def dump_metrics(path=None):
+    """Write the metrics snapshot as JSON, returns the path"""
+    path = path or TELEMETRY_METRICS_FILE
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(get_metrics(), f, indent=2, default=str)
+    os.replace(tmp, path)
+    return path
+
+def is_admin(username):
+    return username in TELEMETRY_ADMIN_USERS
+
+def _dump_loop():
+    while True:
+        time.sleep(TELEMETRY_DUMP_INTERVAL_SECONDS)
+        try:
+            dump_metrics()
+        except OSError as e:
+            logger.warning(f"Telemetry: Could not write metrics file '{TELEMETRY_METRICS_FILE}': {e}")
+
+if TELEMETRY_ENABLED and TELEMETRY_METRICS_FILE:
+    threading.Thread(target=_dump_loop, name="telemetry-dump", daemon=True).start()
+    atexit.register(dump_metrics)
+
+
+def print_metrics(metrics):
+    """Print a metrics snapshot as a table"""
+    print(f"Metrics generated at {metrics['generated_at']}\n")
+    print(f"{'kind':<6}{'name':<24}{'count':>8}{'errors':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'tok in':>10}{'tok out':>9}{'llm':>6}{'cache':>7}{'db':>7}")
+    for row in metrics["spans"]:
+        print(f"{row['kind']:<6}{row['name'][:23]:<24}{row['count']:>8}{row['errors']:>7}"
+              f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}"
+              f"{row['input_tokens']:>10}{row['output_tokens']:>9}{row['llm_calls']:>6}"
+              f"{row['cache_hits']:>7}{row['db_calls']:>7}")
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else TELEMETRY_METRICS_FILE
+    if not path:
+        sys.exit("Usage: python telemetry.py <metrics file> (or set TELEMETRY_METRICS_FILE)")
+    with open(path) as f:
+        print_metrics(json.load(f))
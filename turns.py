@@ -0,0 +1,106 @@
+"""
+Chat Turns - Turn IDs and short-lived dedupe of replayed submissions
+
+Every submitted chat message carries a submission ID from the client (the
+Streamlit app keeps it in session state until the reply is saved). The turn
+ID is derived from (username, submission ID), so a retry, a rerun or another
+process replaying the same submission gets the same turn ID. Unique indexes
+on turn_id plus upsert-based writes in db.py make persisting it twice a no-op.
+
+Within one process, a replay of a submission that is still running or that
+completed less than TURN_DEDUPE_TTL_SECONDS ago gets the original reply
+instead of re-running the workflow. Callers without a submission ID get a
+fresh one, so sending the same text twice is two turns.
+"""
+import os
+import time
+import uuid
+import logging
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+TURN_DEDUPE_TTL_SECONDS = float(os.getenv("TURN_DEDUPE_TTL_SECONDS", "10"))
+TURN_REPLAY_WAIT_SECONDS = 60
+
+_TURN_NAMESPACE = uuid.UUID("5b0e7c1e-2f43-4f0c-9d7e-6c1a1f3e8a52")
+
+
+def new_submission_id():
+    """Generate a submission ID for a new client-side message"""
+    return uuid.uuid4().hex
+
+def turn_id_for(username, submission_id):
+    """Deterministic turn ID for a user's submission"""
+    return uuid.uuid5(_TURN_NAMESPACE, f"{username}:{submission_id}").hex
+
+
+class Turn:
+    """One submitted chat message and, once complete, its reply"""
+
+    def __init__(self, username, message, submission_id):
+        self.turn_id = turn_id_for(username, submission_id)
+        self.username = username
+        self.message = message
+        self.submission_id = submission_id
+        self.reply = None
+        self.completed_at = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=TURN_REPLAY_WAIT_SECONDS):
+        """Wait for the original run to finish, returns its reply (None if it failed)"""
+        self._done.wait(timeout)
+        return self.reply
+
+
+class TurnDedupeCache:
+    """In-process map of running and recently completed submissions to their turns"""
+
+    def __init__(self, ttl=TURN_DEDUPE_TTL_SECONDS):
+        self.ttl = ttl
+        self._turns = {}
+        self._lock = threading.Lock()
+        self.replays = 0
+
+    def begin(self, username, message, submission_id=None):
+        """Start a turn, returns (turn, is_new) - is_new is False for a replay"""
+        submission_id = submission_id or new_submission_id()
+        key = (username, submission_id)
+        now = time.time()
+
+        with self._lock:
+            # Running turns are kept however long they take
+            self._turns = {k: t for k, t in self._turns.items()
+                           if t.completed_at is None or now - t.completed_at < self.ttl}
+            turn = self._turns.get(key)
+            if turn is not None:
+                self.replays += 1
+                logger.info(f"Turn {turn.turn_id}: Replayed submission from '{username}'")
+                return turn, False
+
+            turn = Turn(username, message, submission_id)
+            self._turns[key] = turn
+            return turn, True
+
+    def complete(self, turn, reply):
+        """Record the reply and release any waiting replays"""
+        turn.reply = reply
+        turn.completed_at = time.time()
+        turn._done.set()
+
+    def discard(self, turn):
+        """Forget a failed turn so the next submission runs normally"""
+        with self._lock:
+            key = (turn.username, turn.submission_id)
+            if self._turns.get(key) is turn:
+                del self._turns[key]
+        turn._done.set()
+
+    def stats(self):
+        with self._lock:
+            return {"active": len(self._turns), "replays": self.replays, "ttl": self.ttl}
+
+
+turn_cache = TurnDedupeCache()
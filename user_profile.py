@@ -0,0 +1,102 @@
+"""
+User Profile - Compact long-term memory injected into prompts
+
+Renders the per-user profile document (maintained incrementally in db.py as
+entries are written) as a few short lines: usual workouts, preferred time of
+day, current streak, open reminders and frequent tags. Prompts get this
+instead of raw history.
+
+Set USER_PROFILE_ENABLED=false to leave it out of prompts.
+"""
+import os
+import logging
+from collections import Counter
+from datetime import date, datetime, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+USER_PROFILE_ENABLED = os.getenv("USER_PROFILE_ENABLED", "true").lower() == "true"
+
+# Reminders older than this are not shown as open
+REMINDER_MAX_AGE_DAYS = 14
+
+TIME_OF_DAY = [
+    ("early mornings", range(0, 6)),
+    ("mornings", range(6, 12)),
+    ("afternoons", range(12, 17)),
+    ("evenings", range(17, 22)),
+    ("late nights", range(22, 24))
+]
+
+
+def label(key):
+    """Turn a stored counter key back into readable text"""
+    return key.replace("_", " ")
+
+def preferred_time_of_day(hours):
+    """Most common time of day from an hour -> count map"""
+    buckets = Counter()
+    for hour, count in (hours or {}).items():
+        for name, hour_range in TIME_OF_DAY:
+            if int(hour) in hour_range:
+                buckets[name] += count
+    return buckets.most_common(1)[0][0] if buckets else None
+
+def current_streak(profile, today=None):
+    """Consecutive active days up to today or yesterday (0 if the streak is broken)"""
+    today = today or date.today()
+    last_active = profile.get("last_active_day")
+    if not last_active:
+        return 0
+    recent_days = {today.strftime("%Y-%m-%d"), (today - timedelta(days=1)).strftime("%Y-%m-%d")}
+    return profile.get("streak_days", 0) if last_active in recent_days else 0
+
+def format_profile(profile, today=None):
+    """Render a profile as short bullet lines (empty string if there is nothing to say)"""
+    if not profile:
+        return ""
+
+    lines = []
+
+    workouts = Counter(profile.get("workout_types") or {}).most_common(3)
+    if workouts:
+        lines.append("Usual workouts: " + ", ".join(f"{label(name)} ({count}x)" for name, count in workouts))
+
+    time_of_day = preferred_time_of_day(profile.get("hours"))
+    if time_of_day:
+        lines.append(f"Most active: {time_of_day}")
+
+    streak = current_streak(profile, today)
+    if streak > 1:
+        lines.append(f"Current streak: {streak} days in a row")
+
+    cutoff = datetime.now() - timedelta(days=REMINDER_MAX_AGE_DAYS)
+    reminders = [r for r in profile.get("open_reminders") or [] if r.get("created_at") and r["created_at"] >= cutoff]
+    if reminders:
+        items = [f"{r['summary']} ({r['reminder_time']})" if r.get("reminder_time") else r["summary"] for r in reminders[-3:]]
+        lines.append("Open reminders: " + "; ".join(items))
+
+    tags = Counter(profile.get("tags") or {}).most_common(5)
+    if tags:
+        lines.append("Frequent topics: " + ", ".join(label(name) for name, _ in tags))
+
+    if profile.get("entries") and profile.get("first_seen"):
+        lines.append(f"Logged {profile['entries']} entries since {profile['first_seen'].strftime('%b %d, %Y')}")
+
+    return "\n".join(f"- {line}" for line in lines)
+
+def profile_context(username):
+    """Profile block to append to a system prompt ('' if disabled or empty)"""
+    if not USER_PROFILE_ENABLED:
+        return ""
+
+    from db import get_user_profile
+
+    try:
+        text = format_profile(get_user_profile(username))
+    except Exception as e:
+        logger.warning(f"UserProfile: Could not load profile for '{username}': {e}")
+        return ""
+    return f"\n\nWhat you know about {username}:\n{text}" if text else ""
@@ -2,10 +2,11 @@
 Wellbeing & Motivation Handler - Specialized for mental wellness and motivation
 """
 from claude_handler import get_claude_response
-from db import get_unified_entries
+from user_profile import profile_context
+from db import get_day_totals, get_week_totals
 from datetime import date, timedelta
 
-def handle_motivation_wellbeing(message, username):
+def handle_motivation_wellbeing(message, username, conversation_history=None):
     """Handle motivation and wellbeing messages"""
 
     # Determine what kind of wellbeing support is needed
@@ -39,7 +40,9 @@ def determine_support_type(message):
 def generate_morning_motivation(username):
     """Generate morning motivation based on yesterday's activities"""
     yesterday = date.today() - timedelta(days=1)
-    yesterday_entries = get_unified_entries(username, start_date=yesterday, end_date=yesterday)
+    yesterday_totals = get_day_totals(username, yesterday)
+
+    profile = profile_context(username)
 
     system_prompt = f"""You are Nomi, {username}'s PA.
 
@@ -49,11 +52,11 @@ Rules:
 - Greet briefly: "Morning! Let's crush today!"
 - If yesterday was active, ONE quick reference
 - End with ✓ or 💪
-- NO lengthy motivation, NO elaboration"""
+- NO lengthy motivation, NO elaboration{profile}"""
 
-    if yesterday_entries:
-        health_count = len([e for e in yesterday_entries if e.get("use_case") == "health_fitness"])
-        notes_count = len([e for e in yesterday_entries if e.get("use_case") == "notes_reminders"])
+    if yesterday_totals["total"]:
+        health_count = yesterday_totals["use_cases"]["health_fitness"]
+        notes_count = yesterday_totals["use_cases"]["notes_reminders"]
 
         prompt = f"""Morning greeting for {username}. Yesterday: {health_count} workouts, {notes_count} notes.
 
@@ -63,17 +66,19 @@ Respond in max 8-10 words."""
 
 Respond in max 8-10 words."""
 
-    response = get_claude_response(prompt, system_prompt)
+    response = get_claude_response(prompt, system_prompt, profile="motivation_wellbeing")
 
     metadata = {
         "type": "morning_motivation",
-        "yesterday_activity": len(yesterday_entries) if yesterday_entries else 0
+        "yesterday_activity": yesterday_totals["total"]
     }
 
     return response.strip(), metadata
 
 def generate_encouragement(username, message):
     """Generate personalized encouragement"""
+    profile = profile_context(username)
+
     system_prompt = f"""You are Nomi, {username}'s PA.
 
 CRITICAL: Keep responses SHORT - max 8-10 words.
@@ -82,13 +87,13 @@ Rules:
 - Brief encouragement: "You've got this!"
 - Direct address only
 - End with ✓ or 💪
-- NO lengthy support, NO elaboration"""
+- NO lengthy support, NO elaboration{profile}"""
 
     prompt = f"""{username} said: "{message}"
 
 Respond in max 8-10 words."""
 
-    response = get_claude_response(prompt, system_prompt)
+    response = get_claude_response(prompt, system_prompt, profile="motivation_wellbeing")
 
     metadata = {
         "type": "encouragement",
@@ -99,8 +104,9 @@ Respond in max 8-10 words."""
 
 def generate_reflection(username):
     """Generate reflective insights about their journey"""
-    week_ago = date.today() - timedelta(days=7)
-    recent_entries = get_unified_entries(username, start_date=week_ago)
+    recent_totals = get_week_totals(username)
+
+    profile = profile_context(username)
 
     system_prompt = f"""You are Nomi, {username}'s PA.
 
@@ -110,12 +116,12 @@ Rules:
 - Brief reflection: "You've been consistent this week"
 - ONE key observation
 - End with brief encouragement and ✓
-- NO lengthy insights, NO elaboration"""
+- NO lengthy insights, NO elaboration{profile}"""
 
-    if recent_entries:
-        total = len(recent_entries)
-        health_count = len([e for e in recent_entries if e.get("use_case") == "health_fitness"])
-        notes_count = len([e for e in recent_entries if e.get("use_case") == "notes_reminders"])
+    if recent_totals["total"]:
+        total = recent_totals["total"]
+        health_count = recent_totals["use_cases"]["health_fitness"]
+        notes_count = recent_totals["use_cases"]["notes_reminders"]
 
         prompt = f"""Reflect on {username}'s week: {total} total, {health_count} workouts, {notes_count} notes.
 
@@ -125,17 +131,19 @@ Respond in max 2-3 short sentences."""
 
 Respond in max 2-3 short sentences."""
 
-    response = get_claude_response(prompt, system_prompt)
+    response = get_claude_response(prompt, system_prompt, profile="motivation_wellbeing")
 
     metadata = {
         "type": "reflection",
-        "recent_activity": len(recent_entries) if recent_entries else 0
+        "recent_activity": recent_totals["total"]
     }
 
     return response.strip(), metadata
 
 def generate_general_support(username, message):
     """Generate general supportive response"""
+    profile = profile_context(username)
+
     system_prompt = f"""You are Nomi, {username}'s PA.
 
 CRITICAL: Keep responses SHORT - max 8-10 words.
@@ -144,13 +152,13 @@ Rules:
 - Brief support: "I hear you, you're doing great"
 - Direct address only
 - End with ✓ or 💪
-- NO lengthy responses, NO elaboration"""
+- NO lengthy responses, NO elaboration{profile}"""
 
     prompt = f"""{username} said: "{message}"
 
 Respond in max 8-10 words."""
 
-    response = get_claude_response(prompt, system_prompt)
+    response = get_claude_response(prompt, system_prompt, profile="motivation_wellbeing")
 
     metadata = {
         "type": "general_support",